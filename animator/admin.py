@@ -1,22 +1,65 @@
-from django.contrib import admin
-from animator.models import Animation, AnimationPreset, GalleryItem
+from django.contrib import admin, messages
+from animator import tasks
+from animator.models import Animation, AnimationEvent, AnimationPreset, AnimationVariant, GalleryItem, PresetDemo
 
 
 @admin.register(AnimationPreset)
 class AnimationPresetAdmin(admin.ModelAdmin):
-    list_display = ['name', 'code_name', 'is_premium', 'is_active', 'sort_order']
+    list_display = ['name', 'code_name', 'is_premium', 'is_active', 'cost_factor', 'sort_order']
     list_filter = ['is_premium', 'is_active']
     search_fields = ['name', 'code_name']
     ordering = ['sort_order', 'name']
 
 
+class ErrorClassFilter(admin.SimpleListFilter):
+    title = 'retryable error'
+    parameter_name = 'error_class'
+
+    def lookups(self, request, model_admin):
+        return [(error_class, error_class.title()) for error_class in Animation.RETRYABLE_ERRORS]
+
+    def queryset(self, request, queryset):
+        if self.value() in Animation.RETRYABLE_ERRORS:
+            return queryset.filter(id__in=Animation.retryable_failures([self.value()]).values('id'))
+        return queryset
+
+
+class AnimationEventInline(admin.TabularInline):
+    model = AnimationEvent
+    fields = ['from_status', 'to_status', 'created_at']
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+
+class AnimationVariantInline(admin.TabularInline):
+    model = AnimationVariant
+    fields = ['format', 'width', 'watermarked', 'size', 'created_at']
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+
 @admin.register(Animation)
 class AnimationAdmin(admin.ModelAdmin):
-    list_display = ['uuid', 'user', 'preset', 'status', 'output_format', 'created_at']
-    list_filter = ['status', 'output_format', 'preset', 'add_watermark']
+    list_display = ['uuid', 'user', 'preset', 'status', 'output_format', 'estimated_cost', 'actual_cost', 'created_at']
+    list_filter = ['status', ErrorClassFilter, 'failure_reason', 'output_format', 'preset', 'add_watermark', 'flagged_resubmission']
     search_fields = ['uuid', 'user__email', 'ip_address']
-    readonly_fields = ['uuid', 'created_at', 'started_at', 'completed_at', 'processing_time']
+    readonly_fields = ['uuid', 'created_at', 'started_at', 'completed_at', 'queued_at', 'processing_time', 'output_original_size', 'output_size', 'duplicate_of']
     date_hierarchy = 'created_at'
+    inlines = [AnimationEventInline, AnimationVariantInline]
+    actions = ['requeue_failed']
+
+    @admin.action(description='Requeue selected retryable failures')
+    def requeue_failed(self, request, queryset):
+        retryable = Animation.retryable_failures().filter(id__in=queryset.values('id'))
+        requeued = tasks.requeue_failed(retryable)
+        skipped = queryset.count() - requeued
+        self.message_user(
+            request,
+            f"Requeued {requeued} animations on the low-priority queue ({skipped} skipped as not retryable).",
+            messages.SUCCESS if requeued else messages.WARNING,
+        )
 
 
 @admin.register(GalleryItem)
@@ -24,3 +67,9 @@ class GalleryItemAdmin(admin.ModelAdmin):
     list_display = ['title', 'animation', 'is_featured', 'is_active', 'sort_order']
     list_filter = ['is_featured', 'is_active']
     search_fields = ['title', 'description']
+
+
+@admin.register(PresetDemo)
+class PresetDemoAdmin(admin.ModelAdmin):
+    list_display = ['preset', 'sample_name', 'created_at']
+    list_filter = ['preset']
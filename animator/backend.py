@@ -0,0 +1,227 @@
+"""Client for the GPU animation backend (api.imageeditor.ai)."""
+import asyncio
+import weakref
+
+import httpx
+import requests
+from asgiref.sync import sync_to_async
+
+import config
+
+# One pooled AsyncClient per event loop, see async_client()
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _headers():
+    headers = {}
+    if config.API_KEY:
+        headers['Authorization'] = config.API_KEY
+    return headers
+
+
+def _animate_payload(animation):
+    """Form data and files for an animate request. Reads the input image."""
+    # Map animation preset to motion parameter
+    motion = animation.preset.code_name if animation.preset else 'walk'
+
+    data = {
+        'motion': motion,
+        'output_format': animation.output_format,
+        'duration': animation.duration,
+        'fps': animation.fps,
+        'source': 'drawinganimator',  # Identify source for credit validation
+    }
+
+    if config.API_INPUT_REUSE and animation.input_handle:
+        # The backend still has this drawing from an earlier render
+        files = None
+        data['input_id'] = animation.input_handle
+    else:
+        # Read the image file, cropped to the drawing
+        files = {
+            'files': (*animation.render_input(), 'image/png')
+        }
+    return data, files
+
+
+def _send_result(result):
+    """Map api.imageeditor.ai response format to our expected format."""
+    if 'uuid' in result:
+        return {
+            'success': True,
+            'request_id': result.get('uuid'),
+            'job_id': result.get('uuid'),
+            'input_handle': result.get('input_id', ''),
+        }
+    elif 'error' in result:
+        return {'success': False, 'error': result.get('error')}
+    else:
+        return {'success': True, 'request_id': result.get('uuid', '')}
+
+
+def send_to_api(animation):
+    """Send animation request to the API backend."""
+    api_url = f"{config.API_BACKEND}/v1/animate/"
+    data, files = _animate_payload(animation)
+
+    try:
+        response = requests.post(api_url, files=files, data=data, headers=_headers(), timeout=30)
+        return _send_result(response.json())
+
+    except requests.exceptions.RequestException as e:
+        return {'success': False, 'error': str(e)}
+
+
+def send_batch(animations):
+    """
+    Send several animations with the same motion, format, duration and fps in one request.
+
+    Each drawing is a separate `files` part; the backend returns one request
+    uuid and reports results as a files array in the same order.
+    """
+    api_url = f"{config.API_BACKEND}/v1/animate/"
+    first = animations[0]
+
+    files = []
+    for animation in animations:
+        files.append(('files', (*animation.render_input(), 'image/png')))
+
+    data = {
+        'motion': first.preset.code_name if first.preset else 'walk',
+        'output_format': first.output_format,
+        'duration': first.duration,
+        'fps': first.fps,
+        'source': 'drawinganimator',
+    }
+
+    try:
+        response = requests.post(api_url, files=files, data=data, headers=_headers(), timeout=30 + 5 * len(animations))
+        result = response.json()
+        if 'uuid' in result:
+            return {'success': True, 'request_id': result['uuid']}
+        return {'success': False, 'error': result.get('error', 'Unexpected backend response')}
+    except (requests.exceptions.RequestException, ValueError) as e:
+        return {'success': False, 'error': str(e)}
+
+
+def _status_result(result, index):
+    """Parse an api.imageeditor.ai results response, optionally for one entry of a batch."""
+    if result.get('files'):
+        files = result['files']
+        if index:
+            files = files[int(index):int(index) + 1]
+        # Check if any file is complete
+        for file_data in files:
+            if file_data.get('outputfile'):
+                return {
+                    'done': True,
+                    'output_url': file_data.get('outputfile'),
+                    'gpu_seconds': file_data.get('gpu_seconds'),
+                }
+            elif file_data.get('failed'):
+                return {
+                    'failed': True,
+                    'error': file_data.get('error', 'Processing failed'),
+                }
+        # Still processing
+        return {'done': False}
+    elif result.get('failed'):
+        return {
+            'failed': True,
+            'error': result.get('errors', ['Processing failed'])[0] if result.get('errors') else 'Processing failed',
+        }
+
+    return {'done': False}
+
+
+def check_api_status(api_uuid):
+    """
+    Poll api.imageeditor.ai for animation status.
+
+    Batched animations carry "<request uuid>#<index>" and only look at their
+    own entry of the files array.
+    """
+    return check_api_statuses([api_uuid])[api_uuid]
+
+
+def check_api_statuses(api_uuids):
+    """
+    check_api_status() for several animations, with one request per backend
+    request: the animations of a batch share theirs.
+
+    Returns:
+        Dict of api_uuid -> status result, or None where the poll failed
+    """
+    api_url = f"{config.API_BACKEND}/v1/animate/results/"
+    by_request = {}
+    for api_uuid in api_uuids:
+        by_request.setdefault(api_uuid.partition('#')[0], []).append(api_uuid)
+
+    results = {}
+    for request_uuid, members in by_request.items():
+        try:
+            response = requests.post(
+                api_url,
+                data={'uuid': request_uuid},
+                headers=_headers(),
+                timeout=10
+            )
+            data = response.json()
+        except Exception:
+            data = None
+        for api_uuid in members:
+            try:
+                results[api_uuid] = _status_result(data, api_uuid.partition('#')[2])
+            except Exception:
+                results[api_uuid] = None
+    return results
+
+
+def async_client():
+    """
+    The httpx.AsyncClient for the running event loop.
+
+    Connections are bound to the loop that opened them, so each loop (one per
+    ASGI worker process in practice) gets its own client. All requests on it
+    share a pool of up to API_MAX_CONNECTIONS keep-alive connections.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(limits=httpx.Limits(
+            max_connections=config.API_MAX_CONNECTIONS,
+            max_keepalive_connections=config.API_MAX_CONNECTIONS,
+        ))
+        _async_clients[loop] = client
+    return client
+
+
+async def async_send_to_api(animation):
+    """send_to_api() for async views: the request is awaited instead of blocking a worker."""
+    api_url = f"{config.API_BACKEND}/v1/animate/"
+    data, files = await sync_to_async(_animate_payload)(animation)
+
+    try:
+        response = await async_client().post(api_url, files=files, data=data, headers=_headers(), timeout=30)
+        return _send_result(response.json())
+    except httpx.HTTPError as e:
+        return {'success': False, 'error': str(e)}
+
+
+async def async_check_api_status(api_uuid):
+    """check_api_status() for async views."""
+    api_url = f"{config.API_BACKEND}/v1/animate/results/"
+    api_uuid, _, index = api_uuid.partition('#')
+
+    try:
+        response = await async_client().post(api_url, data={'uuid': api_uuid}, headers=_headers(), timeout=10)
+        return _status_result(response.json(), index)
+    except Exception:
+        return None
+
+
+def download_output(url, timeout=60):
+    """Download a finished output file from the API backend. Returns the raw bytes."""
+    response = requests.get(url, headers=_headers(), timeout=timeout)
+    response.raise_for_status()
+    return response.content
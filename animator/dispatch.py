@@ -0,0 +1,102 @@
+from django.core.cache import cache
+from django.utils import timezone
+
+import config
+
+
+class DispatchQueue:
+    """
+    Cheap per-tier queue counters kept in the cache (Redis in production).
+
+    Every dispatched animation takes a ticket from a monotonically increasing
+    counter; every finished animation bumps a "done" counter and a per-minute
+    throughput bucket. Depth, position and expected wait are derived from
+    those counters so no COUNT query ever runs on the animations table.
+    """
+    TIER_FREE = 'free'
+    TIER_PRO = 'pro'
+    TICKET_TIMEOUT = 60 * 60 * 24
+
+    @staticmethod
+    def tier(is_pro):
+        return DispatchQueue.TIER_PRO if is_pro else DispatchQueue.TIER_FREE
+
+    @staticmethod
+    def _incr(key, timeout=None):
+        try:
+            return cache.incr(key)
+        except ValueError:
+            cache.add(key, 0, timeout=timeout)
+            return cache.incr(key)
+
+    @staticmethod
+    def _minute():
+        return int(timezone.now().timestamp() // 60)
+
+    @staticmethod
+    def enter(animation_uuid, tier):
+        """Take a queue ticket for a dispatched animation."""
+        ticket = DispatchQueue._incr(f'dispatch:{tier}:issued')
+        cache.set(f'dispatch:ticket:{animation_uuid}', (tier, ticket), timeout=DispatchQueue.TICKET_TIMEOUT)
+        return ticket
+
+    @staticmethod
+    def leave(animation_uuid):
+        """Release an animation's ticket once it completes or fails. Safe to call repeatedly."""
+        ticket_key = f'dispatch:ticket:{animation_uuid}'
+        entry = cache.get(ticket_key)
+        if not entry or not cache.delete(ticket_key):
+            return False
+
+        tier, _ = entry
+        window = config.QUEUE_THROUGHPUT_WINDOW * 60
+        DispatchQueue._incr(f'dispatch:{tier}:done')
+        DispatchQueue._incr(f'dispatch:{tier}:rate:{DispatchQueue._minute()}', timeout=window + 60)
+        return True
+
+    @staticmethod
+    def depth(tier):
+        counters = cache.get_many([f'dispatch:{tier}:issued', f'dispatch:{tier}:done'])
+        issued = counters.get(f'dispatch:{tier}:issued', 0)
+        done = counters.get(f'dispatch:{tier}:done', 0)
+        return max(0, issued - done)
+
+    @staticmethod
+    def position(animation_uuid):
+        """Number of queued animations ahead of this one (0 = being processed), or None."""
+        entry = cache.get(f'dispatch:ticket:{animation_uuid}')
+        if not entry:
+            return None
+
+        tier, ticket = entry
+        done = cache.get(f'dispatch:{tier}:done', 0)
+        return max(0, ticket - done - 1)
+
+    @staticmethod
+    def throughput(tier):
+        """Completed animations per second over the last QUEUE_THROUGHPUT_WINDOW minutes."""
+        minute = DispatchQueue._minute()
+        window = config.QUEUE_THROUGHPUT_WINDOW
+        keys = [f'dispatch:{tier}:rate:{minute - i}' for i in range(window)]
+        return sum(cache.get_many(keys).values()) / (window * 60)
+
+    @staticmethod
+    def expected_wait(tier, ahead):
+        """Seconds until a job with `ahead` jobs in front of it should finish, or None without history."""
+        rate = DispatchQueue.throughput(tier)
+        if not rate:
+            return None
+        return round((ahead + 1) / rate, 1)
+
+    @staticmethod
+    def summary(tier, animation_uuid=None):
+        """Queue depth, position and expected wait for display."""
+        depth = DispatchQueue.depth(tier)
+        position = DispatchQueue.position(animation_uuid) if animation_uuid else None
+        ahead = depth if position is None else position
+        return {
+            'tier': tier,
+            'depth': depth,
+            'position': position,
+            'expected_wait': DispatchQueue.expected_wait(tier, ahead),
+        }
@@ -0,0 +1,492 @@
+"""Image and animation processing helpers built on Pillow and NumPy."""
+import base64
+import math
+from functools import lru_cache
+from io import BytesIO
+
+import numpy as np
+from PIL import ExifTags, GifImagePlugin, Image, ImageDraw, ImageFont, ImageOps, ImageSequence, features
+
+GIF_TRANSPARENT = 255  # Palette index kept free for transparent pixels
+GIF_PALETTE_SAMPLE = 1_000_000  # Max pixels sampled to build a shared palette
+PLACEHOLDER_SIZE = 16  # Longest side of inline placeholders, in pixels
+CROP_ANALYSIS_SIZE = 512  # Longest side of the copy auto-crop looks at
+ANALYSIS_MAX_PIXELS = 25_000_000  # Uploads decoding to more pixels than this are not analysed in the request
+
+# Wiggle preview keyframes: (sideways sway at the top, as a fraction of the
+# width; vertical stretch about the base). One loop, eased at the turns.
+WIGGLE_KEYFRAMES = (
+    (0.0, 0.0), (0.03, 0.02), (0.045, 0.0), (0.03, -0.02),
+    (0.0, 0.0), (-0.03, 0.02), (-0.045, 0.0), (-0.03, -0.02),
+)
+
+
+def load_frames(data):
+    """
+    Decode an animated (or still) image into RGBA frames.
+
+    Returns:
+        Tuple of (list of RGBA PIL images, list of frame durations in ms)
+    """
+    image = Image.open(BytesIO(data))
+    default_duration = image.info.get('duration') or 100
+    frames, durations = [], []
+    for frame in ImageSequence.Iterator(image):
+        frames.append(frame.convert('RGBA'))
+        durations.append(frame.info.get('duration') or default_duration)
+    return frames, durations
+
+
+def resize_frames(frames, width):
+    """Downscale frames to the given width, keeping aspect ratio. Never upscales."""
+    if not frames or frames[0].width <= width:
+        return frames
+    height = max(1, round(frames[0].height * width / frames[0].width))
+    return [frame.resize((width, height), Image.LANCZOS) for frame in frames]
+
+
+def encode_webp(frames, durations, quality=70):
+    """Encode frames as a looping animated WebP. Returns the raw bytes."""
+    buffer = BytesIO()
+    frames[0].save(
+        buffer, format='WEBP', save_all=True, append_images=frames[1:],
+        duration=durations, loop=0, quality=quality, method=4,
+    )
+    return buffer.getvalue()
+
+
+def encode_avif(frames, durations, quality=60):
+    """Encode frames as a looping animated AVIF. Returns the raw bytes."""
+    buffer = BytesIO()
+    frames[0].save(
+        buffer, format='AVIF', save_all=True, append_images=frames[1:],
+        duration=durations, loop=0, quality=quality,
+    )
+    return buffer.getvalue()
+
+
+def can_encode(image_format):
+    """Whether this Pillow build can write 'webp' or 'avif'."""
+    return features.check(image_format)
+
+
+def encode_gif(frames, durations):
+    """
+    Encode frames as a compact looping GIF. Returns the raw bytes.
+
+    - all frames share one palette, built from a sample of every frame's
+      opaque pixels, so no per-frame color tables are written
+    - consecutive frames that are identical after quantization are dropped
+      and their delays merged
+    - each later frame is cropped to the region that changed since the
+      previous one (found by differencing the index arrays) and drawn over
+      it; animations with transparency keep full frames, since drawing over
+      could not clear pixels
+    """
+    stack = np.stack([np.asarray(frame.convert('RGBA')) for frame in frames])
+    opaque = stack[..., 3] >= 128
+    has_transparency = not opaque.all()
+
+    pixels = stack[..., :3][opaque]
+    if len(pixels) > GIF_PALETTE_SAMPLE:
+        pixels = pixels[::len(pixels) // GIF_PALETTE_SAMPLE + 1]
+    if not len(pixels):
+        pixels = np.zeros((1, 3), dtype=np.uint8)
+    palette = Image.fromarray(np.ascontiguousarray(pixels).reshape(1, -1, 3)).quantize(
+        GIF_TRANSPARENT, method=Image.Quantize.MEDIANCUT, dither=Image.Dither.NONE,
+    )
+    indices = np.stack([
+        np.asarray(Image.fromarray(frame).quantize(palette=palette, dither=Image.Dither.NONE))
+        for frame in np.ascontiguousarray(stack[..., :3])
+    ])
+    indices[~opaque] = GIF_TRANSPARENT
+
+    # Renumber to the colors actually used, so the color table is as small as possible
+    used = np.unique(indices)
+    lookup = np.zeros(256, dtype=np.uint8)
+    lookup[used] = np.arange(len(used))
+    indices = lookup[indices]
+    transparent = int(lookup[GIF_TRANSPARENT])
+    colors = np.asarray(palette.getpalette()[:256 * 3] + [0] * 768, dtype=np.uint8)[:768].reshape(256, 3)
+    palette_bytes = colors[used].flatten().tolist()
+
+    keep, delays = [0], [durations[0]]
+    for i in range(1, len(indices)):
+        if np.array_equal(indices[i], indices[keep[-1]]):
+            delays[-1] += durations[i]
+        else:
+            keep.append(i)
+            delays.append(durations[i])
+
+    def as_image(array):
+        image = Image.fromarray(np.ascontiguousarray(array), 'P')
+        image.putpalette(palette_bytes)
+        return image
+
+    header, _ = GifImagePlugin.getheader(as_image(indices[0]), info={'optimize': False, 'loop': 0})
+    chunks = list(header)
+    params = {'disposal': 2, 'transparency': transparent} if has_transparency else {'disposal': 1}
+    previous = None
+    for index, delay in zip(keep, delays):
+        frame, offset = indices[index], (0, 0)
+        if previous is not None and not has_transparency:
+            changed = frame != previous
+            rows, cols = np.flatnonzero(changed.any(axis=1)), np.flatnonzero(changed.any(axis=0))
+            frame = frame[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1]
+            offset = (int(cols[0]), int(rows[0]))
+        chunks.extend(GifImagePlugin.getdata(as_image(frame), offset, duration=delay, **params))
+        previous = indices[index]
+    chunks.append(b';')
+    return b''.join(chunks)
+
+
+# Animated derivative encoders by file extension
+ENCODERS = {'webp': encode_webp, 'avif': encode_avif, 'gif': encode_gif}
+
+
+def optimize_gif(data):
+    """Re-encode a GIF with encode_gif(). Returns the raw bytes."""
+    return encode_gif(*load_frames(data))
+
+
+@lru_cache(maxsize=32)
+def watermark_overlay(width, text):
+    """
+    Watermark for frames `width` pixels wide: white text with a dark outline.
+
+    Returns:
+        Tuple of (RGB array, alpha array), float32 in 0..1, shaped (h, w, 3)
+        and (h, w, 1)
+    """
+    font = ImageFont.load_default(size=max(10, width // 24))
+    left, top, right, bottom = font.getbbox(text, stroke_width=1)
+    mark = Image.new('RGBA', (right - left + 2, bottom - top + 2), (0, 0, 0, 0))
+    ImageDraw.Draw(mark).text(
+        (1 - left, 1 - top), text, font=font,
+        fill=(255, 255, 255, 255), stroke_width=1, stroke_fill=(0, 0, 0, 255),
+    )
+    pixels = np.asarray(mark, dtype=np.float32) / 255
+    return pixels[..., :3], pixels[..., 3:]
+
+
+def add_watermark(frames, text, opacity=0.6):
+    """
+    Composite a text watermark into the bottom-right corner of every frame.
+
+    The frames are stacked into one (frames, h, w, 4) array and blended with
+    a single alpha-over operation that broadcasts the mark across all frames.
+    """
+    stack = np.stack([np.asarray(frame.convert('RGBA')) for frame in frames])
+    _, height, width, _ = stack.shape
+    rgb, alpha = watermark_overlay(width, text)
+    # Never larger than the frame itself
+    rgb, alpha = rgb[:height, :width], alpha[:height, :width] * opacity
+    mark_height, mark_width = alpha.shape[:2]
+    margin = min(width, height) // 40
+    top = max(0, height - mark_height - margin)
+    left = max(0, width - mark_width - margin)
+
+    region = stack[:, top:top + mark_height, left:left + mark_width].astype(np.float32) / 255
+    region_alpha = region[..., 3:]
+    out_alpha = alpha + region_alpha * (1 - alpha)
+    out_rgb = (rgb * alpha + region[..., :3] * region_alpha * (1 - alpha)) / np.maximum(out_alpha, 1e-6)
+    stack[:, top:top + mark_height, left:left + mark_width] = np.round(
+        np.concatenate([out_rgb, out_alpha], axis=-1) * 255
+    ).astype(np.uint8)
+    return [Image.fromarray(frame, 'RGBA') for frame in stack]
+
+
+def watermark_animation(data, text, opacity=0.6):
+    """
+    Watermark every frame of a GIF or WebP animation, keeping its format.
+
+    Returns:
+        Tuple of (raw bytes, file extension)
+
+    Raises:
+        ValueError: for formats Pillow can't re-encode (e.g. MP4, WebM)
+    """
+    try:
+        image_format = Image.open(BytesIO(data)).format
+    except Exception:
+        image_format = None
+    if image_format not in ('GIF', 'WEBP'):
+        raise ValueError(f"Can't watermark {image_format or 'unknown'} files")
+
+    frames, durations = load_frames(data)
+    frames = add_watermark(frames, text, opacity)
+    if image_format == 'GIF':
+        return encode_gif(frames, durations), '.gif'
+    return encode_webp(frames, durations, quality=85), '.webp'
+
+
+def make_preview(data, width):
+    """Compact looping WebP preview of an animation, scaled to `width`."""
+    frames, durations = load_frames(data)
+    return encode_webp(resize_frames(frames, width), durations)
+
+
+def make_thumbnail(data, width):
+    """Still WebP thumbnail from the first frame of an animation."""
+    frames, _ = load_frames(data)
+    buffer = BytesIO()
+    resize_frames(frames[:1], width)[0].save(buffer, format='WEBP', quality=75)
+    return buffer.getvalue()
+
+
+def make_placeholder(data, size=PLACEHOLDER_SIZE):
+    """
+    Tiny stand-in for the first frame of an image, as a data: URI to inline in markup.
+
+    The frame is box-averaged to at most `size` pixels on its longest side,
+    with alpha premultiplied so transparent areas don't bleed their colour
+    in, and written as a small WebP (a few hundred bytes). Browsers upscale
+    it smoothly, which gives the blur.
+    """
+    frame = Image.open(BytesIO(data)).convert('RGBA')
+    pixels = np.asarray(frame, dtype=np.float32)
+    block = max(1, -(-max(frame.size) // size))
+    height, width = frame.height // block or 1, frame.width // block or 1
+    pixels = pixels[:height * block, :width * block]
+    block_h, block_w = pixels.shape[0] // height, pixels.shape[1] // width
+
+    alpha = pixels[..., 3:] / 255
+    premultiplied = np.concatenate([pixels[..., :3] * alpha, alpha], axis=2)
+    averaged = premultiplied.reshape(height, block_h, width, block_w, 4).mean(axis=(1, 3))
+    alpha = averaged[..., 3:]
+    rgb = np.divide(averaged[..., :3], alpha, out=np.zeros_like(averaged[..., :3]), where=alpha > 0)
+
+    if (alpha == 1).all():
+        image = Image.fromarray(rgb.round().astype(np.uint8), 'RGB')
+    else:
+        image = Image.fromarray(np.concatenate([rgb, alpha * 255], axis=2).round().astype(np.uint8), 'RGBA')
+    buffer = BytesIO()
+    image.save(buffer, format='WEBP', quality=50)
+    return f"data:image/webp;base64,{base64.b64encode(buffer.getvalue()).decode()}"
+
+
+def make_wiggle(data, size=240, frame_duration=125):
+    """
+    Cheap looping "wiggle" of a still drawing, shown while the real render runs.
+
+    The drawing is flattened on white and shrunk to fit `size`, then each of
+    WIGGLE_KEYFRAMES sways it about its base (more towards the top) and
+    squashes or stretches it. All frames come from one vectorized inverse
+    mapping with bilinear sampling; no per-pixel Python.
+
+    Returns:
+        Looping animated WebP bytes
+    """
+    image = Image.open(BytesIO(data))
+    image.thumbnail((size, size))  # Lets JPEG decode at reduced scale
+    image = ImageOps.exif_transpose(image)  # Upright, like the browser's preview of the upload
+    canvas = Image.new('RGB', image.size, (255, 255, 255))
+    canvas.paste(image.convert('RGBA'), mask=image.convert('RGBA'))
+    pixels = np.asarray(canvas, dtype=np.float32)
+    height, width = pixels.shape[:2]
+
+    keyframes = np.array(WIGGLE_KEYFRAMES, dtype=np.float32)
+    sway = keyframes[:, 0, None, None] * width
+    stretch = 1 + keyframes[:, 1, None, None]
+    ys, xs = np.mgrid[0:height, 0:width].astype(np.float32)
+    base = height - 1
+    # 0 at the base, 1 at the top; the sway bends rather than shears
+    lift = (base - ys) / max(base, 1)
+
+    # Where each output pixel comes from, for every keyframe at once
+    source_x = xs - sway * lift ** 2
+    source_y = base - (base - ys) / stretch
+    source_x, source_y = np.broadcast_arrays(source_x, source_y)
+
+    x0 = np.floor(source_x).astype(np.intp)
+    y0 = np.floor(source_y).astype(np.intp)
+    fx = (source_x - x0)[..., None]
+    fy = (source_y - y0)[..., None]
+    inside = ((source_x >= 0) & (source_x <= width - 1) & (source_y >= 0) & (source_y <= base))[..., None]
+    x0c, x1c = np.clip(x0, 0, width - 1), np.clip(x0 + 1, 0, width - 1)
+    y0c, y1c = np.clip(y0, 0, base), np.clip(y0 + 1, 0, base)
+    top = pixels[y0c, x0c] * (1 - fx) + pixels[y0c, x1c] * fx
+    bottom = pixels[y1c, x0c] * (1 - fx) + pixels[y1c, x1c] * fx
+    warped = np.where(inside, top * (1 - fy) + bottom * fy, 255)
+
+    frames = [Image.fromarray(frame, 'RGB') for frame in warped.round().astype(np.uint8)]
+    return encode_webp(frames, [frame_duration] * len(frames), quality=60)
+
+
+def oriented_size(data):
+    """(width, height) of an image as displayed, i.e. after its EXIF orientation. Reads the header only."""
+    image = Image.open(BytesIO(data))
+    if image.getexif().get(ExifTags.Base.Orientation, 1) in (5, 6, 7, 8):
+        return image.height, image.width
+    return image.size
+
+
+def _analysis_copy(data, scale):
+    """
+    Upright RGBA copy of an image scaled by `scale` (at most 1), for analysis.
+
+    The image is shrunk in its stored mode and orientation before it is
+    rotated and converted, so the decode is the only full-size copy held
+    (JPEGs decode at reduced scale, skipping even that). The EXIF
+    orientation is read after that decode, since for PNGs reading it
+    decodes the whole file.
+
+    Returns:
+        (copy, (width, height) of the full image as displayed), or
+        (None, None) if it would decode to more than ANALYSIS_MAX_PIXELS
+    """
+    image = Image.open(BytesIO(data))
+    stored_width, stored_height = image.size
+    size = (max(1, math.ceil(stored_width * scale)), max(1, math.ceil(stored_height * scale)))
+    image.draft('RGB', size)
+    if image.width * image.height > ANALYSIS_MAX_PIXELS:
+        return None, None
+    image.load()
+    rotated = image.getexif().get(ExifTags.Base.Orientation, 1) in (5, 6, 7, 8)
+    if image.mode not in ('L', 'LA', 'RGB', 'RGBA'):
+        # Palette and 1-bit images can't be shrunk by averaging
+        image = image.convert('RGBA')
+    image.thumbnail(size, Image.BOX)
+    full_size = (stored_height, stored_width) if rotated else (stored_width, stored_height)
+    return ImageOps.exif_transpose(image).convert('RGBA'), full_size
+
+
+def _dilate(mask):
+    """3x3 binary dilation."""
+    height, width = mask.shape
+    padded = np.pad(mask, 1)
+    out = mask.copy()
+    for dy in range(3):
+        for dx in range(3):
+            out |= padded[dy:dy + height, dx:dx + width]
+    return out
+
+
+def _neighbours(mask):
+    """Count of set pixels in each 3x3 neighbourhood, the pixel included."""
+    height, width = mask.shape
+    padded = np.pad(mask, 1).astype(np.uint8)
+    return sum(padded[dy:dy + height, dx:dx + width] for dy in range(3) for dx in range(3))
+
+
+def find_content_box(data, margin=0.05, min_saving=0.15, ink_distance=40.0, border_spread=32.0):
+    """
+    Bounding box of a drawing on its sheet, to crop blank paper before rendering.
+
+    Works on a copy shrunk to CROP_ANALYSIS_SIZE (JPEGs decode at reduced
+    scale). The paper colour is the median of the outer ring of pixels; ink
+    is whatever is more than `ink_distance` (RGB) from it. A rank filter
+    drops isolated specks of grain and dust, since a stroke always has
+    neighbours, and a dilation within the ink gives stroke ends back. The
+    box of what is left grows by `margin`, a fraction of its longer side.
+
+    Returns:
+        ((left, top, right, bottom), background '#rrggbb') in pixels of the
+        upright (EXIF-oriented) image, or None when the border isn't plain
+        paper, nothing stands out, or cropping saves less than `min_saving`
+        of the area
+    """
+    with Image.open(BytesIO(data)) as header:
+        scale = min(1.0, CROP_ANALYSIS_SIZE / max(header.size))
+    image, full_size = _analysis_copy(data, scale)
+    if image is None:
+        return None
+    width, height = full_size
+    # Transparent areas count as white paper
+    paper = Image.new('RGBA', image.size, (255, 255, 255, 255))
+    pixels = np.asarray(Image.alpha_composite(paper, image).convert('RGB'), dtype=np.float32)
+
+    ring = np.concatenate([
+        pixels[:2].reshape(-1, 3), pixels[-2:].reshape(-1, 3),
+        pixels[:, :2].reshape(-1, 3), pixels[:, -2:].reshape(-1, 3),
+    ])
+    background = np.median(ring, axis=0)
+    spread = np.percentile(np.linalg.norm(ring - background, axis=1), 90)
+    if spread > border_spread:
+        return None
+
+    ink = np.linalg.norm(pixels - background, axis=2) > max(ink_distance, 2 * spread)
+    ink &= _dilate(ink & (_neighbours(ink) >= 3))
+    rows, columns = np.flatnonzero(ink.any(axis=1)), np.flatnonzero(ink.any(axis=0))
+    if not len(rows):
+        return None
+
+    scale_x, scale_y = width / ink.shape[1], height / ink.shape[0]
+    left, right = int(columns[0] * scale_x), int(np.ceil((columns[-1] + 1) * scale_x))
+    top, bottom = int(rows[0] * scale_y), int(np.ceil((rows[-1] + 1) * scale_y))
+    pad = int(margin * max(right - left, bottom - top))
+    box = (max(0, left - pad), max(0, top - pad), min(width, right + pad), min(height, bottom + pad))
+    if (box[2] - box[0]) * (box[3] - box[1]) > (1 - min_saving) * width * height:
+        return None
+    return box, '#%02x%02x%02x' % tuple(int(round(value)) for value in background)
+
+
+def crop_image(data, box):
+    """Crop the upright (EXIF-oriented) image to box. Returns JPEG bytes for JPEG input, else PNG."""
+    image = Image.open(BytesIO(data))
+    image_format = image.format
+    cropped = ImageOps.exif_transpose(image).crop(box)
+    buffer = BytesIO()
+    if image_format == 'JPEG':
+        cropped.save(buffer, format='JPEG', quality=95)
+    else:
+        cropped.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def pad_animation(data, box, size, background):
+    """
+    Put an animation rendered from a crop back on a canvas with the framing of
+    the whole image: `size` and `box` are in input pixels, scaled to the output.
+
+    Returns:
+        GIF bytes, encoded with encode_gif()
+    """
+    frames, durations = load_frames(data)
+    left, top, right, bottom = box
+    scale = frames[0].width / (right - left)
+    canvas_size = (round(size[0] * scale), round(size[1] * scale))
+    offset = (round(left * scale), round(top * scale))
+    padded = []
+    for frame in frames:
+        canvas = Image.new('RGBA', canvas_size, background)
+        canvas.paste(frame, offset)
+        padded.append(canvas)
+    return encode_gif(padded, durations)
+
+
+def dhash(data, box=None):
+    """
+    64-bit difference hash of an image, for finding re-photographed or
+    re-compressed copies of the same drawing.
+
+    The upright image (cropped to `box`, in its pixels, if given) is shrunk
+    to 9x8 grey pixels; each bit says whether a pixel is clearly brighter
+    than its right neighbour. Steps under 1/16 of the image's contrast
+    count as equal, so blank paper doesn't hash to noise. Near-identical
+    images differ in a few bits. Returns None for flat images, and for
+    images too large to analyse (see _analysis_copy).
+    """
+    with Image.open(BytesIO(data)) as header:
+        left, top, right, bottom = box or (0, 0, *header.size)
+    # Keep at least 16x16 source pixels per hash pixel inside the box
+    scale = min(1.0, max(144 / (right - left), 128 / (bottom - top)))
+    image, full_size = _analysis_copy(data, scale)
+    if image is None:
+        return None
+    width, height = full_size
+    if box:
+        scale_x, scale_y = image.width / width, image.height / height
+        image = image.crop((
+            int(box[0] * scale_x), int(box[1] * scale_y),
+            max(int(box[0] * scale_x) + 1, round(box[2] * scale_x)),
+            max(int(box[1] * scale_y) + 1, round(box[3] * scale_y)),
+        ))
+    paper = Image.new('RGBA', image.size, (255, 255, 255, 255))
+    grey = Image.alpha_composite(paper, image).convert('L').resize((9, 8), Image.BOX)
+    pixels = np.asarray(grey, dtype=np.int16)
+    contrast = pixels.max() - pixels.min()
+    if contrast < 8:
+        return None
+    bits = (pixels[:, :-1] - pixels[:, 1:] > contrast / 16).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
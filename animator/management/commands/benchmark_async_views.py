@@ -0,0 +1,114 @@
+import asyncio
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+from django.test import AsyncRequestFactory, RequestFactory
+
+from animator import backend
+from animator.models import Animation
+from animator.views import AnimationStatus, AsyncAnimationStatus
+import config
+
+
+class SlowBackendServer(ThreadingHTTPServer):
+    """Stand-in GPU backend that answers every status poll with 'still processing' after a delay."""
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, delay):
+        self.delay = delay
+        super().__init__(('127.0.0.1', 0), SlowBackendHandler)
+
+
+class SlowBackendHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        time.sleep(self.server.delay)
+        body = json.dumps({'files': [{}]}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = 'Compare sync and async status views against a simulated slow backend'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100, help='Concurrent status requests per run (default: 100)')
+        parser.add_argument('--delay', type=float, default=1.0, help='Simulated backend latency in seconds (default: 1.0)')
+        parser.add_argument('--workers', type=int, default=3, help='Sync workers, as in the WSGI deployment (default: 3)')
+        parser.add_argument('--mode', choices=['both', 'sync', 'async'], default='both')
+
+    def handle(self, *args, **options):
+        server = SlowBackendServer(options['delay'])
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        api_backend = config.API_BACKEND
+        config.API_BACKEND = f"http://127.0.0.1:{server.server_address[1]}"
+
+        # One in-flight animation that every request polls
+        animation = Animation.objects.create(
+            session_key='benchmark', status=Animation.PROCESSING, api_request_id='benchmark',
+        )
+        try:
+            self.stdout.write(
+                f"{options['requests']} concurrent status requests, backend latency {options['delay']}s"
+            )
+            if options['mode'] in ('both', 'sync'):
+                self.report(f"sync ({options['workers']} workers)", *self.run_sync(animation, options))
+            if options['mode'] in ('both', 'async'):
+                self.report('async (1 process)', *asyncio.run(self.run_async(animation, options)))
+        finally:
+            animation.delete()
+            config.API_BACKEND = api_backend
+            server.shutdown()
+
+    def run_sync(self, animation, options):
+        """Requests queue for a pool of workers, each blocked for the whole backend call."""
+        view = AnimationStatus.as_view()
+        factory = RequestFactory()
+        path = f'/animate/api/animation/status/{animation.uuid}/'
+
+        def request(started):
+            view(factory.get(path), animation_id=str(animation.uuid))
+            return time.monotonic() - started
+
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            latencies = list(pool.map(request, [started] * options['requests']))
+        return time.monotonic() - started, latencies
+
+    async def run_async(self, animation, options):
+        """All requests share one event loop and the pooled backend client."""
+        view = AsyncAnimationStatus.as_view()
+        factory = AsyncRequestFactory()
+        path = f'/animate/api/animation/status/{animation.uuid}/'
+
+        async def request(started):
+            await view(factory.get(path), animation_id=str(animation.uuid))
+            return time.monotonic() - started
+
+        started = time.monotonic()
+        latencies = await asyncio.gather(*(request(started) for _ in range(options['requests'])))
+        elapsed = time.monotonic() - started
+        await backend.async_client().aclose()
+        return elapsed, latencies
+
+    def report(self, label, elapsed, latencies):
+        latencies = sorted(latencies)
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        self.stdout.write(self.style.SUCCESS(
+            f"  {label}: {elapsed:.1f}s total, {len(latencies) / elapsed:.1f} req/s, "
+            f"p50 {statistics.median(latencies):.2f}s, p95 {p95:.2f}s"
+        ))
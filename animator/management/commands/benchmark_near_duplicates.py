@@ -0,0 +1,165 @@
+import math
+import random
+import statistics
+import time
+from collections import Counter
+from io import BytesIO
+from itertools import combinations
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from PIL import Image, ImageDraw
+
+from animator.models import Animation
+import config
+
+
+class Command(BaseCommand):
+    help = ('Time near-duplicate lookups against a table of input hashes of generated drawings '
+            '(rolled back afterwards)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--drawings', type=int, default=2000,
+                            help='Distinct drawings to generate and hash (default: 2000)')
+        parser.add_argument('--rows', type=int, default=1_000_000, help='Hashes to index (default: 1000000)')
+        parser.add_argument('--owners', type=int, default=100_000, help='Sessions the rows belong to (default: 100000)')
+        parser.add_argument('--ips', type=int, default=50_000, help='IP addresses the sessions share (default: 50000)')
+        parser.add_argument('--lookups', type=int, default=1000, help='Lookups to time (default: 1000)')
+        parser.add_argument('--distance', type=int, default=config.NEAR_DUPLICATE_DISTANCE,
+                            help=f'Max differing bits (default: NEAR_DUPLICATE_DISTANCE = {config.NEAR_DUPLICATE_DISTANCE})')
+        parser.add_argument('--batch-size', type=int, default=10_000)
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        drawings = self.hash_drawings(rng, options)
+        self.report_collisions(drawings, options['distance'])
+
+        with transaction.atomic():
+            rows = self.populate(rng, drawings, options)
+            self.stdout.write(f"{options['rows']} hashes indexed for {options['owners']} owners, "
+                              f"max distance {options['distance']}")
+
+            # Re-photographed copies of indexed drawings, looked up by their owner and across everyone
+            lookups = [(self.perturb(rng, value, options['distance']), owner)
+                       for value, owner in rng.sample(rows, min(options['lookups'], len(rows)))]
+            everyone = Animation.objects.all()
+            distance = options['distance']
+            self.time_lookups('across owners', [
+                lambda value=value: Animation.find_similar_inputs(value, everyone, distance) for value, _ in lookups
+            ])
+            self.time_lookups('own uploads', [
+                lambda value=value, owner=owner: Animation.find_similar_inputs(
+                    value, Animation.objects.filter(session_key=owner), distance,
+                ) for value, owner in lookups
+            ])
+            self.time_lookups('resubmission check', [
+                lambda value=value, owner=owner: Animation.is_resubmission_abuse(
+                    value, session_key=owner, ip_address=self.owner_ip(owner, options['ips']),
+                ) for value, owner in lookups
+            ])
+            transaction.set_rollback(True)
+
+    def hash_drawings(self, rng, options):
+        """dHashes of distinct generated drawings, through the upload pipeline."""
+        hashes, started = [], time.perf_counter()
+        while len(hashes) < options['drawings']:
+            data = self.drawing(rng)
+            value = Animation.detect_dhash(data, Animation.detect_crop(data))
+            if value is not None:
+                hashes.append(value)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"{len(hashes)} drawings hashed in {elapsed:.1f}s "
+                          f"({elapsed / len(hashes) * 1000:.1f}ms each)")
+        return hashes
+
+    def report_collisions(self, hashes, distance):
+        """How often different drawings land within `distance`, and how skewed the segment indexes are."""
+        distances = [(a ^ b).bit_count() for a, b in combinations(hashes, 2)]
+        within = sum(d <= distance for d in distances)
+        self.stdout.write(
+            f"  different drawings within {distance} bits: {within} of {len(distances)} pairs "
+            f"(closest {min(distances)}, median {statistics.median(distances):.0f})"
+        )
+        buckets = Counter(
+            (field, segment) for value in hashes for field, segment in Animation.dhash_fields(value).items()
+        )
+        (field, segment), size = buckets.most_common(1)[0]
+        self.stdout.write(f"  largest segment bucket: {size} of {len(hashes)} drawings share {field} = {segment}")
+
+    def time_lookups(self, label, lookups):
+        latencies = []
+        for lookup in lookups:
+            started = time.perf_counter()
+            lookup()
+            latencies.append(time.perf_counter() - started)
+        latencies.sort()
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        self.stdout.write(self.style.SUCCESS(
+            f"  {label}: p50 {statistics.median(latencies) * 1000:.2f}ms, p95 {p95 * 1000:.2f}ms"
+        ))
+
+    @staticmethod
+    def owner_ip(owner, ips):
+        number = int(owner.rsplit('-', 1)[1]) % ips
+        return f'10.{number >> 16 & 255}.{number >> 8 & 255}.{number & 255}'
+
+    def populate(self, rng, drawings, options):
+        """Rows of (possibly re-photographed) drawings; returns (hash, owner) per row."""
+        rows = []
+        for start in range(0, options['rows'], options['batch_size']):
+            batch = []
+            for _ in range(min(options['batch_size'], options['rows'] - start)):
+                value = self.perturb(rng, rng.choice(drawings), options['distance'])
+                owner = f"benchmark-{rng.randrange(options['owners'])}"
+                rows.append((value, owner))
+                batch.append(Animation(
+                    session_key=owner, ip_address=self.owner_ip(owner, options['ips']),
+                    status=Animation.COMPLETED, **Animation.dhash_fields(value),
+                ))
+            Animation.objects.bulk_create(batch)
+        return rows
+
+    @staticmethod
+    def perturb(rng, value, distance):
+        for bit in rng.sample(range(64), rng.randint(0, distance)):
+            value ^= 1 << bit
+        return value
+
+    @staticmethod
+    def drawing(rng):
+        """A child's stick figure in a random pose and place, sometimes with a sun or a house, as a JPEG."""
+        width, height = rng.choice([(800, 600), (600, 800), (1024, 768)])
+        paper = tuple(rng.randint(225, 255) for _ in range(3))
+        image = Image.new('RGB', (width, height), paper)
+        draw = ImageDraw.Draw(image)
+        ink = tuple(rng.randint(0, 90) for _ in range(3))
+        line = rng.randint(3, 9)
+
+        size = rng.uniform(0.35, 0.8) * height
+        cx, top = rng.uniform(0.3, 0.7) * width, rng.uniform(0.05, 0.95 - size / height) * height
+        head = size * rng.uniform(0.1, 0.18)
+        neck, hip = top + 2 * head, top + size * rng.uniform(0.55, 0.65)
+        draw.ellipse((cx - head, top, cx + head, neck), outline=ink, width=line)
+        draw.line((cx, neck, cx, hip), fill=ink, width=line)
+        shoulder = neck + (hip - neck) * rng.uniform(0.1, 0.3)
+        for side in (-1, 1):
+            for base, length in ((shoulder, size * 0.3), (hip, size * 0.4)):
+                angle = math.radians(rng.uniform(10, 170))
+                end = (cx + side * length * abs(math.cos(angle)), base + length * math.sin(angle) * rng.choice([1, -1]))
+                draw.line((cx, base, *end), fill=ink, width=line)
+
+        if rng.random() < 0.4:
+            r = rng.uniform(0.05, 0.1) * width
+            sx, sy = rng.choice([r * 1.5, width - r * 1.5]), r * 1.5
+            draw.ellipse((sx - r, sy - r, sx + r, sy + r), outline=ink, width=line)
+        if rng.random() < 0.3:
+            left = rng.choice([0.05, 0.7]) * width
+            side_length = rng.uniform(0.15, 0.25) * width
+            floor = height * rng.uniform(0.75, 0.95)
+            draw.rectangle((left, floor - side_length, left + side_length, floor), outline=ink, width=line)
+            draw.line((left, floor - side_length, left + side_length / 2, floor - side_length * 1.6,
+                       left + side_length, floor - side_length), fill=ink, width=line)
+
+        buffer = BytesIO()
+        image.save(buffer, format='JPEG', quality=rng.randint(60, 95))
+        return buffer.getvalue()
@@ -45,17 +45,23 @@ class Command(BaseCommand):
         deleted_total = 0
         files_deleted = 0
         while True:
-            batch = list(candidates[:batch_size])
+            batch = list(candidates.prefetch_related('variants')[:batch_size])
             if not batch:
                 break
 
             for animation in batch:
-                # Delete actual files from disk
-                for field in [animation.input_image, animation.output_file, animation.thumbnail]:
+                # Release file references; shared content is only removed
+                # from disk with its last reference
+                files = [
+                    animation.input_image, animation.output_file, animation.watermarked_file,
+                    animation.thumbnail, animation.wiggle_preview,
+                ]
+                files += [variant.file for variant in animation.variants.all()]
+                for field in files:
                     if field and field.name:
                         try:
-                            field.delete(save=False)
-                            files_deleted += 1
+                            if field.storage.delete(field.name) is not False:
+                                files_deleted += 1
                         except Exception:
                             pass
 
@@ -0,0 +1,105 @@
+import os
+
+from django.core.management.base import BaseCommand
+from django.db import models, transaction
+
+from animator.models import Animation, Blob, cas_storage
+
+
+class Command(BaseCommand):
+    help = 'Move existing animation files into the content-addressed layout, merging duplicates'
+
+    # output_file now lives in private storage and was never written before it
+    FIELDS = ('input_image', 'thumbnail')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Show what would be moved without changing anything')
+        parser.add_argument('--batch-size', type=int, default=500, help='Process animations in batches of N (default: 500)')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        prefix = f"{cas_storage.PREFIX}/"
+        # Old name -> new name, for rows that share a file
+        moved = {}
+        counts = {'moved': 0, 'deduplicated': 0, 'missing': 0}
+
+        legacy = models.Q()
+        for field in self.FIELDS:
+            legacy |= ~models.Q(**{field: ''}) & ~models.Q(**{f'{field}__startswith': prefix})
+        queryset = Animation.objects.filter(legacy).order_by('id')
+
+        last_id = 0
+        while True:
+            batch = list(queryset.filter(id__gt=last_id)[:options['batch_size']])
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            linked = len(moved)
+            for animation in batch:
+                updates = {}
+                for field in self.FIELDS:
+                    old_name = getattr(animation, field).name
+                    if not old_name or old_name.startswith(prefix):
+                        continue
+                    new_name = self.migrate_file(old_name, moved, counts, dry_run)
+                    if new_name:
+                        updates[field] = new_name
+                if updates and not dry_run:
+                    Animation.objects.filter(pk=animation.pk).update(**updates)
+
+            # Old names are only removed once the rows point at the new ones
+            if not dry_run:
+                for old_name in list(moved)[linked:]:
+                    os.remove(cas_storage.path(old_name))
+
+            self.stdout.write(f"  Processed up to animation {last_id}: {counts}")
+
+        summary = ', '.join(f"{key}={value}" for key, value in counts.items())
+        if dry_run:
+            self.stdout.write(self.style.WARNING(f"DRY RUN - {summary}"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Content-addressed storage: {summary}"))
+
+    def migrate_file(self, old_name, moved, counts, dry_run):
+        """
+        Link one legacy file to its content-addressed name and take a reference.
+
+        The old name is left in place (and removed after the rows are
+        updated), so an interrupted run never leaves a row without its file.
+
+        Returns:
+            The new name, or None if the file is missing
+        """
+        if old_name in moved:
+            new_name = moved[old_name]
+            if not dry_run:
+                cas_storage.add_reference(new_name)
+            counts['deduplicated'] += 1
+            return new_name
+
+        if not cas_storage.exists(old_name):
+            counts['missing'] += 1
+            return None
+
+        with cas_storage.open(old_name) as f:
+            new_name = cas_storage.blob_name(cas_storage.hash_content(f), old_name)
+        moved[old_name] = new_name
+
+        if dry_run:
+            counts['deduplicated' if cas_storage.exists(new_name) else 'moved'] += 1
+            return new_name
+
+        old_path = cas_storage.path(old_name)
+        with transaction.atomic():
+            blob, _ = Blob.objects.select_for_update().get_or_create(
+                name=new_name, defaults={'size': os.path.getsize(old_path)},
+            )
+            if cas_storage.exists(new_name):
+                counts['deduplicated'] += 1
+            else:
+                os.makedirs(os.path.dirname(cas_storage.path(new_name)), exist_ok=True)
+                os.link(old_path, cas_storage.path(new_name))
+                counts['moved'] += 1
+            Blob.objects.filter(pk=blob.pk).update(ref_count=models.F('ref_count') + 1)
+        return new_name
@@ -0,0 +1,79 @@
+import logging
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from animator import backend
+from animator.models import Animation
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Complete or fail animations stuck in PENDING/PROCESSING past their expected processing time'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Show what would be reaped without changing anything')
+        parser.add_argument('--limit', type=int, default=1000, help='Check at most N animations per run (default: 1000)')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        now = timezone.now()
+
+        # Cheap prefilter; the per-settings timeout is applied below
+        cutoff = now - timedelta(seconds=config.REAPER_MIN_TIMEOUT)
+        candidates = Animation.objects.filter(
+            status__in=[Animation.PENDING, Animation.PROCESSING],
+            created_at__lt=cutoff,
+        ).exclude(queued_at__gte=cutoff).order_by('created_at')[:options['limit']]
+
+        counts = {'checked': 0, 'completed': 0, Animation.REASON_TIMEOUT: 0,
+                  Animation.REASON_BACKEND_ERROR: 0, Animation.REASON_NEVER_DISPATCHED: 0}
+
+        for animation in candidates:
+            # Requeued animations are timed from their new dispatch, not their first one
+            age = (now - (animation.started_at or animation.queued_at or animation.created_at)).total_seconds()
+            if age < animation.get_stuck_timeout():
+                continue
+
+            counts['checked'] += 1
+            outcome = self.resolve(animation, dry_run)
+            counts[outcome] += 1
+            self.stdout.write(f"  {animation.uuid}: {outcome} after {int(age)}s")
+
+        reaped = sum(counts[reason] for reason, _ in Animation.FAILURE_REASON_CHOICES)
+        summary = ', '.join(f"{key}={value}" for key, value in counts.items())
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING(f"DRY RUN - {summary}"))
+            return
+
+        cache.set('reaper:last_run', {'at': now.isoformat(), **counts}, timeout=None)
+        if reaped > config.REAPER_ALERT_THRESHOLD:
+            logger.warning("Reaped %s stuck animations (%s)", reaped, summary)
+        self.stdout.write(self.style.SUCCESS(f"Reaper: {summary}"))
+
+    def resolve(self, animation, dry_run):
+        """Re-check one animation with the backend once and settle it. Returns the outcome key."""
+        if not animation.api_request_id:
+            outcome = Animation.REASON_NEVER_DISPATCHED
+            error = 'Animation was never dispatched to the backend'
+        else:
+            result = backend.check_api_status(animation.api_request_id) or {}
+            if result.get('done') and result.get('output_url'):
+                if not dry_run:
+                    animation.mark_completed(result['output_url'], result.get('gpu_seconds'))
+                return 'completed'
+            elif result.get('failed'):
+                outcome = Animation.REASON_BACKEND_ERROR
+                error = result.get('error', 'Processing failed')
+            else:
+                outcome = Animation.REASON_TIMEOUT
+                error = 'Animation timed out'
+
+        if not dry_run:
+            animation.mark_failed(error, outcome)
+        return outcome
@@ -0,0 +1,113 @@
+import os
+import time
+
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from animator import backend, imaging
+from animator.models import Animation, AnimationPreset, PresetDemo
+
+
+class Command(BaseCommand):
+    help = 'Render each active preset once on sample drawings and store looping previews for preset cards'
+
+    SAMPLE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--samples', required=True, help='Directory of sample drawings (png, jpg or webp)')
+        parser.add_argument('--preset', help='Only render this preset code_name')
+        parser.add_argument('--force', action='store_true', help='Re-render demos that already exist')
+        parser.add_argument('--width', type=int, default=240, help='Preview width in pixels (default: 240)')
+        parser.add_argument('--timeout', type=int, default=300, help='Seconds to wait for each render (default: 300)')
+        parser.add_argument('--interval', type=int, default=3, help='Seconds between status checks (default: 3)')
+
+    def handle(self, *args, **options):
+        samples_dir = options['samples']
+        if not os.path.isdir(samples_dir):
+            raise CommandError(f"Samples directory not found: {samples_dir}")
+
+        samples = sorted(
+            name for name in os.listdir(samples_dir)
+            if name.lower().endswith(self.SAMPLE_EXTENSIONS)
+        )
+        if not samples:
+            raise CommandError(f"No sample drawings in {samples_dir}")
+
+        presets = AnimationPreset.objects.filter(is_active=True)
+        if options['preset']:
+            presets = presets.filter(code_name=options['preset'])
+
+        rendered = 0
+        skipped = 0
+        failed = 0
+        for preset in presets:
+            for sample in samples:
+                sample_name = os.path.splitext(sample)[0]
+                if not options['force'] and PresetDemo.objects.filter(preset=preset, sample_name=sample_name).exists():
+                    skipped += 1
+                    continue
+
+                self.stdout.write(f"Rendering {preset.code_name} on {sample_name}...")
+                try:
+                    output = self.render(preset, os.path.join(samples_dir, sample), options)
+                except Exception as e:
+                    self.stdout.write(self.style.ERROR(f"  Failed: {e}"))
+                    failed += 1
+                    continue
+
+                demo, _ = PresetDemo.objects.get_or_create(preset=preset, sample_name=sample_name)
+                for field in [demo.preview, demo.thumbnail]:
+                    if field and field.name:
+                        field.delete(save=False)
+                demo.preview.save(
+                    f"{preset.code_name}-{sample_name}.webp",
+                    ContentFile(imaging.make_preview(output, options['width'])),
+                    save=False,
+                )
+                demo.thumbnail.save(
+                    f"{preset.code_name}-{sample_name}-thumb.webp",
+                    ContentFile(imaging.make_thumbnail(output, options['width'])),
+                    save=False,
+                )
+                demo.placeholder = imaging.make_placeholder(output)
+                demo.created_at = timezone.now()
+                demo.save()
+                rendered += 1
+
+        PresetDemo.clear_cache()
+        self.stdout.write(self.style.SUCCESS(f"Preset demos: {rendered} rendered, {skipped} skipped, {failed} failed"))
+
+    def render(self, preset, sample_path, options):
+        """Run one GIF render through the backend and return the output bytes."""
+        with open(sample_path, 'rb') as f:
+            animation = Animation.objects.create(
+                input_image=File(f, name=os.path.basename(sample_path)),
+                preset=preset,
+                output_format=Animation.FORMAT_GIF,
+                add_watermark=False,
+                session_key='preset-demo',
+                status=Animation.PENDING,
+            )
+
+        result = backend.send_to_api(animation)
+        if not result.get('success'):
+            animation.mark_failed(result.get('error', 'Unknown error'))
+            raise CommandError(animation.error_message)
+
+        animation.mark_processing(result.get('request_id', ''))
+
+        deadline = time.monotonic() + options['timeout']
+        while time.monotonic() < deadline:
+            time.sleep(options['interval'])
+            status = backend.check_api_status(animation.api_request_id) or {}
+            if status.get('done'):
+                animation.mark_completed(status.get('output_url', ''), status.get('gpu_seconds'))
+                return backend.download_output(animation.output_url)
+            if status.get('failed'):
+                animation.mark_failed(status.get('error', 'Processing failed'), Animation.REASON_BACKEND_ERROR)
+                raise CommandError(animation.error_message)
+
+        animation.mark_failed('Timed out waiting for the backend', Animation.REASON_TIMEOUT)
+        raise CommandError(animation.error_message)
@@ -0,0 +1,46 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from animator import tasks
+from animator.models import Animation
+import config
+
+
+class Command(BaseCommand):
+    help = 'Requeue animations that failed with retryable errors onto the low-priority RQ queue'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Show what would be requeued without requeuing')
+        parser.add_argument('--error-class', action='append', choices=list(Animation.RETRYABLE_ERRORS),
+                            help='Only requeue this error class (repeatable, default: all retryable classes)')
+        parser.add_argument('--hours', type=float, default=24, help='Only failures created in the last N hours (default: 24)')
+        parser.add_argument('--batch-size', type=int, default=config.REQUEUE_BATCH_SIZE,
+                            help=f'Animations per batch (default: {config.REQUEUE_BATCH_SIZE})')
+        parser.add_argument('--interval', type=int, default=config.REQUEUE_BATCH_INTERVAL,
+                            help=f'Seconds between batches (default: {config.REQUEUE_BATCH_INTERVAL})')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        since = timezone.now() - timedelta(hours=options['hours'])
+        failures = Animation.retryable_failures(options['error_class'], since=since)
+
+        total = failures.count()
+        self.stdout.write(f"Found {total} retryable failures in the last {options['hours']:g} hours")
+        if total == 0:
+            self.stdout.write(self.style.SUCCESS("Nothing to requeue"))
+            return
+
+        if options['dry_run']:
+            for animation in failures[:20]:
+                self.stdout.write(f"  {animation.uuid} [{animation.error_class}] {animation.error_message[:80]}")
+            self.stdout.write(self.style.WARNING(f"DRY RUN - Would requeue {total} animations"))
+            return
+
+        requeued = tasks.requeue_failed(failures, options['batch_size'], options['interval'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Requeued {requeued} animations in batches of {options['batch_size']} every {options['interval']}s"
+        ))
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:08
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('animator', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='animation',
+            index=models.Index(fields=['status', 'preset', 'output_format', '-completed_at'], name='animator_an_status_9ded52_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('animator', '0002_animation_status_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='animation',
+            name='actual_cost',
+            field=models.FloatField(blank=True, help_text='Measured GPU-seconds', null=True),
+        ),
+        migrations.AddField(
+            model_name='animation',
+            name='estimated_cost',
+            field=models.FloatField(blank=True, help_text='Estimated GPU-seconds', null=True),
+        ),
+        migrations.AddField(
+            model_name='animation',
+            name='input_height',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='animation',
+            name='input_width',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='animationpreset',
+            name='cost_factor',
+            field=models.FloatField(default=1.0, help_text='Relative GPU cost of this motion (1.0 = walk)'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:12
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('animator', '0003_gpu_cost_model'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PresetDemo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sample_name', models.CharField(max_length=100)),
+                ('preview', models.FileField(upload_to='animations/demos/')),
+                ('thumbnail', models.ImageField(upload_to='animations/demos/')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('preset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='demos', to='animator.animationpreset')),
+            ],
+            options={
+                'ordering': ['preset__sort_order', 'sample_name'],
+                'unique_together': {('preset', 'sample_name')},
+            },
+        ),
+    ]
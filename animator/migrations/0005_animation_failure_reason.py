@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('animator', '0004_preset_demo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='animation',
+            name='failure_reason',
+            field=models.CharField(blank=True, choices=[('timeout', 'Timed out'), ('backend_error', 'Backend error'), ('never_dispatched', 'Never dispatched')], max_length=30),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:18
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('animator', '0005_animation_failure_reason'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnimationEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_status', models.CharField(blank=True, max_length=12)),
+                ('to_status', models.CharField(max_length=12)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('animation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='animator.animation')),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('animator', '0006_animation_event'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='animation',
+            name='callback_seq',
+            field=models.PositiveBigIntegerField(default=0, help_text='Last applied backend callback sequence number'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('animator', '0007_animation_callback_seq'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='animation',
+            name='input_sha256',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:34
+
+import animator.storage
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('animator', '0008_animation_input_sha256'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Blob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('size', models.PositiveBigIntegerField(default=0)),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='animation',
+            name='input_image',
+            field=models.ImageField(storage=animator.storage.ContentAddressedStorage(), upload_to='animations/inputs/%Y/%m/'),
+        ),
+        migrations.AlterField(
+            model_name='animation',
+            name='output_file',
+            field=models.FileField(blank=True, storage=animator.storage.ContentAddressedStorage(), upload_to='animations/outputs/%Y/%m/'),
+        ),
+        migrations.AlterField(
+            model_name='animation',
+            name='thumbnail',
+            field=models.ImageField(blank=True, storage=animator.storage.ContentAddressedStorage(), upload_to='animations/thumbnails/%Y/%m/'),
+        ),
+    ]
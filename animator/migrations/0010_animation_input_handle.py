@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('animator', '0009_content_addressed_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='animation',
+            name='input_handle',
+            field=models.CharField(blank=True, help_text='Backend-side handle for the uploaded input', max_length=100),
+        ),
+    ]
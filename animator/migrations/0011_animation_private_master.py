@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:50
+
+import animator.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('animator', '0010_animation_input_handle'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='animation',
+            name='watermarked_file',
+            field=models.FileField(blank=True, storage=animator.storage.ContentAddressedStorage(), upload_to='animations/watermarked/%Y/%m/'),
+        ),
+        migrations.AlterField(
+            model_name='animation',
+            name='output_file',
+            field=models.FileField(blank=True, help_text='Unwatermarked master, only served through the download view', storage=animator.storage.PrivateContentAddressedStorage(), upload_to='animations/outputs/%Y/%m/'),
+        ),
+        migrations.AlterField(
+            model_name='animation',
+            name='output_url',
+            field=models.URLField(blank=True, help_text='Backend URL of the master; never shown to users'),
+        ),
+    ]
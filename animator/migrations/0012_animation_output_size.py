@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('animator', '0011_animation_private_master'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='animation',
+            name='output_original_size',
+            field=models.PositiveIntegerField(blank=True, help_text='Bytes as returned by the backend', null=True),
+        ),
+        migrations.AddField(
+            model_name='animation',
+            name='output_size',
+            field=models.PositiveIntegerField(blank=True, help_text='Bytes of the stored master, after optimization', null=True),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:56
+
+import animator.storage
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('animator', '0012_animation_output_size'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnimationVariant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('watermarked', models.BooleanField(help_text='Made from the watermarked file rather than the master')),
+                ('format', models.CharField(choices=[('webp', 'WebP'), ('avif', 'AVIF')], max_length=10)),
+                ('file', models.FileField(storage=animator.storage.PrivateContentAddressedStorage(), upload_to='animations/variants/%Y/%m/')),
+                ('size', models.PositiveIntegerField(help_text='Bytes')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('animation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='variants', to='animator.animation')),
+            ],
+            options={
+                'unique_together': {('animation', 'watermarked', 'format')},
+            },
+        ),
+    ]
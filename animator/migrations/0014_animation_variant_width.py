@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('animator', '0013_animation_variant'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='animationvariant',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='animationvariant',
+            name='width',
+            field=models.PositiveIntegerField(default=0, help_text='Rendition width in pixels; 0 for full size'),
+        ),
+        migrations.AlterField(
+            model_name='animationvariant',
+            name='format',
+            field=models.CharField(choices=[('webp', 'WebP'), ('avif', 'AVIF'), ('gif', 'GIF')], max_length=10),
+        ),
+        migrations.AlterUniqueTogether(
+            name='animationvariant',
+            unique_together={('animation', 'watermarked', 'format', 'width')},
+        ),
+    ]
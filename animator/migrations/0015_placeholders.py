@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('animator', '0014_animation_variant_width'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='animation',
+            name='placeholder',
+            field=models.TextField(blank=True, help_text='Tiny data: URI inlined in cards until the animation loads'),
+        ),
+        migrations.AddField(
+            model_name='presetdemo',
+            name='placeholder',
+            field=models.TextField(blank=True, help_text='Tiny data: URI inlined until the preview loads'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:04
+
+import animator.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('animator', '0015_placeholders'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='animation',
+            name='wiggle_preview',
+            field=models.FileField(blank=True, help_text='Quick CPU-made preview shown while the render is pending', storage=animator.storage.ContentAddressedStorage(), upload_to='animations/wiggles/%Y/%m/'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('animator', '0016_animation_wiggle_preview'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='animation',
+            name='crop_background',
+            field=models.CharField(blank=True, help_text='Paper colour found around the drawing', max_length=7),
+        ),
+        migrations.AddField(
+            model_name='animation',
+            name='crop_bottom',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='animation',
+            name='crop_left',
+            field=models.PositiveIntegerField(blank=True, help_text='Auto-crop box sent for rendering, in upright input pixels', null=True),
+        ),
+        migrations.AddField(
+            model_name='animation',
+            name='crop_right',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='animation',
+            name='crop_top',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='animation',
+            name='pad_output',
+            field=models.BooleanField(default=False, help_text='Pad a cropped render back to the uploaded framing (GIF)'),
+        ),
+    ]
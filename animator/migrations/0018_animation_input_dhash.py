@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('animator', '0017_animation_auto_crop'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='animation',
+            name='duplicate_of',
+            field=models.ForeignKey(blank=True, help_text='Earlier animation of a near-identical drawing whose output this one reuses', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='duplicates', to='animator.animation'),
+        ),
+        migrations.AddField(
+            model_name='animation',
+            name='flagged_resubmission',
+            field=models.BooleanField(db_index=True, default=False, help_text='The submitter sent near-identical drawings many times in a day'),
+        ),
+        migrations.AddField(
+            model_name='animation',
+            name='input_dhash_0',
+            field=models.PositiveIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='animation',
+            name='input_dhash_1',
+            field=models.PositiveIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='animation',
+            name='input_dhash_2',
+            field=models.PositiveIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='animation',
+            name='input_dhash_3',
+            field=models.PositiveIntegerField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('animator', '0018_animation_input_dhash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='animation',
+            name='queued_at',
+            field=models.DateTimeField(blank=True, help_text='When a requeued animation is due to be dispatched again', null=True),
+        ),
+    ]
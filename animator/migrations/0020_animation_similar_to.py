@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('animator', '0019_animation_queued_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='animation',
+            name='similar_to',
+            field=models.ForeignKey(blank=True, help_text="The submitter's earlier animation of a near-identical drawing, suggested to them", null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='animator.animation'),
+        ),
+        migrations.AlterField(
+            model_name='animation',
+            name='duplicate_of',
+            field=models.ForeignKey(blank=True, help_text='Earlier animation of the same upload whose output this one reuses', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='duplicates', to='animator.animation'),
+        ),
+        migrations.AlterField(
+            model_name='animation',
+            name='session_key',
+            field=models.CharField(blank=True, db_index=True, help_text='For anonymous users', max_length=100),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('animator', '0020_animation_similar_to'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='animation',
+            name='session_key',
+            field=models.CharField(blank=True, help_text='For anonymous users', max_length=100),
+        ),
+        migrations.AddIndex(
+            model_name='animation',
+            index=models.Index(fields=['user', 'created_at'], name='animator_an_user_id_953008_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='animation',
+            index=models.Index(fields=['session_key', 'created_at'], name='animator_an_session_78bb9b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='animation',
+            index=models.Index(fields=['ip_address', 'created_at'], name='animator_an_ip_addr_8e2376_idx'),
+        ),
+    ]
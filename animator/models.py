@@ -1,7 +1,29 @@
-from django.db import models
+import logging
+import math
+import os
+import re
+from datetime import timedelta
+from itertools import combinations
+
+import django_rq
+from django.core.cache import cache
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, models, transaction
+from django.db.models.functions import Coalesce
+from django.urls import reverse
 from django.utils import timezone
 from accounts.models import CustomUser
+from animator import backend, imaging
+from animator.dispatch import DispatchQueue
+from animator.storage import ContentAddressedStorage, PrivateContentAddressedStorage
 from app.utils import Utils
+import config
+
+logger = logging.getLogger(__name__)
+
+cas_storage = ContentAddressedStorage()
+private_storage = PrivateContentAddressedStorage()
 
 
 class AnimationPreset(models.Model):
@@ -14,6 +36,7 @@ class AnimationPreset(models.Model):
     is_premium = models.BooleanField(default=False)
     is_active = models.BooleanField(default=True)
     sort_order = models.IntegerField(default=0)
+    cost_factor = models.FloatField(default=1.0, help_text='Relative GPU cost of this motion (1.0 = walk)')
     created_at = models.DateTimeField(default=timezone.now)
 
     class Meta:
@@ -36,6 +59,29 @@ class Animation(models.Model):
         (FAILED, 'Failed'),
     )
 
+    # Allowed status transitions: from_status -> to_statuses
+    TRANSITIONS = {
+        PENDING: (PROCESSING, FAILED),
+        PROCESSING: (COMPLETED, FAILED),
+        FAILED: (PENDING,),
+    }
+
+    REASON_TIMEOUT = 'timeout'
+    REASON_BACKEND_ERROR = 'backend_error'
+    REASON_NEVER_DISPATCHED = 'never_dispatched'
+    FAILURE_REASON_CHOICES = (
+        (REASON_TIMEOUT, 'Timed out'),
+        (REASON_BACKEND_ERROR, 'Backend error'),
+        (REASON_NEVER_DISPATCHED, 'Never dispatched'),
+    )
+
+    # Transient failure classes that are safe to retry, matched against error_message
+    RETRYABLE_ERRORS = {
+        'connection': r'connection|refused|reset by peer|max retries|name resolution|unreachable',
+        'timeout': r'timed? ?out',
+        'overloaded': r'overload|busy|capacity|too many requests|50[234]',
+    }
+
     FORMAT_GIF = 'gif'
     FORMAT_MP4 = 'mp4'
     FORMAT_WEBM = 'webm'
@@ -50,35 +96,79 @@ class Animation(models.Model):
     session_key = models.CharField(max_length=100, blank=True, help_text='For anonymous users')
 
     # Input
-    input_image = models.ImageField(upload_to='animations/inputs/%Y/%m/')
+    input_image = models.ImageField(upload_to='animations/inputs/%Y/%m/', storage=cas_storage)
     input_image_url = models.URLField(blank=True)
+    input_width = models.PositiveIntegerField(null=True, blank=True)
+    input_height = models.PositiveIntegerField(null=True, blank=True)
+    input_sha256 = models.CharField(max_length=64, blank=True, db_index=True)
+    input_handle = models.CharField(max_length=100, blank=True, help_text='Backend-side handle for the uploaded input')
+    crop_left = models.PositiveIntegerField(null=True, blank=True, help_text='Auto-crop box sent for rendering, in upright input pixels')
+    crop_top = models.PositiveIntegerField(null=True, blank=True)
+    crop_right = models.PositiveIntegerField(null=True, blank=True)
+    crop_bottom = models.PositiveIntegerField(null=True, blank=True)
+    crop_background = models.CharField(max_length=7, blank=True, help_text='Paper colour found around the drawing')
+    # 64-bit dHash of the drawing in four 16-bit segments, each indexed (see find_similar_inputs)
+    input_dhash_0 = models.PositiveIntegerField(null=True, blank=True, db_index=True)
+    input_dhash_1 = models.PositiveIntegerField(null=True, blank=True, db_index=True)
+    input_dhash_2 = models.PositiveIntegerField(null=True, blank=True, db_index=True)
+    input_dhash_3 = models.PositiveIntegerField(null=True, blank=True, db_index=True)
+    duplicate_of = models.ForeignKey(
+        'self', on_delete=models.SET_NULL, null=True, blank=True, related_name='duplicates',
+        help_text='Earlier animation of the same upload whose output this one reuses',
+    )
+    similar_to = models.ForeignKey(
+        'self', on_delete=models.SET_NULL, null=True, blank=True, related_name='+',
+        help_text="The submitter's earlier animation of a near-identical drawing, suggested to them",
+    )
+    flagged_resubmission = models.BooleanField(
+        default=False, db_index=True, help_text='The submitter sent near-identical drawings many times in a day',
+    )
 
     # Processing settings
     preset = models.ForeignKey(AnimationPreset, on_delete=models.SET_NULL, null=True)
     output_format = models.CharField(max_length=10, choices=FORMAT_CHOICES, default=FORMAT_GIF)
+    pad_output = models.BooleanField(default=False, help_text='Pad a cropped render back to the uploaded framing (GIF)')
     duration = models.FloatField(default=3.0, help_text='Animation duration in seconds')
     fps = models.IntegerField(default=24)
     loop = models.BooleanField(default=True)
     add_watermark = models.BooleanField(default=True)
 
     # Output
-    output_file = models.FileField(upload_to='animations/outputs/%Y/%m/', blank=True)
-    output_url = models.URLField(blank=True)
-    thumbnail = models.ImageField(upload_to='animations/thumbnails/%Y/%m/', blank=True)
+    output_file = models.FileField(
+        upload_to='animations/outputs/%Y/%m/', storage=private_storage, blank=True,
+        help_text='Unwatermarked master, only served through the download view',
+    )
+    watermarked_file = models.FileField(upload_to='animations/watermarked/%Y/%m/', storage=cas_storage, blank=True)
+    output_original_size = models.PositiveIntegerField(null=True, blank=True, help_text='Bytes as returned by the backend')
+    output_size = models.PositiveIntegerField(null=True, blank=True, help_text='Bytes of the stored master, after optimization')
+    output_url = models.URLField(blank=True, help_text='Backend URL of the master; never shown to users')
+    thumbnail = models.ImageField(upload_to='animations/thumbnails/%Y/%m/', storage=cas_storage, blank=True)
+    placeholder = models.TextField(blank=True, help_text='Tiny data: URI inlined in cards until the animation loads')
+    wiggle_preview = models.FileField(
+        upload_to='animations/wiggles/%Y/%m/', storage=cas_storage, blank=True,
+        help_text='Quick CPU-made preview shown while the render is pending',
+    )
 
     # Status tracking
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
     progress = models.IntegerField(default=0, help_text='Progress percentage 0-100')
     error_message = models.TextField(blank=True)
+    failure_reason = models.CharField(max_length=30, choices=FAILURE_REASON_CHOICES, blank=True)
     job_id = models.CharField(max_length=100, blank=True, help_text='Background job ID')
+    callback_seq = models.PositiveBigIntegerField(default=0, help_text='Last applied backend callback sequence number')
 
     # API tracking
     api_request_id = models.CharField(max_length=100, blank=True)
 
+    # GPU cost accounting
+    estimated_cost = models.FloatField(null=True, blank=True, help_text='Estimated GPU-seconds')
+    actual_cost = models.FloatField(null=True, blank=True, help_text='Measured GPU-seconds')
+
     # Timestamps
     created_at = models.DateTimeField(default=timezone.now)
     started_at = models.DateTimeField(null=True, blank=True)
     completed_at = models.DateTimeField(null=True, blank=True)
+    queued_at = models.DateTimeField(null=True, blank=True, help_text='When a requeued animation is due to be dispatched again')
 
     # Analytics
     ip_address = models.GenericIPAddressField(null=True, blank=True)
@@ -86,6 +176,13 @@ class Animation(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'preset', 'output_format', '-completed_at']),
+            # A submitter's recent animations (daily budgets, near-duplicate lookups)
+            models.Index(fields=['user', 'created_at']),
+            models.Index(fields=['session_key', 'created_at']),
+            models.Index(fields=['ip_address', 'created_at']),
+        ]
 
     def __str__(self):
         return f"Animation {self.uuid[:8]} - {self.status}"
@@ -97,6 +194,854 @@ class Animation(models.Model):
             return (self.completed_at - self.started_at).total_seconds()
         return None
 
+    def estimate_progress(self, now=None):
+        """
+        Estimate progress and remaining time for an in-flight animation.
+
+        Uses the progress reported by the backend callback when there is one,
+        otherwise compares elapsed time against historical processing times
+        for the same settings: progress climbs linearly to 60% at the median
+        and 90% at p90, then approaches 95%. It never goes backwards, and
+        the ETA follows from it the same way as for reported progress.
+
+        Returns:
+            Tuple of (progress percentage, ETA in seconds)
+        """
+        now = now or timezone.now()
+        elapsed = max(0.0, (now - (self.started_at or self.created_at)).total_seconds())
+
+        if self.progress > 0:
+            progress = min(self.progress, 99)
+        else:
+            stats = Animation.get_processing_stats(self.preset_id, self.output_format, self.duration, self.fps)
+            p50, p90 = stats['p50'], max(stats['p90'], stats['p50'])
+            if not p50:
+                return 0, 1.0
+            if elapsed <= p50:
+                progress = 60 * elapsed / p50
+            elif elapsed < p90:
+                progress = 60 + 30 * (elapsed - p50) / (p90 - p50)
+            else:
+                progress = 95 - 5 * math.exp(-(elapsed - p90) / p50)
+            if not progress:
+                return 0, round(max(p50 * 5 / 3, 1.0), 1)
+
+        eta = elapsed * (100 - progress) / progress
+        return int(progress), round(max(eta, 1.0), 1)
+
+    def get_stuck_timeout(self):
+        """Seconds after which an unfinished animation with these settings is considered abandoned."""
+        stats = Animation.get_processing_stats(self.preset_id, self.output_format, self.duration, self.fps)
+        return max(config.REAPER_MIN_TIMEOUT, stats['p90'] * config.REAPER_TIMEOUT_MULTIPLIER)
+
+    @staticmethod
+    def get_processing_stats(preset_id, output_format, duration, fps):
+        """
+        Rolling processing-time statistics for a combination of settings.
+
+        Computed from the most recent completed animations and cached for
+        ANIMATION_STATS_TTL seconds. Falls back to ANIMATION_EXPECTED_SECONDS
+        when there is no history yet.
+
+        Returns:
+            Dict with count, mean, p50 and p90 (seconds)
+        """
+        cache_key = f'animation_stats:{preset_id}:{output_format}:{duration}:{fps}'
+        stats = cache.get(cache_key)
+        if stats is not None:
+            return stats
+
+        rows = Animation.objects.filter(
+            status=Animation.COMPLETED,
+            preset_id=preset_id,
+            output_format=output_format,
+            duration=duration,
+            fps=fps,
+            started_at__isnull=False,
+            completed_at__isnull=False,
+        ).order_by('-completed_at').values_list('started_at', 'completed_at')[:config.ANIMATION_STATS_SAMPLE]
+
+        times = sorted((completed - started).total_seconds() for started, completed in rows)
+        if times:
+            stats = {
+                'count': len(times),
+                'mean': sum(times) / len(times),
+                'p50': times[len(times) // 2],
+                'p90': times[min(len(times) - 1, int(len(times) * 0.9))],
+            }
+        else:
+            default = float(config.ANIMATION_EXPECTED_SECONDS)
+            stats = {'count': 0, 'mean': default, 'p50': default, 'p90': default * 1.5}
+
+        cache.set(cache_key, stats, timeout=config.ANIMATION_STATS_TTL)
+        return stats
+
+    def is_owned_by(self, user, session_key):
+        if user and user.is_authenticated and self.user_id == user.id:
+            return True
+        return bool(session_key) and self.session_key == session_key
+
+    @property
+    def crop_box(self):
+        """(left, top, right, bottom) of the input sent for rendering, or None when uncropped."""
+        if self.crop_left is None:
+            return None
+        return self.crop_left, self.crop_top, self.crop_right, self.crop_bottom
+
+    @staticmethod
+    def detect_crop(data):
+        """
+        Crop fields for a new upload: the blank paper around the drawing is cut
+        off before rendering. Empty when auto-crop is off or finds nothing to
+        cut.
+        """
+        if not config.AUTO_CROP:
+            return {}
+        try:
+            found = imaging.find_content_box(
+                data, margin=config.AUTO_CROP_MARGIN, min_saving=config.AUTO_CROP_MIN_SAVING,
+            )
+        except Exception as e:
+            logger.warning("Auto-crop failed: %s", e)
+            return {}
+        if not found:
+            return {}
+        (left, top, right, bottom), background = found
+        return {
+            'crop_left': left, 'crop_top': top, 'crop_right': right, 'crop_bottom': bottom,
+            'crop_background': background,
+        }
+
+    @staticmethod
+    def detect_dhash(data, crop):
+        """dHash of a new upload's drawing (within its crop), or None if it's flat or can't be read."""
+        box = None
+        if crop:
+            box = (crop['crop_left'], crop['crop_top'], crop['crop_right'], crop['crop_bottom'])
+        try:
+            return imaging.dhash(data, box)
+        except Exception as e:
+            logger.warning("Could not hash upload: %s", e)
+            return None
+
+    @property
+    def input_dhash(self):
+        """The drawing's 64-bit dHash, or None."""
+        return Animation.join_dhash([getattr(self, field) for field in Animation.DHASH_FIELDS])
+
+    def crop_fields(self):
+        """This animation's crop, for a new row re-rendering the same drawing."""
+        return {field: getattr(self, field) for field in ('crop_left', 'crop_top', 'crop_right', 'crop_bottom', 'crop_background')}
+
+    DHASH_SEGMENTS = 4
+    DHASH_SEGMENT_BITS = 16
+    DHASH_FIELDS = tuple(f'input_dhash_{i}' for i in range(DHASH_SEGMENTS))
+
+    @staticmethod
+    def dhash_fields(value):
+        """The input_dhash_* segment values of a 64-bit dHash, for create() or filter()."""
+        bits, mask = Animation.DHASH_SEGMENT_BITS, (1 << Animation.DHASH_SEGMENT_BITS) - 1
+        return {
+            field: (value >> (bits * (Animation.DHASH_SEGMENTS - 1 - i))) & mask
+            for i, field in enumerate(Animation.DHASH_FIELDS)
+        }
+
+    @staticmethod
+    def join_dhash(segments):
+        """A 64-bit dHash from its segments, or None if it was never computed."""
+        if segments[0] is None:
+            return None
+        value = 0
+        for segment in segments:
+            value = (value << Animation.DHASH_SEGMENT_BITS) | segment
+        return value
+
+    @staticmethod
+    def segment_neighbours(segment, flips):
+        """All segment values within `flips` bits of segment."""
+        values = [segment]
+        for count in range(1, flips + 1):
+            for bits in combinations(range(Animation.DHASH_SEGMENT_BITS), count):
+                flipped = segment
+                for bit in bits:
+                    flipped ^= 1 << bit
+                values.append(flipped)
+        return values
+
+    @staticmethod
+    def find_similar_inputs(value, queryset, max_distance):
+        """
+        Animations in queryset whose input dHash is within max_distance bits of value.
+
+        Multi-index hashing: two hashes that differ in at most max_distance
+        bits differ in at most max_distance // DHASH_SEGMENTS bits in one of
+        the segments (pigeonhole). Candidates come from index lookups of each
+        segment's near values; only they get the exact Hamming check, and
+        without building model instances.
+
+        Returns:
+            List of (pk, distance), closest first
+        """
+        flips = max_distance // Animation.DHASH_SEGMENTS
+        condition = models.Q(_connector=models.Q.OR, **{
+            f'{field}__in': Animation.segment_neighbours(segment, flips)
+            for field, segment in Animation.dhash_fields(value).items()
+        })
+
+        matches = []
+        # No default ORDER BY: matches are ranked by distance below
+        candidates = queryset.filter(condition).order_by().values_list('pk', *Animation.DHASH_FIELDS)
+        for pk, *segments in candidates:
+            distance = (Animation.join_dhash(segments) ^ value).bit_count()
+            if distance <= max_distance:
+                matches.append((pk, distance))
+        return sorted(matches, key=lambda match: match[1])
+
+    @staticmethod
+    def find_reusable_output(sha256, preset, output_format, duration, fps, pad_output):
+        """
+        A recent completed animation of the very same file with the same
+        settings and a stored master, or None.
+
+        Only byte-identical uploads are reused across owners: a 64-bit dHash
+        does not tell apart drawings that merely share a layout (stick
+        figures routinely land within a few bits of each other), and a false
+        match would hand one user another's animation.
+        """
+        if not sha256:
+            return None  # Legacy and demo rows were stored without a hash
+        return Animation.objects.filter(
+            input_sha256=sha256, status=Animation.COMPLETED, preset=preset, output_format=output_format,
+            duration=duration, fps=fps, pad_output=pad_output,
+            completed_at__gte=timezone.now() - timedelta(days=config.NEAR_DUPLICATE_REUSE_DAYS),
+        ).exclude(output_file='').order_by('-completed_at').first()
+
+    @staticmethod
+    def find_similar_owned(value, user=None, session_key=None):
+        """
+        The submitter's own recent completed animation of a near-identical
+        drawing, closest first, or None. Only ever suggested to them, never
+        reused (see find_reusable_output).
+        """
+        if user and user.is_authenticated:
+            owned = Animation.objects.filter(user=user)
+        elif session_key:
+            owned = Animation.objects.filter(session_key=session_key)
+        else:
+            return None
+        candidates = owned.filter(
+            status=Animation.COMPLETED,
+            completed_at__gte=timezone.now() - timedelta(days=config.NEAR_DUPLICATE_REUSE_DAYS),
+        ).exclude(output_file='')
+        matches = Animation.find_similar_inputs(value, candidates, config.NEAR_DUPLICATE_DISTANCE)
+        if not matches:
+            return None
+        return Animation.objects.filter(pk=matches[0][0]).first()
+
+    @staticmethod
+    def is_resubmission_abuse(value, user=None, session_key=None, ip_address=None):
+        """
+        Whether this submitter has sent near-identical drawings at least
+        NEAR_DUPLICATE_FLAG_COUNT times in the last day, this one included.
+
+        Each submitter key has a (key, created_at) index, so the lookup reads
+        only this submitter's day rather than the dHash segment indexes of
+        the whole table.
+        """
+        submitter = models.Q(ip_address=ip_address) if ip_address else models.Q()
+        if session_key:
+            submitter |= models.Q(session_key=session_key)
+        if user and user.is_authenticated:
+            submitter |= models.Q(user=user)
+        if not submitter:
+            return False
+        recent = Animation.objects.filter(submitter, created_at__gte=timezone.now() - timedelta(days=1))
+        matches = Animation.find_similar_inputs(value, recent, config.NEAR_DUPLICATE_DISTANCE)
+        return len(matches) + 1 >= config.NEAR_DUPLICATE_FLAG_COUNT
+
+    @staticmethod
+    def reused_output(other):
+        """
+        Fields completing a new animation with the stored master of `other`, a
+        render of the same upload. Takes a storage reference on the
+        master; the delivered file is made per owner as usual.
+        """
+        other.output_file.storage.add_reference(other.output_file.name)
+        return {
+            'status': Animation.COMPLETED,
+            'progress': 100,
+            'completed_at': timezone.now(),
+            'output_file': other.output_file.name,
+            'output_url': other.output_url,
+            'output_original_size': other.output_original_size,
+            'output_size': other.output_size,
+            'placeholder': other.placeholder,
+            'duplicate_of': other,
+            'estimated_cost': 0,  # No GPU time
+        }
+
+    def render_input(self):
+        """Name and content of the drawing to send to the backend: the upload, cropped to crop_box."""
+        self.input_image.seek(0)
+        data = self.input_image.read()
+        if self.crop_box:
+            data = imaging.crop_image(data, self.crop_box)
+        return self.input_image.name, data
+
+    def shared_input(self):
+        """
+        This animation's stored input, for a new row re-rendering the same drawing.
+
+        Returns the file name with an extra storage reference taken, or a copy
+        to save for files stored before content-addressed storage.
+        """
+        name = self.input_image.name
+        if self.input_image.storage.add_reference(name):
+            return name
+        return File(self.input_image.open('rb'), name=os.path.basename(name))
+
+    @staticmethod
+    def status_cache_key(animation_uuid):
+        return f'animation_status:{animation_uuid}'
+
+    STATUS_SNAPSHOT_FIELDS = (
+        'uuid', 'status', 'progress', 'output_url', 'error_message', 'user_id', 'session_key', 'api_request_id',
+    )
+
+    @staticmethod
+    def status_cache_timeout(status):
+        """Finished snapshots rarely change; in-flight ones expire quickly in case a race left one stale."""
+        if status in (Animation.COMPLETED, Animation.FAILED):
+            return config.STATUS_CACHE_TIMEOUT
+        return config.STATUS_CACHE_ACTIVE_TIMEOUT
+
+    @staticmethod
+    def load_status_snapshots(uuids):
+        return {
+            row['uuid']: row
+            for row in Animation.objects.filter(uuid__in=uuids).values(*Animation.STATUS_SNAPSHOT_FIELDS)
+        }
+
+    @staticmethod
+    def get_status_snapshots(uuids):
+        """
+        Small status dicts for many animations, keyed by uuid.
+
+        Read from the hot status cache in one get_many; misses are loaded with
+        a single uuid__in query and added back. Writes that change the status
+        or progress of a row store its new snapshot (see refresh_status_cache),
+        and add() never replaces one, so a reader that loaded the row before
+        such a write can't put the old state back.
+        """
+        keys = {Animation.status_cache_key(uuid): uuid for uuid in uuids}
+        snapshots = {keys[key]: value for key, value in cache.get_many(keys).items()}
+
+        missing = [uuid for uuid in uuids if uuid not in snapshots]
+        if missing:
+            loaded = Animation.load_status_snapshots(missing)
+            for uuid, row in loaded.items():
+                cache.add(Animation.status_cache_key(uuid), row, timeout=Animation.status_cache_timeout(row['status']))
+            snapshots.update(loaded)
+        return snapshots
+
+    @staticmethod
+    def refresh_status_cache(uuids):
+        """Store the current snapshots of rows that were just written."""
+        if not uuids:
+            return
+        loaded = Animation.load_status_snapshots(uuids)
+        for uuid, row in loaded.items():
+            cache.set(Animation.status_cache_key(uuid), row, timeout=Animation.status_cache_timeout(row['status']))
+        cache.delete_many([Animation.status_cache_key(uuid) for uuid in uuids if str(uuid) not in loaded])
+
+    def transition(self, to_status, **fields):
+        """
+        Move this animation to `to_status` with a single conditional UPDATE.
+
+        The UPDATE only matches while the row is still in a status allowed to
+        move to `to_status`, and only writes the given fields, so a stale
+        writer (e.g. a late poll) can never overwrite a newer state. Each
+        successful transition is appended to AnimationEvent.
+
+        Returns:
+            True if this call made the transition. On False the instance is
+            refreshed to the row's current state.
+        """
+        from_statuses = [status for status, targets in Animation.TRANSITIONS.items() if to_status in targets]
+        # Try the status we last saw first; usually the only UPDATE issued
+        from_statuses.sort(key=lambda status: status != self.status)
+
+        for from_status in from_statuses:
+            updated = Animation.objects.filter(pk=self.pk, status=from_status).update(status=to_status, **fields)
+            if updated:
+                AnimationEvent.record(self.pk, from_status, to_status)
+                Animation.refresh_status_cache([self.uuid])
+                self.status = to_status
+                for name, value in fields.items():
+                    setattr(self, name, value)
+                if to_status in (Animation.COMPLETED, Animation.FAILED):
+                    DispatchQueue.leave(self.uuid)
+                if to_status == Animation.COMPLETED:
+                    Animation.schedule_store_output([self.uuid])
+                return True
+
+        self.refresh_from_db()
+        return False
+
+    def mark_processing(self, api_request_id, job_id='', input_handle=''):
+        fields = {'input_handle': input_handle} if input_handle else {}
+        return self.transition(
+            Animation.PROCESSING,
+            api_request_id=api_request_id,
+            job_id=job_id,
+            started_at=timezone.now(),
+            **fields,
+        )
+
+    def mark_completed(self, output_url, gpu_seconds=None):
+        """Complete the animation, recording the measured GPU cost (wall-clock time if not reported)."""
+        completed_at = timezone.now()
+        if gpu_seconds is not None:
+            actual_cost = float(gpu_seconds)
+        elif self.started_at:
+            actual_cost = (completed_at - self.started_at).total_seconds()
+        else:
+            actual_cost = None
+        return self.transition(
+            Animation.COMPLETED,
+            output_url=output_url,
+            completed_at=completed_at,
+            progress=100,
+            actual_cost=actual_cost,
+        )
+
+    def mark_failed(self, error, reason=''):
+        return self.transition(
+            Animation.FAILED,
+            error_message=error,
+            failure_reason=reason,
+            completed_at=timezone.now(),
+        )
+
+    def update_progress(self, progress):
+        """Store backend-reported progress; ignored once the animation has left PROCESSING."""
+        updated = Animation.objects.filter(pk=self.pk, status=Animation.PROCESSING).update(progress=progress)
+        if updated:
+            self.progress = progress
+            Animation.refresh_status_cache([self.uuid])
+        return bool(updated)
+
+    @staticmethod
+    def apply_callback_updates(updates):
+        """
+        Apply a batch of backend status updates.
+
+        Each update is a dict with animation_id, status (completed, failed or
+        processing), seq and the status's payload (output_url, gpu_seconds,
+        error, progress). Updates whose seq is not newer than the row's
+        callback_seq are ignored, which makes redelivery idempotent. Rows are
+        written with one conditional UPDATE per status class.
+
+        Returns:
+            Number of updates applied
+        """
+        latest = {}
+        for update in updates:
+            current = latest.get(update['animation_id'])
+            if current is None or update['seq'] > current['seq']:
+                latest[update['animation_id']] = update
+
+        targets = {
+            'completed': Animation.COMPLETED,
+            'failed': Animation.FAILED,
+            'processing': Animation.PROCESSING,
+        }
+        now = timezone.now()
+        applied = 0
+        touched = []
+        finished = []
+        completed = []
+
+        with transaction.atomic():
+            for status_class, to_status in targets.items():
+                batch = {uuid: u for uuid, u in latest.items() if u['status'] == status_class}
+                if not batch:
+                    continue
+
+                from_statuses = [s for s, allowed in Animation.TRANSITIONS.items() if to_status in allowed]
+                if to_status == Animation.PROCESSING:
+                    from_statuses.append(Animation.PROCESSING)  # progress update
+                rows = [
+                    row for row in Animation.objects.select_for_update().filter(
+                        uuid__in=batch, status__in=from_statuses,
+                    ).values('id', 'uuid', 'status', 'callback_seq', 'started_at')
+                    if row['callback_seq'] < batch[row['uuid']]['seq']
+                ]
+                if not rows:
+                    continue
+
+                def case(field, value_for, output_field):
+                    return models.Case(
+                        *[models.When(id=row['id'], then=models.Value(value_for(row))) for row in rows],
+                        default=models.F(field), output_field=output_field,
+                    )
+
+                fields = {
+                    'status': models.Value(to_status),
+                    'callback_seq': case('callback_seq', lambda row: batch[row['uuid']]['seq'], models.PositiveBigIntegerField()),
+                }
+                if to_status == Animation.COMPLETED:
+                    def actual_cost(row):
+                        gpu_seconds = batch[row['uuid']].get('gpu_seconds')
+                        if gpu_seconds is not None:
+                            return float(gpu_seconds)
+                        return (now - row['started_at']).total_seconds() if row['started_at'] else None
+
+                    fields.update(
+                        output_url=case('output_url', lambda row: batch[row['uuid']].get('output_url') or '', models.URLField()),
+                        actual_cost=case('actual_cost', actual_cost, models.FloatField()),
+                        progress=models.Value(100),
+                        completed_at=models.Value(now),
+                    )
+                elif to_status == Animation.FAILED:
+                    fields.update(
+                        error_message=case('error_message', lambda row: batch[row['uuid']].get('error') or 'Processing failed', models.TextField()),
+                        failure_reason=models.Value(Animation.REASON_BACKEND_ERROR),
+                        completed_at=models.Value(now),
+                    )
+                else:
+                    fields.update(
+                        progress=case('progress', lambda row: int(batch[row['uuid']].get('progress') or 0), models.IntegerField()),
+                        started_at=Coalesce('started_at', models.Value(now)),
+                    )
+
+                Animation.objects.filter(id__in=[row['id'] for row in rows]).update(**fields)
+                AnimationEvent.objects.bulk_create([
+                    AnimationEvent(animation_id=row['id'], from_status=row['status'], to_status=to_status, created_at=now)
+                    for row in rows if row['status'] != to_status
+                ])
+                applied += len(rows)
+                touched.extend(row['uuid'] for row in rows)
+                if to_status in (Animation.COMPLETED, Animation.FAILED):
+                    finished.extend(row['uuid'] for row in rows)
+                if to_status == Animation.COMPLETED:
+                    completed.extend(row['uuid'] for row in rows if row['status'] != to_status)
+
+        Animation.refresh_status_cache(touched)
+        for uuid in finished:
+            DispatchQueue.leave(uuid)
+        Animation.schedule_store_output(completed)
+        return applied
+
+    @staticmethod
+    def schedule_store_output(uuids):
+        """
+        Queue fetching the masters of newly completed animations.
+
+        Best effort: if the queue is unavailable, the download view fetches
+        the master on first request instead.
+        """
+        try:
+            queue = django_rq.get_queue('default')
+            for uuid in uuids:
+                queue.enqueue('animator.tasks.store_output', uuid)
+        except Exception as e:
+            logger.warning("Could not queue output storage for %s: %s", uuids, e)
+
+    @staticmethod
+    def schedule_wiggle_preview(uuid):
+        """
+        Queue the wiggle preview of a new animation on the high-priority queue.
+
+        Best effort: without it the page just shows the spinner.
+        """
+        if not config.WIGGLE_PREVIEW:
+            return
+        try:
+            django_rq.get_queue('high').enqueue('animator.tasks.make_wiggle_preview', uuid)
+        except Exception as e:
+            logger.warning("Could not queue wiggle preview for %s: %s", uuid, e)
+
+    def store_wiggle_preview(self):
+        """
+        Make the wiggle preview from the input drawing, once.
+
+        Returns:
+            False if there is no input to make it from
+        """
+        if self.wiggle_preview:
+            return True
+        if not self.input_image:
+            return False
+        with self.input_image.open('rb') as f:
+            data = imaging.make_wiggle(f.read(), config.WIGGLE_PREVIEW_SIZE)
+        self._store_file('wiggle_preview', f'{self.uuid}.webp', data)
+        return True
+
+    def _store_file(self, field_name, name, data):
+        """Save data to a file field unless another worker got there first. Returns the stored FieldFile."""
+        field_file = getattr(self, field_name)
+        field_file.save(name, ContentFile(data), save=False)
+        if not Animation.objects.filter(pk=self.pk, **{field_name: ''}).update(**{field_name: field_file.name}):
+            # Stored meanwhile; release our reference and use theirs
+            field_file.storage.delete(field_file.name)
+            self.refresh_from_db(fields=[field_name])
+        return getattr(self, field_name)
+
+    def store_master(self):
+        """
+        Fetch the finished output from the backend into private storage, once.
+
+        GIFs are re-encoded with imaging.encode_gif() on the way in, padded
+        back to the uploaded framing first if asked for; both sizes are
+        recorded.
+
+        Returns:
+            False if there is no output to fetch
+        """
+        if self.output_file:
+            return True
+        if not self.output_url:
+            return False
+
+        data = backend.download_output(self.output_url)
+        original_size = len(data)
+        if self.output_format == Animation.FORMAT_GIF:
+            data = self.pad_to_input(data) if self.pad_output and self.crop_box else Animation.optimize_gif(data)
+        self._store_file('output_file', f'{self.uuid}.{self.output_format}', data)
+        Animation.objects.filter(pk=self.pk).update(output_original_size=original_size, output_size=len(data))
+        self.output_original_size, self.output_size = original_size, len(data)
+        return True
+
+    def store_placeholder(self):
+        """
+        Compute the inline placeholder from the thumbnail, or from the first
+        frame of a GIF master, once.
+
+        Returns:
+            False if there is no image to compute it from
+        """
+        if self.placeholder:
+            return True
+        if self.thumbnail:
+            source = self.thumbnail
+        elif self.output_file and self.output_format == Animation.FORMAT_GIF:
+            source = self.output_file
+        else:
+            return False
+
+        with source.open('rb') as f:
+            self.placeholder = imaging.make_placeholder(f.read())
+        Animation.objects.filter(pk=self.pk).update(placeholder=self.placeholder)
+        return True
+
+    def pad_to_input(self, data):
+        """A GIF rendered from the crop, padded back to the uploaded framing with the paper colour."""
+        try:
+            self.input_image.seek(0)
+            size = imaging.oriented_size(self.input_image.read())
+            return imaging.pad_animation(data, self.crop_box, size, self.crop_background or '#ffffff')
+        except Exception as e:
+            logger.warning("Padding output of %s failed: %s", self.uuid, e)
+            return Animation.optimize_gif(data)
+
+    @staticmethod
+    def optimize_gif(data):
+        """The smaller of a GIF and its optimized re-encoding."""
+        try:
+            optimized = imaging.optimize_gif(data)
+        except Exception as e:
+            logger.warning("GIF optimization failed: %s", e)
+            return data
+        return optimized if len(optimized) < len(data) else data
+
+    def get_watermarked_file(self):
+        """
+        The watermarked variant of the master, composited on first use.
+
+        Raises:
+            ValueError: if the master's format can't be watermarked
+        """
+        if not self.watermarked_file:
+            with self.output_file.open('rb') as f:
+                data, extension = imaging.watermark_animation(f.read(), config.WATERMARK_TEXT, config.WATERMARK_OPACITY)
+            self._store_file('watermarked_file', f'{self.uuid}{extension}', data)
+        return self.watermarked_file
+
+    def get_delivery_file(self):
+        """
+        The file this animation is delivered as: the master for clean downloads,
+        else the watermarked variant. The master must be stored already.
+
+        Raises:
+            ValueError: if it needs a watermark its format can't carry
+        """
+        return self.output_file if self.is_clean_download() else self.get_watermarked_file()
+
+    def make_variants(self):
+        """
+        Encode the delivered file as animated WebP/AVIF, for inline display,
+        plus downscaled renditions at PREVIEW_WIDTHS for grids.
+
+        Only GIF outputs get variants; formats the Pillow build can't write
+        are skipped. Renditions also come as GIF, for browsers that take
+        neither. Variants are kept per edition (clean or watermarked), so an
+        upgrade switches to the clean ones.
+
+        Returns:
+            Number of variants created
+        """
+        source = self.get_delivery_file()
+        if self.output_format != Animation.FORMAT_GIF:
+            return 0
+
+        formats = [image_format for image_format in config.ANIMATION_VARIANT_FORMATS if imaging.can_encode(image_format)]
+        wanted = [(0, image_format) for image_format in formats]
+        wanted += [(width, image_format) for width in config.PREVIEW_WIDTHS for image_format in formats + ['gif']]
+        watermarked = not self.is_clean_download()
+        existing = set(self.variants.filter(watermarked=watermarked).values_list('width', 'format'))
+        missing = [key for key in wanted if key not in existing]
+        if not missing:
+            return 0
+
+        with source.open('rb') as f:
+            frames, durations = imaging.load_frames(f.read())
+        resized = {}
+        created = 0
+        for width, image_format in missing:
+            if width not in resized:
+                # Never upscales; narrow sources share identical renditions in storage
+                resized[width] = imaging.resize_frames(frames, width) if width else frames
+            data = imaging.ENCODERS[image_format](resized[width], durations)
+            variant = AnimationVariant(
+                animation=self, watermarked=watermarked, format=image_format, width=width, size=len(data),
+            )
+            name = f'{self.uuid}-{width}.{image_format}' if width else f'{self.uuid}.{image_format}'
+            variant.file.save(name, ContentFile(data), save=False)
+            try:
+                with transaction.atomic():
+                    variant.save()
+                created += 1
+            except IntegrityError:
+                # Made meanwhile by another worker
+                variant.file.storage.delete(variant.file.name)
+        return created
+
+    def get_best_variant(self, accepted_formats, source, width=0):
+        """
+        The smallest variant of the delivered edition in one of accepted_formats.
+
+        Full-size variants (width 0) are only returned when smaller than
+        `source` (the delivered file); renditions always are.
+        """
+        variant = self.variants.filter(
+            watermarked=not self.is_clean_download(), width=width, format__in=accepted_formats,
+        ).order_by('size').first()
+        if variant and (width or variant.size < source.size):
+            return variant
+        return None
+
+    @property
+    def download_url(self):
+        """Site-relative URL of the download view, or '' while there is no output."""
+        if self.status == Animation.COMPLETED and (self.output_url or self.output_file):
+            return reverse('animation_download', args=[self.uuid])
+        return ''
+
+    @property
+    def preview_url(self):
+        """Site-relative URL for inline display, in the best format the browser accepts."""
+        if self.download_url:
+            return reverse('animation_media', args=[self.uuid])
+        return ''
+
+    @property
+    def preview_srcset(self):
+        """srcset of the downscaled renditions, for grids."""
+        url = self.preview_url
+        if not url:
+            return ''
+        return ', '.join(f'{url}?w={width} {width}w' for width in config.PREVIEW_WIDTHS)
+
+    def is_clean_download(self):
+        """Downloads get the master if it was rendered without a watermark or the owner is Pro now."""
+        return not self.add_watermark or bool(self.user and self.user.is_plan_active)
+
+    @staticmethod
+    def estimate_cost(preset, output_format, duration, fps, width=None, height=None):
+        """
+        Estimate the GPU-seconds a render will take.
+
+        Cost scales with the number of frames, the input resolution relative
+        to GPU_REFERENCE_PIXELS, the preset's cost factor and the output
+        format's encode overhead.
+        """
+        frames = max(1.0, duration * fps)
+        resolution = 1.0
+        if width and height:
+            resolution = min(max(width * height / config.GPU_REFERENCE_PIXELS, 0.5), 2.0)
+        preset_factor = preset.cost_factor if preset else 1.0
+        format_factor = config.GPU_FORMAT_COST.get(output_format, 1.0)
+
+        cost = config.GPU_JOB_OVERHEAD + config.GPU_SECONDS_PER_FRAME * frames * resolution * preset_factor * format_factor
+        return round(cost, 2)
+
+    @staticmethod
+    def get_user_daily_cost(user=None, session_key=None, ip_address=None):
+        """Sum of estimated GPU-seconds for animations created today by user/session/IP."""
+        today = timezone.now().date()
+        queryset = Animation.objects.filter(created_at__date=today).exclude(status=Animation.FAILED)
+
+        if user and user.is_authenticated:
+            queryset = queryset.filter(user=user)
+        elif session_key:
+            queryset = queryset.filter(session_key=session_key)
+        elif ip_address:
+            queryset = queryset.filter(ip_address=ip_address)
+        else:
+            return 0.0
+        return queryset.aggregate(total=models.Sum('estimated_cost'))['total'] or 0.0
+
+    @staticmethod
+    def get_tier_daily_cost(tier):
+        """GPU-seconds dispatched today for a tier, from a cache counter kept in milliseconds."""
+        return cache.get(f'gpu_cost:{tier}:{timezone.now().date()}', 0) / 1000
+
+    @staticmethod
+    def add_tier_daily_cost(tier, cost):
+        key = f'gpu_cost:{tier}:{timezone.now().date()}'
+        cache.add(key, 0, timeout=60 * 60 * 48)
+        cache.incr(key, int(cost * 1000))
+
+    @property
+    def error_class(self):
+        """The retryable error class this failure falls into, or None."""
+        return Animation.classify_error(self.error_message)
+
+    @staticmethod
+    def classify_error(message):
+        for error_class, pattern in Animation.RETRYABLE_ERRORS.items():
+            if message and re.search(pattern, message, re.IGNORECASE):
+                return error_class
+        return None
+
+    @staticmethod
+    def retryable_failures(error_classes=None, since=None, until=None):
+        """FAILED animations whose error matches one of the given retryable classes (default: all)."""
+        error_classes = error_classes or list(Animation.RETRYABLE_ERRORS)
+        matches = models.Q()
+        for error_class in error_classes:
+            matches |= models.Q(error_message__iregex=Animation.RETRYABLE_ERRORS[error_class])
+        if 'timeout' in error_classes:
+            matches |= models.Q(failure_reason=Animation.REASON_TIMEOUT)
+
+        queryset = Animation.objects.filter(matches, status=Animation.FAILED)
+        if since:
+            queryset = queryset.filter(created_at__gte=since)
+        if until:
+            queryset = queryset.filter(created_at__lt=until)
+        return queryset
+
     @staticmethod
     def get_user_daily_count(user=None, session_key=None, ip_address=None):
         """Count animations created today by user/session/IP."""
@@ -112,6 +1057,59 @@ class Animation(models.Model):
         return 0
 
 
+class AnimationVariant(models.Model):
+    """Another encoding or downscaled rendition of an animation's delivered file, served inline by content negotiation."""
+    FORMAT_CHOICES = (
+        ('webp', 'WebP'),
+        ('avif', 'AVIF'),
+        ('gif', 'GIF'),
+    )
+
+    animation = models.ForeignKey(Animation, on_delete=models.CASCADE, related_name='variants')
+    watermarked = models.BooleanField(help_text='Made from the watermarked file rather than the master')
+    format = models.CharField(max_length=10, choices=FORMAT_CHOICES)
+    width = models.PositiveIntegerField(default=0, help_text='Rendition width in pixels; 0 for full size')
+    file = models.FileField(upload_to='animations/variants/%Y/%m/', storage=private_storage)
+    size = models.PositiveIntegerField(help_text='Bytes')
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ('animation', 'watermarked', 'format', 'width')
+
+    def __str__(self):
+        width = f" {self.width}w" if self.width else ''
+        return f"{self.animation_id} {self.format}{width}{' (watermarked)' if self.watermarked else ''}"
+
+
+class Blob(models.Model):
+    """Reference count for a file in ContentAddressedStorage; the file is removed when it drops to zero."""
+    name = models.CharField(max_length=255, unique=True)
+    size = models.PositiveBigIntegerField(default=0)
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} refs)"
+
+
+class AnimationEvent(models.Model):
+    """Append-only log of Animation status transitions, used for timing analytics."""
+    animation = models.ForeignKey(Animation, on_delete=models.CASCADE, related_name='events')
+    from_status = models.CharField(max_length=12, blank=True)
+    to_status = models.CharField(max_length=12)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return f"{self.from_status or 'new'} -> {self.to_status}"
+
+    @staticmethod
+    def record(animation_id, from_status, to_status):
+        return AnimationEvent.objects.create(animation_id=animation_id, from_status=from_status, to_status=to_status)
+
+
 class GalleryItem(models.Model):
     """Curated gallery of example animations."""
     title = models.CharField(max_length=200)
@@ -128,3 +1126,57 @@ class GalleryItem(models.Model):
 
     def __str__(self):
         return self.title
+
+
+class PresetDemo(models.Model):
+    """Pre-rendered demo of a preset applied to a sample drawing, shown on preset cards."""
+    CACHE_KEY = 'preset_demos'
+
+    preset = models.ForeignKey(AnimationPreset, on_delete=models.CASCADE, related_name='demos')
+    sample_name = models.CharField(max_length=100)
+    preview = models.FileField(upload_to='animations/demos/')
+    thumbnail = models.ImageField(upload_to='animations/demos/')
+    placeholder = models.TextField(blank=True, help_text='Tiny data: URI inlined until the preview loads')
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['preset__sort_order', 'sample_name']
+        unique_together = ('preset', 'sample_name')
+
+    def __str__(self):
+        return f"{self.preset.code_name} on {self.sample_name}"
+
+    @staticmethod
+    def get_cached_demos():
+        """
+        Demo previews keyed by preset code_name, served from cache.
+
+        Only the first demo per preset is used on cards. The cache is
+        refreshed by the render_preset_demos command.
+        """
+        demos = cache.get(PresetDemo.CACHE_KEY)
+        if demos is None:
+            demos = {}
+            for demo in PresetDemo.objects.filter(preset__is_active=True).select_related('preset'):
+                demos.setdefault(demo.preset.code_name, {
+                    'preview_url': demo.preview.url,
+                    'thumbnail_url': demo.thumbnail.url,
+                    'placeholder': demo.placeholder,
+                    'width': demo.thumbnail.width,
+                    'height': demo.thumbnail.height,
+                })
+            cache.set(PresetDemo.CACHE_KEY, demos, timeout=60 * 60 * 24)
+        return demos
+
+    @staticmethod
+    def attach_demos(presets):
+        """Evaluate a preset queryset and set `.demo` on each preset (None when not rendered)."""
+        demos = PresetDemo.get_cached_demos()
+        presets = list(presets)
+        for preset in presets:
+            preset.demo = demos.get(preset.code_name)
+        return presets
+
+    @staticmethod
+    def clear_cache():
+        cache.delete(PresetDemo.CACHE_KEY)
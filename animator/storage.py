@@ -0,0 +1,115 @@
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import models, transaction
+from django.utils.deconstruct import deconstructible
+from django.utils.functional import cached_property
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File storage that keeps each distinct file once, named by its SHA-256.
+
+    Files land at cas/ab/cd/<sha256><ext>, so no directory grows past a few
+    hundred entries. Saving content that is already stored reuses the
+    existing file; every save takes a reference on a Blob row and delete()
+    only removes the file when its last reference is released. Files saved
+    before the switch (no Blob row) are deleted directly.
+
+    Content may carry a precomputed digest in a `sha256` attribute (the
+    upload handler provides one) to skip hashing.
+    """
+    PREFIX = 'cas'
+
+    @staticmethod
+    def hash_content(content):
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        return digest.hexdigest()
+
+    @classmethod
+    def blob_name(cls, digest, original_name):
+        extension = os.path.splitext(original_name)[1].lower()
+        return f"{cls.PREFIX}/{digest[:2]}/{digest[2:4]}/{digest}{extension}"
+
+    def save(self, name, content, max_length=None):
+        from animator.models import Blob
+
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+
+        digest = getattr(content, 'sha256', None) or self.hash_content(content)
+        name = self.blob_name(digest, name)
+
+        with transaction.atomic():
+            blob, _ = Blob.objects.select_for_update().get_or_create(
+                name=name, defaults={'size': content.size},
+            )
+            if not self.exists(name):
+                self._save(name, content)
+            Blob.objects.filter(pk=blob.pk).update(ref_count=models.F('ref_count') + 1)
+        return name
+
+    def add_reference(self, name):
+        """
+        Take an extra reference on an already stored file (e.g. a row reusing another's file).
+
+        Returns:
+            False if the file isn't tracked (saved before the switch)
+        """
+        from animator.models import Blob
+
+        return bool(Blob.objects.filter(name=name).update(ref_count=models.F('ref_count') + 1))
+
+    def delete(self, name):
+        """
+        Release one reference to a file, removing it once none are left.
+
+        Returns:
+            True if the file itself was removed
+        """
+        from animator.models import Blob
+
+        if not name:
+            raise ValueError("The name must be given to delete().")
+
+        with transaction.atomic():
+            blob = Blob.objects.select_for_update().filter(name=name).first()
+            if blob and blob.ref_count > 1:
+                Blob.objects.filter(pk=blob.pk).update(ref_count=models.F('ref_count') - 1)
+                return False
+            if blob:
+                blob.delete()
+            super().delete(name)
+        return True
+
+
+@deconstructible
+class PrivateContentAddressedStorage(ContentAddressedStorage):
+    """
+    ContentAddressedStorage kept outside MEDIA_ROOT, for files that are only
+    ever served through views (e.g. unwatermarked masters).
+    """
+    PREFIX = 'private'
+
+    @cached_property
+    def base_location(self):
+        return self._value_or_setting(self._location, settings.PRIVATE_MEDIA_ROOT)
+
+    def _clear_cached_properties(self, setting, **kwargs):
+        super()._clear_cached_properties(setting, **kwargs)
+        if setting == 'PRIVATE_MEDIA_ROOT':
+            self.__dict__.pop('base_location', None)
+            self.__dict__.pop('location', None)
+
+    def url(self, name):
+        raise ValueError("Private files have no public URL.")
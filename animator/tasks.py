@@ -0,0 +1,191 @@
+"""Background jobs for animations, run by RQ workers (python manage.py rqworker high default low)."""
+import logging
+import time
+from datetime import timedelta
+
+import django_rq
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from animator import backend
+from animator.dispatch import DispatchQueue
+from animator.models import Animation, AnimationEvent
+import config
+
+logger = logging.getLogger(__name__)
+
+
+def dispatch_animation(animation_id):
+    """Send a PENDING animation to the backend, reusing its stored input_image."""
+    try:
+        animation = Animation.objects.select_related('user', 'preset').get(uuid=animation_id)
+    except Animation.DoesNotExist:
+        return
+    if animation.status != Animation.PENDING:
+        return
+
+    try:
+        result = backend.send_to_api(animation)
+    except Exception as e:
+        result = {'success': False, 'error': str(e)}
+
+    if result.get('success'):
+        if animation.mark_processing(result.get('request_id', ''), result.get('job_id', ''), result.get('input_handle', '')):
+            is_pro = bool(animation.user and animation.user.is_plan_active)
+            DispatchQueue.enter(animation.uuid, DispatchQueue.tier(is_pro))
+    else:
+        animation.mark_failed(result.get('error', 'Unknown error'))
+
+
+def store_output(animation_id):
+    """
+    Copy a completed animation's master from the backend into private storage.
+
+    The card placeholder, the delivered file (watermarked when the owner
+    needs it) and its WebP/AVIF variants are made right away, so the first
+    view doesn't wait for them. Safe to run again: only what is missing
+    gets made.
+    """
+    try:
+        animation = Animation.objects.select_related('user').get(uuid=animation_id, status=Animation.COMPLETED)
+    except Animation.DoesNotExist:
+        return
+    if not animation.store_master():
+        return
+    animation.store_placeholder()
+    try:
+        animation.make_variants()
+    except ValueError as e:
+        logger.warning("Not watermarking %s: %s", animation_id, e)
+
+
+def make_wiggle_preview(animation_id):
+    """Make the wiggle preview of an animation that is still waiting for its render."""
+    try:
+        animation = Animation.objects.get(
+            uuid=animation_id, status__in=[Animation.PENDING, Animation.PROCESSING],
+        )
+    except Animation.DoesNotExist:
+        return
+    animation.store_wiggle_preview()
+
+
+def batch_group(animation):
+    """Animations in the same group can share one backend request."""
+    return f"{animation.preset_id}:{animation.output_format}:{animation.duration}:{animation.fps}"
+
+
+def schedule_batch(animation):
+    """
+    Queue a PENDING animation for micro-batched dispatch.
+
+    The first animation of a group starts a dispatch_batch job, which waits
+    DISPATCH_BATCH_WINDOW_MS for more of the same group to arrive.
+    """
+    group = batch_group(animation)
+    if cache.add(f'dispatch:batch:{group}', 1, timeout=60):
+        django_rq.get_queue('high').enqueue(dispatch_batch, group)
+
+
+def dispatch_batch(group):
+    """
+    Send the pending animations of one group to the backend, DISPATCH_BATCH_SIZE per request.
+
+    Returns:
+        Number of animations sent
+    """
+    time.sleep(config.DISPATCH_BATCH_WINDOW_MS / 1000)
+    # Arrivals from now on start the next batch
+    cache.delete(f'dispatch:batch:{group}')
+
+    preset_id, output_format, duration, fps = group.split(':')
+    candidates = Animation.objects.filter(
+        status=Animation.PENDING, api_request_id='', job_id='',
+        preset_id=None if preset_id == 'None' else int(preset_id),
+        output_format=output_format, duration=float(duration), fps=int(fps),
+    ).order_by('created_at')
+
+    sent = 0
+    while True:
+        ids = list(candidates.values_list('id', flat=True)[:config.DISPATCH_BATCH_SIZE])
+        # Claim the rows so an overlapping batch can't send them too
+        token = f'batch-{time.time_ns()}'
+        Animation.objects.filter(id__in=ids, job_id='').update(job_id=token)
+        animations = list(Animation.objects.select_related('user', 'preset').filter(job_id=token).order_by('created_at'))
+        if not animations:
+            break
+
+        try:
+            result = backend.send_batch(animations)
+        except Exception as e:
+            result = {'success': False, 'error': str(e)}
+
+        for index, animation in enumerate(animations):
+            if result.get('success'):
+                # Results come back as a files array in submission order
+                if animation.mark_processing(f"{result['request_id']}#{index}", result['request_id']):
+                    is_pro = bool(animation.user and animation.user.is_plan_active)
+                    DispatchQueue.enter(animation.uuid, DispatchQueue.tier(is_pro))
+            else:
+                animation.mark_failed(result.get('error', 'Unknown error'))
+
+        sent += len(animations)
+        logger.info("Dispatched batch of %s for %s", len(animations), group)
+        if len(ids) < config.DISPATCH_BATCH_SIZE:
+            break
+    return sent
+
+
+def requeue_failed(animations, batch_size=None, batch_interval=None):
+    """
+    Reset failed animations to PENDING and dispatch them from the low-priority queue.
+
+    Batches are spaced batch_interval seconds apart so a recovery run doesn't
+    flood a backend that has only just come back.
+
+    Returns:
+        Number of animations requeued
+    """
+    batch_size = batch_size or config.REQUEUE_BATCH_SIZE
+    batch_interval = config.REQUEUE_BATCH_INTERVAL if batch_interval is None else batch_interval
+    ids = list(animations.filter(status=Animation.FAILED).values_list('id', flat=True))
+    queue = django_rq.get_queue('low')
+
+    requeued = 0
+    for batch_number, start in enumerate(range(0, len(ids), batch_size)):
+        batch_ids = ids[start:start + batch_size]
+        delay = timedelta(seconds=batch_number * batch_interval)
+        with transaction.atomic():
+            reset_ids = list(
+                Animation.objects.select_for_update()
+                .filter(id__in=batch_ids, status=Animation.FAILED)
+                .values_list('id', flat=True)
+            )
+            Animation.objects.filter(id__in=reset_ids).update(
+                status=Animation.PENDING,
+                error_message='',
+                failure_reason='',
+                progress=0,
+                api_request_id='',
+                job_id='',
+                started_at=None,
+                completed_at=None,
+                # The reaper times the new attempt from here, not from created_at
+                queued_at=timezone.now() + delay,
+            )
+            AnimationEvent.objects.bulk_create([
+                AnimationEvent(animation_id=animation_id, from_status=Animation.FAILED, to_status=Animation.PENDING)
+                for animation_id in reset_ids
+            ])
+        uuids = list(Animation.objects.filter(id__in=reset_ids).values_list('uuid', flat=True))
+        Animation.refresh_status_cache(uuids)
+        for uuid in uuids:
+            if delay:
+                queue.enqueue_in(delay, dispatch_animation, uuid)
+            else:
+                queue.enqueue(dispatch_animation, uuid)
+            requeued += 1
+
+    logger.info("Requeued %s failed animations", requeued)
+    return requeued
@@ -0,0 +1,106 @@
+"""Upload handlers that inspect image uploads while they stream in."""
+import hashlib
+import warnings
+from io import BytesIO
+
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+from PIL import Image
+
+import config
+
+
+class ImageUploadHandler(FileUploadHandler):
+    """
+    Pass-through handler that validates image uploads chunk by chunk.
+
+    Install it ahead of Django's default handlers. For every file it:
+
+    - refuses requests whose Content-Length already rules them out, and
+      otherwise stops the upload as soon as UPLOAD_MAX_BYTES is exceeded
+    - computes the SHA-256 of the content as it passes
+    - sniffs the real format and dimensions from the first bytes with a
+      header-only Pillow parse (no pixel data is decoded)
+    - rejects images over UPLOAD_MAX_PIXELS before anything is decoded
+
+    Results land in request.upload_info[field_name] as a dict with sha256,
+    size, format, width and height. A rejection stops the upload and stores
+    the error message in request.upload_error; the remaining body is drained
+    without being stored.
+    """
+    FORMATS = ('PNG', 'JPEG', 'WEBP', 'GIF')
+    SNIFF_BYTES = 256 * 1024  # Give up identifying the format after this much data
+    FORM_OVERHEAD = 64 * 1024  # Allowance for multipart headers and other fields
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        request.upload_info = {}
+        request.upload_error = None
+        self.request_length = 0
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        self.request_length = content_length
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        if self.request_length > config.UPLOAD_MAX_BYTES + self.FORM_OVERHEAD:
+            self.reject_too_large()
+        self.sha256 = hashlib.sha256()
+        self.head = b''
+        self.info = None
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > config.UPLOAD_MAX_BYTES:
+            self.reject_too_large()
+
+        self.sha256.update(raw_data)
+        if self.info is None:
+            self.head += raw_data
+            self.info = self.sniff(self.head)
+            if self.info is None and len(self.head) >= self.SNIFF_BYTES:
+                self.reject('Invalid file type. Please upload PNG, JPEG, or WebP.')
+            if self.info is not None:
+                self.head = b''
+        return raw_data
+
+    def file_complete(self, file_size):
+        if self.info is None:
+            self.info = self.sniff(self.head)
+        if self.info is None:
+            self.request.upload_error = 'Invalid file type. Please upload PNG, JPEG, or WebP.'
+            return None
+
+        self.request.upload_info[self.field_name] = {
+            **self.info,
+            'sha256': self.sha256.hexdigest(),
+            'size': file_size,
+        }
+        return None
+
+    def sniff(self, head):
+        """
+        Identify an image from its leading bytes.
+
+        Returns a dict with format, width and height, or None if it can't be
+        identified (yet). Rejects oversized images outright.
+        """
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('error', Image.DecompressionBombWarning)
+                image = Image.open(BytesIO(head), formats=self.FORMATS)
+            width, height = image.size
+        except (Image.DecompressionBombError, Image.DecompressionBombWarning):
+            self.reject('Image dimensions are too large.')
+        except Exception:
+            # Not identifiable yet; a truncated header looks the same as a bad file
+            return None
+
+        if width * height > config.UPLOAD_MAX_PIXELS:
+            self.reject('Image dimensions are too large.')
+        return {'format': image.format, 'width': width, 'height': height}
+
+    def reject_too_large(self):
+        self.reject(f'File too large. Maximum size is {config.UPLOAD_MAX_BYTES // (1024 * 1024)}MB.')
+
+    def reject(self, error):
+        self.request.upload_error = error
+        raise StopUpload(connection_reset=False)
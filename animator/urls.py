@@ -2,11 +2,26 @@ from django.urls import path
 from animator.views import (
     AnimatePage,
     AnimateAPI,
+    AsyncAnimateAPI,
     AnimationStatus,
+    AsyncAnimationStatus,
+    AnimationStatusBatch,
+    AnimationDownload,
+    AnimationMedia,
     animation_callback,
+    async_animation_callback,
+    animation_callback_batch,
+    QueueStatus,
     GalleryPage,
     MyAnimations,
 )
+import config
+
+if config.ASYNC_VIEWS:
+    # ASGI worker mode: the views that wait on the backend await it instead of blocking
+    AnimateAPI = AsyncAnimateAPI
+    AnimationStatus = AsyncAnimationStatus
+    animation_callback = async_animation_callback
 
 urlpatterns = [
     path('', AnimatePage.as_view(), name='animate'),
@@ -15,6 +30,11 @@ urlpatterns = [
 
     # API endpoints
     path('api/animate/', AnimateAPI.as_view(), name='api_animate'),
+    path('api/animation/status/batch/', AnimationStatusBatch.as_view(), name='api_animation_status_batch'),
     path('api/animation/status/<str:animation_id>/', AnimationStatus.as_view(), name='api_animation_status'),
     path('api/animation/callback/', animation_callback, name='api_animation_callback'),
+    path('api/animation/callback/batch/', animation_callback_batch, name='api_animation_callback_batch'),
+    path('api/queue/', QueueStatus.as_view(), name='api_queue_status'),
+    path('download/<str:animation_id>/', AnimationDownload.as_view(), name='animation_download'),
+    path('media/<str:animation_id>/', AnimationMedia.as_view(), name='animation_media'),
 ]
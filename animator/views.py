@@ -1,18 +1,30 @@
+import hashlib
+import hmac
 import json
-import requests
+import logging
+import math
+import os
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import JsonResponse
-from django.views.decorators.csrf import csrf_exempt
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, JsonResponse
+from django.urls import reverse
+from django.utils.decorators import method_decorator
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
 from django.views.decorators.http import require_http_methods
 from django.views import View
-from django.utils import timezone
 from django.core.files.storage import default_storage
 from django.core.files.base import ContentFile
+from django.core.cache import cache
 
 from accounts.views import GlobalVars
-from animator.models import Animation, AnimationPreset, GalleryItem
+from animator import backend, tasks
+from animator.dispatch import DispatchQueue
+from animator.models import Animation, AnimationEvent, AnimationPreset, GalleryItem, PresetDemo
+from animator.uploadhandlers import ImageUploadHandler
 import config
 
+logger = logging.getLogger(__name__)
+
 
 def get_client_ip(request):
     """Get client IP address from request."""
@@ -29,7 +41,7 @@ class AnimatePage(View):
 
     def get(self, request):
         settings = GlobalVars.get_globals(request)
-        presets = AnimationPreset.objects.filter(is_active=True)
+        presets = PresetDemo.attach_demos(AnimationPreset.objects.filter(is_active=True))
 
         # Check daily limit for free users
         ip = get_client_ip(request)
@@ -44,6 +56,7 @@ class AnimatePage(View):
         is_pro = request.user.is_authenticated and request.user.is_plan_active
         daily_limit = config.RATE_LIMIT_PRO if is_pro else config.RATE_LIMIT
         remaining = max(0, daily_limit - daily_count)
+        queue = DispatchQueue.summary(DispatchQueue.tier(is_pro))
 
         return render(request, 'animate.html', {
             'title': f"Animate Your Drawing | {config.PROJECT_NAME}",
@@ -55,13 +68,99 @@ class AnimatePage(View):
             'daily_count': daily_count,
             'daily_limit': daily_limit,
             'remaining': remaining,
+            'queue': queue,
+            'idempotency_pending_ms': config.IDEMPOTENCY_PENDING_TIMEOUT * 1000,
         })
 
 
+@method_decorator(csrf_exempt, name='dispatch')
 class AnimateAPI(View):
     """API endpoint for creating animations."""
 
+    def dispatch(self, request, *args, **kwargs):
+        # The upload handler must be in place before anything reads the body,
+        # including the CSRF check, hence csrf_exempt + csrf_protect
+        request.upload_handlers.insert(0, ImageUploadHandler(request))
+        return csrf_protect(super().dispatch)(request, *args, **kwargs)
+
     def post(self, request):
+        """Create an animation, replaying the stored response for a repeated Idempotency-Key."""
+        idempotency_key = request.headers.get('Idempotency-Key', '')
+        if not idempotency_key:
+            return self.animate(request)
+        if len(idempotency_key) > 100:
+            return self.invalid_idempotency_key()
+
+        cache_key = self.idempotency_cache_key(request, request.user, idempotency_key)
+        if not cache.add(cache_key, 'pending', timeout=config.IDEMPOTENCY_PENDING_TIMEOUT):
+            response = self.replay(cache.get(cache_key))
+            if response:
+                return response
+
+        response = self.animate(request)
+        if response.status_code == 200:
+            cache.set(cache_key, (response.status_code, response.content), timeout=config.IDEMPOTENCY_KEY_TTL)
+        else:
+            # Failed attempts may be retried with the same key
+            cache.delete(cache_key)
+        return response
+
+    @staticmethod
+    def invalid_idempotency_key():
+        return JsonResponse({
+            'success': False,
+            'error': 'Invalid Idempotency-Key.'
+        }, status=400)
+
+    @staticmethod
+    def idempotency_cache_key(request, user, idempotency_key):
+        """
+        Keys are scoped to the account, or for anonymous clients to their
+        session, so a reused or guessed key never replays someone else's
+        animation. The session is started here so the first response sets the
+        cookie its retries will carry.
+        """
+        if user.is_authenticated:
+            owner = user.id
+        else:
+            if not request.session.session_key:
+                request.session.create()
+            owner = f'session:{request.session.session_key}'
+        return f'idempotency:animate:{owner}:{hashlib.sha256(idempotency_key.encode()).hexdigest()}'
+
+    @staticmethod
+    def replay(stored):
+        """Response for a key that is already taken, or None if its entry has expired meanwhile."""
+        if stored == 'pending':
+            return JsonResponse({
+                'success': False,
+                'error': 'This request is already being processed.'
+            }, status=409)
+        if stored:
+            status, content = stored
+            return HttpResponse(content, status=status, content_type='application/json')
+        return None
+
+    def animate(self, request):
+        animation, tier, response = self.create_animation(request)
+        if response:
+            return response
+
+        # Send to API backend for processing
+        try:
+            result = self.send_to_api(animation)
+            return self.dispatched(request, animation, tier, result)
+        except Exception as e:
+            return self.dispatch_failed(animation, e)
+
+    def create_animation(self, request):
+        """
+        Validate the request and create the PENDING animation.
+
+        Returns:
+            (animation, tier, None), or (None, None, response) when the request
+            is answered without a backend call: refused, or queued for a batch
+        """
         settings = GlobalVars.get_globals(request)
         ip = get_client_ip(request)
         session_key = request.session.session_key
@@ -79,33 +178,44 @@ class AnimateAPI(View):
         )
 
         if daily_count >= daily_limit:
-            return JsonResponse({
+            return None, None, JsonResponse({
                 'success': False,
                 'error': 'Daily limit reached. Upgrade to Pro for unlimited animations!'
             }, status=429)
 
-        # Get uploaded image
+        # Get uploaded image; type, size and dimensions were checked while it streamed in
         image_file = request.FILES.get('image')
-        if not image_file:
-            return JsonResponse({
-                'success': False,
-                'error': 'No image uploaded'
-            }, status=400)
-
-        # Validate file type
-        allowed_types = ['image/png', 'image/jpeg', 'image/webp', 'image/gif']
-        if image_file.content_type not in allowed_types:
-            return JsonResponse({
+        if request.upload_error:
+            return None, None, JsonResponse({
                 'success': False,
-                'error': 'Invalid file type. Please upload PNG, JPEG, or WebP.'
+                'error': request.upload_error
             }, status=400)
 
-        # Validate file size (max 10MB)
-        if image_file.size > 10 * 1024 * 1024:
-            return JsonResponse({
-                'success': False,
-                'error': 'File too large. Maximum size is 10MB.'
-            }, status=400)
+        # ...or re-render a drawing the caller uploaded before
+        source = None
+        source_id = request.POST.get('source_animation_id')
+        if source_id and not image_file:
+            source = Animation.objects.filter(uuid=source_id).exclude(input_image='').first()
+            if not source or not source.is_owned_by(request.user, session_key):
+                return None, None, JsonResponse({
+                    'success': False,
+                    'error': 'Source animation not found'
+                }, status=404)
+            image_info = {'width': source.input_width, 'height': source.input_height, 'sha256': source.input_sha256}
+            crop = source.crop_fields()
+            dhash = source.input_dhash
+        else:
+            image_info = request.upload_info.get('image')
+            if not image_file or not image_info:
+                return None, None, JsonResponse({
+                    'success': False,
+                    'error': 'No image uploaded'
+                }, status=400)
+            image_file.sha256 = image_info['sha256']  # Storage reuses the streamed hash
+            data = image_file.read()
+            image_file.seek(0)
+            crop = Animation.detect_crop(data)
+            dhash = Animation.detect_dhash(data, crop)
 
         # Get preset
         preset_code = request.POST.get('preset', 'walk')
@@ -116,7 +226,7 @@ class AnimateAPI(View):
 
         # Check premium access
         if preset and preset.is_premium and not is_pro:
-            return JsonResponse({
+            return None, None, JsonResponse({
                 'success': False,
                 'error': 'This animation style is premium only. Upgrade to Pro!'
             }, status=403)
@@ -130,100 +240,238 @@ class AnimateAPI(View):
         if output_format in ['mp4', 'webm'] and not is_pro:
             output_format = 'gif'
 
+        # Duration/FPS, clamped to the tier's limits
+        tier = DispatchQueue.tier(is_pro)
+        limits = config.ANIMATION_LIMITS[tier]
+        try:
+            duration = float(request.POST.get('duration', 3.0))
+            fps = int(request.POST.get('fps', 24))
+            # NaN would slip through the clamping below (every comparison with it is False)
+            if not math.isfinite(duration):
+                raise ValueError(duration)
+            duration = min(max(duration, 1.0), limits['max_duration'])
+            fps = min(max(fps, 8), limits['max_fps'])
+        except (TypeError, ValueError):
+            return None, None, JsonResponse({
+                'success': False,
+                'error': 'Invalid duration or fps.'
+            }, status=400)
+
+        user = request.user if request.user.is_authenticated else None
+        pad_output = request.POST.get('pad_output') == 'on'
+        fields = {
+            'user': user,
+            'session_key': session_key,
+            'input_handle': source.input_handle if source else '',
+            'preset': preset,
+            'output_format': output_format,
+            'duration': duration,
+            'fps': fps,
+            'input_width': image_info['width'],
+            'input_height': image_info['height'],
+            'input_sha256': image_info['sha256'],
+            'pad_output': pad_output,
+            **crop,
+            **(Animation.dhash_fields(dhash) if dhash is not None else {}),
+            'add_watermark': not is_pro,
+            'ip_address': ip,
+            'user_agent': request.META.get('HTTP_USER_AGENT', '')[:500],
+        }
+        if dhash is not None and not source:
+            fields['flagged_resubmission'] = Animation.is_resubmission_abuse(dhash, user, session_key, ip)
+            if fields['flagged_resubmission']:
+                logger.warning("Repeated near-identical uploads from %s (session %s)", ip, session_key)
+
+        # The same file was rendered recently with the same settings: hand that over
+        reusable = None
+        if config.NEAR_DUPLICATE_REUSE and not request.POST.get('force_render'):
+            reusable = Animation.find_reusable_output(
+                image_info['sha256'], preset, output_format, duration, fps, pad_output,
+            )
+        if reusable:
+            animation = Animation.objects.create(
+                input_image=source.shared_input() if source else image_file,
+                **fields,
+                **Animation.reused_output(reusable),
+            )
+            AnimationEvent.record(animation.pk, '', Animation.COMPLETED)
+            Animation.schedule_store_output([animation.uuid])
+            return None, None, JsonResponse({
+                'success': True,
+                'animation_id': animation.uuid,
+                'status': Animation.COMPLETED,
+                'reused': True,
+                'message': 'We animated this exact image before, so here it is right away.',
+            })
+
+        # A near-identical drawing is only pointed out to its own submitter
+        if dhash is not None and not source:
+            fields['similar_to'] = Animation.find_similar_owned(dhash, user, session_key)
+
+        # Estimate GPU cost and enforce budgets; only the cropped drawing is rendered
+        width, height = image_info['width'], image_info['height']
+        if crop.get('crop_left') is not None:
+            width, height = crop['crop_right'] - crop['crop_left'], crop['crop_bottom'] - crop['crop_top']
+        estimated_cost = Animation.estimate_cost(preset, output_format, duration, fps, width, height)
+        budget = config.GPU_BUDGETS[tier]
+        if estimated_cost > budget['per_job']:
+            return None, None, JsonResponse({
+                'success': False,
+                'error': 'This combination is too expensive to render. Try a shorter duration, lower fps or smaller image.'
+            }, status=400)
+
+        daily_cost = Animation.get_user_daily_cost(
+            user=user,
+            session_key=session_key,
+            ip_address=ip
+        )
+        if daily_cost + estimated_cost > budget['per_user_daily']:
+            return None, None, JsonResponse({
+                'success': False,
+                'error': 'Daily render budget reached. Upgrade to Pro for a larger budget!'
+            }, status=429)
+
+        if Animation.get_tier_daily_cost(tier) + estimated_cost > budget['tier_daily']:
+            return None, None, JsonResponse({
+                'success': False,
+                'error': 'We are at capacity right now. Please try again later.'
+            }, status=503)
+
         # Create animation record
         animation = Animation.objects.create(
-            user=request.user if request.user.is_authenticated else None,
-            session_key=session_key,
-            input_image=image_file,
-            preset=preset,
-            output_format=output_format,
-            add_watermark=not is_pro,
-            ip_address=ip,
-            user_agent=request.META.get('HTTP_USER_AGENT', '')[:500],
+            input_image=source.shared_input() if source else image_file,
+            **fields,
+            estimated_cost=estimated_cost,
             status=Animation.PENDING
         )
+        AnimationEvent.record(animation.pk, '', Animation.PENDING)
+        Animation.schedule_wiggle_preview(animation.uuid)
+
+        if config.DISPATCH_BATCH_WINDOW_MS:
+            # Sent together with similar jobs by a worker a moment from now
+            tasks.schedule_batch(animation)
+            Animation.add_tier_daily_cost(tier, estimated_cost)
+            return None, None, JsonResponse({
+                'success': True,
+                'animation_id': animation.uuid,
+                'status': Animation.PENDING,
+                'message': 'Animation queued! Check back in a few seconds.',
+                'queue': DispatchQueue.summary(tier),
+                **self.similar_suggestion(request, animation),
+            })
+
+        return animation, tier, None
+
+    @staticmethod
+    def similar_suggestion(request, animation):
+        """Response fields pointing the submitter at their earlier render of a near-identical drawing."""
+        similar = animation.similar_to
+        if not similar or not similar.preview_url:
+            return {}
+        return {'similar': {
+            'animation_id': similar.uuid,
+            'preview_url': request.build_absolute_uri(similar.preview_url),
+        }}
+
+    def dispatched(self, request, animation, tier, result):
+        """Record the backend's answer to the dispatch and build the response."""
+        if result.get('success'):
+            animation.mark_processing(
+                result.get('request_id', ''), result.get('job_id', ''), result.get('input_handle', ''),
+            )
+            DispatchQueue.enter(animation.uuid, tier)
+            Animation.add_tier_daily_cost(tier, animation.estimated_cost)
 
-        # Send to API backend for processing
-        try:
-            result = self.send_to_api(animation)
-            if result.get('success'):
-                animation.status = Animation.PROCESSING
-                animation.api_request_id = result.get('request_id', '')
-                animation.job_id = result.get('job_id', '')
-                animation.started_at = timezone.now()
-                animation.save()
-
-                return JsonResponse({
-                    'success': True,
-                    'animation_id': animation.uuid,
-                    'status': 'processing',
-                    'message': 'Animation started! Check back in a few seconds.'
-                })
-            else:
-                animation.status = Animation.FAILED
-                animation.error_message = result.get('error', 'Unknown error')
-                animation.save()
-                return JsonResponse({
-                    'success': False,
-                    'error': result.get('error', 'Failed to start animation')
-                }, status=500)
-
-        except Exception as e:
-            animation.status = Animation.FAILED
-            animation.error_message = str(e)
-            animation.save()
+            return JsonResponse({
+                'success': True,
+                'animation_id': animation.uuid,
+                'status': 'processing',
+                'message': 'Animation started! Check back in a few seconds.',
+                'queue': DispatchQueue.summary(tier, animation.uuid),
+                **self.similar_suggestion(request, animation),
+            })
+        else:
+            animation.mark_failed(result.get('error', 'Unknown error'))
             return JsonResponse({
                 'success': False,
-                'error': 'Failed to process animation. Please try again.'
+                'error': result.get('error', 'Failed to start animation')
             }, status=500)
 
+    @staticmethod
+    def dispatch_failed(animation, error):
+        animation.mark_failed(str(error))
+        return JsonResponse({
+            'success': False,
+            'error': 'Failed to process animation. Please try again.'
+        }, status=500)
+
     def send_to_api(self, animation):
         """Send animation request to the API backend."""
-        api_url = f"{config.API_BACKEND}/v1/animate/"
-
-        # Read the image file
-        animation.input_image.seek(0)
-        files = {
-            'files': (animation.input_image.name, animation.input_image.read(), 'image/png')
-        }
-
-        # Map animation preset to motion parameter
-        motion = animation.preset.code_name if animation.preset else 'walk'
-
-        data = {
-            'motion': motion,
-            'output_format': animation.output_format,
-            'duration': animation.duration,
-            'fps': animation.fps,
-            'source': 'drawinganimator',  # Identify source for credit validation
-        }
-
-        headers = {}
-        if config.API_KEY:
-            headers['Authorization'] = config.API_KEY
+        return backend.send_to_api(animation)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncAnimateAPI(AnimateAPI):
+    """
+    AnimateAPI for the ASGI worker (ASYNC_VIEWS).
+
+    Validation and database work run through sync_to_async; the backend
+    request is awaited on the pooled async client, so a slow backend ties
+    up a coroutine instead of a worker.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        request.upload_handlers.insert(0, ImageUploadHandler(request))
+        return await csrf_protect(self.handle)(request, *args, **kwargs)
+
+    async def handle(self, request, *args, **kwargs):
+        return await View.dispatch(self, request, *args, **kwargs)
+
+    async def post(self, request):
+        """Create an animation, replaying the stored response for a repeated Idempotency-Key."""
+        idempotency_key = request.headers.get('Idempotency-Key', '')
+        if not idempotency_key:
+            return await self.animate(request)
+        if len(idempotency_key) > 100:
+            return self.invalid_idempotency_key()
+
+        cache_key = await sync_to_async(self.idempotency_cache_key)(request, await request.auser(), idempotency_key)
+        if not await cache.aadd(cache_key, 'pending', timeout=config.IDEMPOTENCY_PENDING_TIMEOUT):
+            response = self.replay(await cache.aget(cache_key))
+            if response:
+                return response
+
+        response = await self.animate(request)
+        if response.status_code == 200:
+            await cache.aset(cache_key, (response.status_code, response.content), timeout=config.IDEMPOTENCY_KEY_TTL)
+        else:
+            await cache.adelete(cache_key)
+        return response
+
+    async def animate(self, request):
+        animation, tier, response = await sync_to_async(self.create_animation)(request)
+        if response:
+            return response
 
         try:
-            response = requests.post(api_url, files=files, data=data, headers=headers, timeout=30)
-            result = response.json()
-
-            # Map api.imageeditor.ai response format to our expected format
-            if 'uuid' in result:
-                return {
-                    'success': True,
-                    'request_id': result.get('uuid'),
-                    'job_id': result.get('uuid'),
-                }
-            elif 'error' in result:
-                return {'success': False, 'error': result.get('error')}
-            else:
-                return {'success': True, 'request_id': result.get('uuid', '')}
+            result = await self.async_send_to_api(animation)
+            return await sync_to_async(self.dispatched)(request, animation, tier, result)
+        except Exception as e:
+            return await sync_to_async(self.dispatch_failed)(animation, e)
 
-        except requests.exceptions.RequestException as e:
-            return {'success': False, 'error': str(e)}
+    async def async_send_to_api(self, animation):
+        return await backend.async_send_to_api(animation)
 
 
 class AnimationStatus(View):
-    """Check animation status by polling the API backend."""
+    """
+    Check animation status by polling the API backend.
+
+    Responses carry an ETag of the stored state and a next_poll_ms hint;
+    a client that sends the ETag back in If-None-Match gets an empty 304
+    until something stored has changed. The time-based progress estimate
+    is left out of the ETag: clients extrapolate it from started_at/eta.
+    """
 
     def get(self, request, animation_id):
         try:
@@ -237,127 +485,411 @@ class AnimationStatus(View):
         # If still processing, poll the API backend for status
         if animation.status == Animation.PROCESSING and animation.api_request_id:
             try:
-                api_result = self.check_api_status(animation.api_request_id)
-                if api_result:
-                    if api_result.get('done'):
-                        # Animation completed
-                        output_url = api_result.get('output_url') or api_result.get('url')
-                        if output_url:
-                            animation.status = Animation.COMPLETED
-                            animation.output_url = output_url
-                            animation.completed_at = timezone.now()
-                            animation.progress = 100
-                            animation.save()
-                    elif api_result.get('failed'):
-                        animation.status = Animation.FAILED
-                        animation.error_message = api_result.get('error', 'Processing failed')
-                        animation.completed_at = timezone.now()
-                        animation.save()
-                    else:
-                        # Still processing - estimate progress
-                        animation.progress = min(animation.progress + 10, 90)
-                        animation.save()
+                self.apply_api_result(animation, self.check_api_status(animation.api_request_id))
             except Exception:
                 pass  # Ignore API errors, just return current status
 
-        response_data = {
-            'success': True,
-            'status': animation.status,
-            'progress': animation.progress,
-        }
+        return self.status_response(request, animation)
+
+    @staticmethod
+    def apply_api_result(animation, api_result):
+        if api_result:
+            if api_result.get('done'):
+                # Animation completed
+                output_url = api_result.get('output_url') or api_result.get('url')
+                if output_url:
+                    animation.mark_completed(output_url, api_result.get('gpu_seconds'))
+            elif api_result.get('failed'):
+                animation.mark_failed(api_result.get('error', 'Processing failed'), Animation.REASON_BACKEND_ERROR)
+
+    def status_response(self, request, animation):
+        progress, eta, queue_position = animation.progress, None, None
+        if animation.status == Animation.PROCESSING:
+            # Time-based estimate; nothing is written back on a plain poll
+            progress, eta = animation.estimate_progress()
+            queue_position = DispatchQueue.position(animation.uuid)
+
+        wiggle_url = None
+        if animation.status in (Animation.PENDING, Animation.PROCESSING) and animation.wiggle_preview:
+            wiggle_url = request.build_absolute_uri(animation.wiggle_preview.url)
+
+        # Stored state only: the estimate changes with the clock and would defeat the 304s
+        started = int(animation.started_at.timestamp()) if animation.started_at else ''
+        etag = f'"{animation.status}-{animation.progress}-{queue_position}-{started}{"-w" if wiggle_url else ""}"'
+        next_poll_ms = self.next_poll_ms(animation.status, eta, queue_position)
+
+        if etag in request.headers.get('If-None-Match', ''):
+            response = HttpResponseNotModified()
+        else:
+            response_data = {
+                'success': True,
+                'status': animation.status,
+                'progress': progress,
+            }
+            if next_poll_ms is not None:
+                response_data['next_poll_ms'] = next_poll_ms
+
+            if animation.status == Animation.PROCESSING:
+                response_data['eta'] = eta
+                response_data['queue_position'] = queue_position
+                response_data['started_at'] = animation.started_at.isoformat() if animation.started_at else None
+            if wiggle_url:
+                response_data['wiggle_url'] = wiggle_url
+
+            if animation.status == Animation.COMPLETED:
+                response_data['output_url'] = request.build_absolute_uri(animation.download_url)
+                response_data['preview_url'] = request.build_absolute_uri(animation.preview_url)
+                response_data['thumbnail_url'] = (
+                    request.build_absolute_uri(animation.thumbnail.url) if animation.thumbnail else None
+                )
+
+            if animation.status == Animation.FAILED:
+                response_data['error'] = animation.error_message or 'Animation failed'
+
+            response = JsonResponse(response_data)
+
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        if next_poll_ms is not None:
+            response['X-Next-Poll-Ms'] = next_poll_ms
+        return response
+
+    @staticmethod
+    def next_poll_ms(status, eta, queue_position):
+        """
+        How long the client should wait before polling again, or None once finished.
+
+        Queued jobs back off in proportion to the work ahead of them; running
+        jobs poll at half the remaining ETA so completion is seen promptly.
+        """
+        if status in (Animation.COMPLETED, Animation.FAILED):
+            return None
+        if queue_position:
+            delay = config.STATUS_POLL_MIN_MS * (queue_position + 1)
+        else:
+            # Overdue jobs report a 1s ETA; don't let them poll every second
+            delay = max((eta or 0) * 1000 / 2, config.STATUS_POLL_MIN_MS * 2)
+        return int(min(max(delay, config.STATUS_POLL_MIN_MS), config.STATUS_POLL_MAX_MS))
 
-        if animation.status == Animation.COMPLETED:
-            response_data['output_url'] = animation.output_url or (
-                request.build_absolute_uri(animation.output_file.url) if animation.output_file else None
-            )
-            response_data['thumbnail_url'] = (
-                request.build_absolute_uri(animation.thumbnail.url) if animation.thumbnail else None
-            )
+    def check_api_status(self, api_uuid):
+        """Poll api.imageeditor.ai for animation status."""
+        return backend.check_api_status(api_uuid)
 
-        if animation.status == Animation.FAILED:
-            response_data['error'] = animation.error_message or 'Animation failed'
 
-        return JsonResponse(response_data)
+class AsyncAnimationStatus(AnimationStatus):
+    """AnimationStatus for the ASGI worker (ASYNC_VIEWS): the backend poll is awaited."""
 
-    def check_api_status(self, api_uuid):
-        """Poll api.imageeditor.ai for animation status."""
-        api_url = f"{config.API_BACKEND}/v1/animate/results/"
+    async def get(self, request, animation_id):
+        try:
+            animation = await Animation.objects.aget(uuid=animation_id)
+        except Animation.DoesNotExist:
+            return JsonResponse({
+                'success': False,
+                'error': 'Animation not found'
+            }, status=404)
 
-        headers = {}
-        if config.API_KEY:
-            headers['Authorization'] = config.API_KEY
+        if animation.status == Animation.PROCESSING and animation.api_request_id:
+            try:
+                api_result = await self.async_check_api_status(animation.api_request_id)
+                await sync_to_async(self.apply_api_result)(animation, api_result)
+            except Exception:
+                pass  # Ignore API errors, just return current status
 
+        return await sync_to_async(self.status_response)(request, animation)
+
+    async def async_check_api_status(self, api_uuid):
+        return await backend.async_check_api_status(api_uuid)
+
+
+class AnimationStatusBatch(View):
+    """
+    Status of several animations in one request, for pages tracking many jobs.
+
+    Reads the hot status snapshots, but like AnimationStatus also asks the
+    backend about processing jobs, so they finish even when a callback is
+    lost. That fan-out is bounded: one request per backend job (a batch's
+    animations share one), at most STATUS_BATCH_BACKEND_CHECKS per call, and
+    each job at most every STATUS_BACKEND_CHECK_INTERVAL seconds across all
+    pages polling it.
+    """
+
+    def post(self, request):
         try:
-            response = requests.post(
-                api_url,
-                data={'uuid': api_uuid},
-                headers=headers,
-                timeout=10
-            )
-            result = response.json()
-
-            # Parse api.imageeditor.ai response format
-            if result.get('files'):
-                # Check if any file is complete
-                for file_data in result.get('files', []):
-                    if file_data.get('outputfile'):
-                        return {
-                            'done': True,
-                            'output_url': file_data.get('outputfile'),
-                        }
-                    elif file_data.get('failed'):
-                        return {
-                            'failed': True,
-                            'error': file_data.get('error', 'Processing failed'),
-                        }
-                # Still processing
-                return {'done': False}
-            elif result.get('failed'):
-                return {
-                    'failed': True,
-                    'error': result.get('errors', ['Processing failed'])[0] if result.get('errors') else 'Processing failed',
-                }
-
-            return {'done': False}
-        except Exception:
-            return None
+            uuids = json.loads(request.body).get('animation_ids')
+        except (json.JSONDecodeError, AttributeError):
+            return JsonResponse({'success': False, 'error': 'Invalid JSON'}, status=400)
+
+        if (not isinstance(uuids, list) or not all(isinstance(uuid, str) for uuid in uuids)
+                or len(uuids) > config.STATUS_BATCH_LIMIT):
+            return JsonResponse({
+                'success': False,
+                'error': f'animation_ids must be a list of at most {config.STATUS_BATCH_LIMIT} ids'
+            }, status=400)
+
+        user_id = request.user.id if request.user.is_authenticated else None
+        session_key = request.session.session_key
+
+        # Unknown and foreign ids are both simply left out
+        snapshots = {
+            uuid: snapshot
+            for uuid, snapshot in Animation.get_status_snapshots(list(dict.fromkeys(uuids))).items()
+            if (user_id and snapshot['user_id'] == user_id) or (session_key and snapshot['session_key'] == session_key)
+        }
+        snapshots.update(self.check_processing(snapshots))
+
+        animations = {}
+        next_poll_ms = None
+        for uuid, snapshot in snapshots.items():
+            item = {'status': snapshot['status'], 'progress': snapshot['progress']}
+            if snapshot['status'] == Animation.COMPLETED:
+                item['output_url'] = request.build_absolute_uri(reverse('animation_download', args=[uuid]))
+                item['preview_url'] = request.build_absolute_uri(reverse('animation_media', args=[uuid]))
+            elif snapshot['status'] == Animation.FAILED:
+                item['error'] = snapshot['error_message'] or 'Animation failed'
+            else:
+                hint = AnimationStatus.next_poll_ms(snapshot['status'], None, None)
+                next_poll_ms = hint if next_poll_ms is None else min(next_poll_ms, hint)
+            animations[uuid] = item
+
+        return JsonResponse({'success': True, 'animations': animations, 'next_poll_ms': next_poll_ms})
+
+    def check_processing(self, snapshots):
+        """Poll the backend for processing jobs due a check; returns the fresh snapshots of those polled."""
+        jobs = {}
+        for uuid, snapshot in snapshots.items():
+            api_request_id = snapshot.get('api_request_id')
+            if snapshot['status'] == Animation.PROCESSING and api_request_id:
+                jobs.setdefault(api_request_id.partition('#')[0], []).append(uuid)
+
+        due = []
+        for job, members in jobs.items():
+            if len(due) >= config.STATUS_BATCH_BACKEND_CHECKS:
+                break
+            if cache.add(f'status_check:{job}', 1, timeout=config.STATUS_BACKEND_CHECK_INTERVAL):
+                due.extend(members)
+        if not due:
+            return {}
+
+        animations = list(Animation.objects.filter(uuid__in=due, status=Animation.PROCESSING))
+        results = self.check_api_statuses([animation.api_request_id for animation in animations])
+        for animation in animations:
+            AnimationStatus.apply_api_result(animation, results.get(animation.api_request_id))
+        return Animation.load_status_snapshots(due)
+
+    def check_api_statuses(self, api_uuids):
+        return backend.check_api_statuses(api_uuids)
+
+
+def has_valid_signature(request):
+    """Check the X-Signature header: hex HMAC-SHA256 of the raw body with CALLBACK_SECRET."""
+    signature = request.headers.get('X-Signature', '')
+    if signature.startswith('sha256='):
+        signature = signature[len('sha256='):]
+    expected = hmac.new(config.CALLBACK_SECRET.encode(), request.body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(signature, expected)
+
+
+def read_callback(request):
+    """Verify and parse a callback body. Returns (data, None) or (None, error response)."""
+    if config.CALLBACK_SECRET and not has_valid_signature(request):
+        return None, JsonResponse({'error': 'Invalid signature'}, status=403)
+
+    try:
+        return json.loads(request.body), None
+    except json.JSONDecodeError:
+        return None, JsonResponse({'error': 'Invalid JSON'}, status=400)
+
+
+def apply_callback(animation, data):
+    status = data.get('status')
+    if status == 'completed':
+        animation.mark_completed(data.get('output_url'), data.get('gpu_seconds'))
+    elif status == 'failed':
+        animation.mark_failed(data.get('error') or 'Processing failed', Animation.REASON_BACKEND_ERROR)
+    elif status == 'processing':
+        animation.update_progress(data.get('progress', 0))
 
 
 @csrf_exempt
 @require_http_methods(["POST"])
 def animation_callback(request):
     """Callback endpoint for API to report animation completion."""
+    data, response = read_callback(request)
+    if response:
+        return response
+
     try:
-        data = json.loads(request.body)
-    except json.JSONDecodeError:
-        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+        animation = Animation.objects.get(uuid=data.get('animation_id'))
+    except Animation.DoesNotExist:
+        return JsonResponse({'error': 'Animation not found'}, status=404)
 
-    animation_id = data.get('animation_id')
-    status = data.get('status')
-    output_url = data.get('output_url')
-    error = data.get('error')
+    apply_callback(animation, data)
+    return JsonResponse({'success': True})
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+async def async_animation_callback(request):
+    """animation_callback for the ASGI worker (ASYNC_VIEWS)."""
+    data, response = read_callback(request)
+    if response:
+        return response
 
     try:
-        animation = Animation.objects.get(uuid=animation_id)
+        animation = await Animation.objects.aget(uuid=data.get('animation_id'))
     except Animation.DoesNotExist:
         return JsonResponse({'error': 'Animation not found'}, status=404)
 
-    if status == 'completed':
-        animation.status = Animation.COMPLETED
-        animation.output_url = output_url
-        animation.completed_at = timezone.now()
-        animation.progress = 100
-    elif status == 'failed':
-        animation.status = Animation.FAILED
-        animation.error_message = error or 'Processing failed'
-        animation.completed_at = timezone.now()
-    elif status == 'processing':
-        animation.progress = data.get('progress', 0)
-
-    animation.save()
+    await sync_to_async(apply_callback)(animation, data)
     return JsonResponse({'success': True})
 
 
+@csrf_exempt
+@require_http_methods(["POST"])
+def animation_callback_batch(request):
+    """
+    Signed batch callback for the backend to flush many status updates at once.
+
+    Body: {"updates": [{"animation_id", "status", "seq", ...}, ...]}, signed
+    with CALLBACK_SECRET in the X-Signature header.
+    """
+    if not config.CALLBACK_SECRET or not has_valid_signature(request):
+        return JsonResponse({'error': 'Invalid signature'}, status=403)
+
+    try:
+        updates = json.loads(request.body).get('updates')
+    except (json.JSONDecodeError, AttributeError):
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+
+    if not isinstance(updates, list) or len(updates) > config.CALLBACK_BATCH_LIMIT:
+        return JsonResponse({'error': f'updates must be a list of at most {config.CALLBACK_BATCH_LIMIT}'}, status=400)
+
+    valid_statuses = ('completed', 'failed', 'processing')
+    for update in updates:
+        if (not isinstance(update, dict) or not isinstance(update.get('animation_id'), str)
+                or update.get('status') not in valid_statuses or not isinstance(update.get('seq'), int)):
+            return JsonResponse({'error': 'Each update needs animation_id, status and an integer seq'}, status=400)
+
+    applied = Animation.apply_callback_updates(updates)
+    return JsonResponse({'success': True, 'applied': applied, 'ignored': len(updates) - applied})
+
+
+class AnimationDownload(View):
+    """
+    Serve a completed animation in the format the user chose.
+
+    The owner's plan is checked on every request: the unwatermarked master
+    for animations rendered without a watermark or owned by a Pro user, the
+    cached watermarked variant for everyone else. Upgrading unlocks clean
+    files immediately, without another render.
+    """
+
+    def get(self, request, animation_id):
+        animation, output, response = self.get_output(animation_id)
+        if response:
+            return response
+
+        extension = os.path.splitext(output.name)[1]
+        response = FileResponse(output.open('rb'), filename=f'animation-{animation.uuid}{extension}')
+        # The variant depends on the owner's current plan
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+    @staticmethod
+    def get_output(animation_id):
+        """
+        Look up a completed animation and the file it is delivered as.
+
+        Returns:
+            (animation, file, None), or (None, None, error response)
+        """
+        animation = Animation.objects.select_related('user').filter(
+            uuid=animation_id, status=Animation.COMPLETED,
+        ).first()
+        if not animation:
+            return None, None, JsonResponse({
+                'success': False,
+                'error': 'Animation not found'
+            }, status=404)
+
+        try:
+            if not animation.store_master():
+                return None, None, JsonResponse({
+                    'success': False,
+                    'error': 'Animation output is not available'
+                }, status=404)
+        except Exception as e:
+            logger.warning("Could not fetch master for %s: %s", animation.uuid, e)
+            return None, None, JsonResponse({
+                'success': False,
+                'error': 'Animation output is temporarily unavailable. Please try again.'
+            }, status=503)
+
+        try:
+            return animation, animation.get_delivery_file(), None
+        except ValueError:
+            return None, None, JsonResponse({
+                'success': False,
+                'error': 'Upgrade to Pro to download this animation.'
+            }, status=403)
+
+
+class AnimationMedia(AnimationDownload):
+    """
+    Inline display of a completed animation (gallery, history, result preview).
+
+    Picks the smallest WebP/AVIF variant the browser accepts, falling back to
+    the delivered file, and answers with Vary: Accept. ?w= asks for one of
+    the PREVIEW_WIDTHS renditions (srcset), which also come as GIF. Stored
+    names are content hashes, so they double as ETags. Missing variants are
+    queued for the worker rather than made in the request.
+    """
+
+    def get(self, request, animation_id):
+        animation, output, response = self.get_output(animation_id)
+        if response:
+            return response
+
+        content_type = None
+        if animation.output_format == Animation.FORMAT_GIF:
+            accept = request.headers.get('Accept', '')
+            accepted = [fmt for fmt in config.ANIMATION_VARIANT_FORMATS if f'image/{fmt}' in accept]
+            width = request.GET.get('w', '')
+            width = int(width) if width.isdigit() and int(width) in config.PREVIEW_WIDTHS else 0
+            if width:
+                accepted.append('gif')
+            variant = animation.get_best_variant(accepted, output, width) if accepted else None
+            if variant:
+                output, content_type = variant.file, f'image/{variant.format}'
+            elif accepted and cache.add(f'animation_variants:{animation.uuid}', 1, timeout=600):
+                Animation.schedule_store_output([animation.uuid])
+
+        etag = f'"{os.path.splitext(os.path.basename(output.name))[0]}"'
+        if etag in request.headers.get('If-None-Match', ''):
+            response = HttpResponseNotModified()
+        else:
+            response = FileResponse(output.open('rb'), content_type=content_type)
+        response['ETag'] = etag
+        response['Vary'] = 'Accept'
+        # The variant depends on the owner's current plan
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+
+class QueueStatus(View):
+    """Queue depth for the caller's tier, plus their position when an animation_id is given."""
+
+    def get(self, request):
+        is_pro = request.user.is_authenticated and request.user.is_plan_active
+        tier = DispatchQueue.tier(is_pro)
+        animation_id = request.GET.get('animation_id')
+
+        return JsonResponse({
+            'success': True,
+            **DispatchQueue.summary(tier, animation_id),
+        })
+
+
 class GalleryPage(View):
     """Gallery of example animations."""
 
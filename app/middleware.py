@@ -0,0 +1,95 @@
+import logging
+import math
+
+from django.core.cache import cache
+from django.http import JsonResponse
+from django_redis import get_redis_connection
+
+from app.utils import Utils
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class BurstLimitMiddleware:
+    """
+    Per-IP and per-session token buckets in front of the upload and accounts APIs.
+
+    Each matching write request takes one token from every bucket it belongs
+    to in a single Lua script, so the check is one atomic Redis round trip.
+    Requests are rejected with 429 before the view runs and before the body
+    is read. Bucket sizes come from BURST_LIMITS per tier.
+
+    Needs the django_redis cache; with any other cache backend, or if Redis
+    is unreachable, requests are let through.
+    """
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+    # KEYS: bucket keys. ARGV: capacity, refill rate (tokens/second).
+    # Returns {1, 0} when allowed, {0, ms until a token is available} when not.
+    SCRIPT = """
+    local capacity = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local time = redis.call('TIME')
+    local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+    local ttl = math.ceil(capacity / rate) + 1
+    local tokens = {}
+    local wait = 0
+    for i, key in ipairs(KEYS) do
+        local bucket = redis.call('HMGET', key, 'tokens', 'ts')
+        local available = tonumber(bucket[1]) or capacity
+        local ts = tonumber(bucket[2]) or now
+        available = math.min(capacity, available + math.max(0, now - ts) * rate)
+        tokens[i] = available
+        if available < 1 then
+            wait = math.max(wait, (1 - available) / rate)
+        end
+    end
+    if wait > 0 then
+        return {0, math.ceil(wait * 1000)}
+    end
+    for i, key in ipairs(KEYS) do
+        redis.call('HSET', key, 'tokens', tokens[i] - 1, 'ts', now)
+        redis.call('EXPIRE', key, ttl)
+    end
+    return {1, 0}
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.script = None
+
+    def __call__(self, request):
+        if request.method not in self.SAFE_METHODS and request.path.startswith(config.BURST_LIMIT_PATHS):
+            retry_after_ms = self.take_token(request)
+            if retry_after_ms:
+                response = JsonResponse({
+                    'success': False,
+                    'error': 'Too many requests, please slow down',
+                    'retry_after': retry_after_ms / 1000,
+                }, status=429)
+                response['Retry-After'] = math.ceil(retry_after_ms / 1000)
+                return response
+
+        return self.get_response(request)
+
+    def take_token(self, request):
+        """Take a token from the request's buckets. Returns 0 if allowed, else ms until refill."""
+        is_pro = request.user.is_authenticated and request.user.is_plan_active
+        limits = config.BURST_LIMITS['pro' if is_pro else 'free']
+
+        keys = [cache.make_key(f"burst:ip:{Utils.get_proxy_ip(request)}")]
+        if request.session.session_key:
+            keys.append(cache.make_key(f"burst:session:{request.session.session_key}"))
+
+        try:
+            if self.script is None:
+                self.script = get_redis_connection('default').register_script(self.SCRIPT)
+            allowed, retry_after_ms = self.script(keys=keys, args=[limits['capacity'], limits['refill_rate']])
+        except NotImplementedError:
+            return 0  # Not a django_redis cache
+        except Exception as e:
+            logger.warning("Burst limiter unavailable: %s", e)
+            return 0
+
+        return 0 if allowed else int(retry_after_ms)
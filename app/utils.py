@@ -122,6 +122,16 @@ class Utils:
                 ip = request.META.get('REMOTE_ADDR')
         return ip
 
+    @staticmethod
+    def get_proxy_ip(request):
+        """
+        Client IP as our nginx saw it, for limits clients must not dodge.
+
+        nginx sets X-Real-IP to $remote_addr; the first X-Forwarded-For
+        entry is whatever the client sent.
+        """
+        return request.META.get('HTTP_X_REAL_IP') or request.META.get('REMOTE_ADDR')
+
     @staticmethod
     def clear_cache():
         cache.clear()
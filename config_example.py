@@ -7,6 +7,11 @@ DEBUG = True
 # API Backend for animation processing
 API_BACKEND = 'https://api.drawinganimator.com'
 API_KEY = ''  # API authentication key
+API_INPUT_REUSE = False  # Backend accepts input_id from an earlier render instead of the upload
+CALLBACK_SECRET = ''  # Shared HMAC secret for backend callbacks (required for batch callbacks)
+CALLBACK_BATCH_LIMIT = 500  # Max status updates per batch callback
+ASYNC_VIEWS = False  # Serve the animate/status/callback APIs with async views (ASGI worker mode)
+API_MAX_CONNECTIONS = 100  # Pooled backend connections per async worker process
 
 # Google Translate API (for translations)
 GOOGLE_API = ''
@@ -64,6 +69,22 @@ RATE_LIMIT = 5  # Free tier: animations per day
 RATE_LIMIT_PRO = 1000  # Pro tier: animations per day
 FILES_LIMIT = 52428800  # 50MB max file size
 
+# GPU cost model (estimates in GPU-seconds)
+GPU_SECONDS_PER_FRAME = 0.25  # At GPU_REFERENCE_PIXELS input size
+GPU_JOB_OVERHEAD = 2.0  # Model load / upload / encode setup per job
+GPU_REFERENCE_PIXELS = 512 * 512
+GPU_FORMAT_COST = {'gif': 1.0, 'mp4': 1.1, 'webm': 1.3}
+
+# Render limits and GPU budgets per tier
+ANIMATION_LIMITS = {
+    'free': {'max_duration': 3.0, 'max_fps': 24},
+    'pro': {'max_duration': 10.0, 'max_fps': 30},
+}
+GPU_BUDGETS = {
+    'free': {'per_job': 60, 'per_user_daily': 200, 'tier_daily': 50000},
+    'pro': {'per_job': 120, 'per_user_daily': 5000, 'tier_daily': 200000},
+}
+
 # Animation Settings
 ANIMATION_PRESETS = [
     {'id': 'walk', 'name': 'Walking', 'icon': 'bi-person-walking', 'premium': False},
@@ -76,6 +97,72 @@ ANIMATION_PRESETS = [
     {'id': 'backflip', 'name': 'Backflip', 'icon': 'bi-arrow-clockwise', 'premium': True},
 ]
 
+# Progress estimation
+ANIMATION_EXPECTED_SECONDS = 20  # Assumed processing time until there is history
+ANIMATION_STATS_SAMPLE = 200  # Recent completed animations used for timing stats
+ANIMATION_STATS_TTL = 300  # Seconds to cache timing stats
+QUEUE_THROUGHPUT_WINDOW = 10  # Minutes of completions used for expected wait
+
+# Micro-batched dispatch
+DISPATCH_BATCH_WINDOW_MS = 0  # Hold new jobs this long to batch them (0 = send each one immediately)
+DISPATCH_BATCH_SIZE = 8  # Max drawings per backend request
+
+# Status polling
+STATUS_POLL_MIN_MS = 1000  # Shortest next_poll_ms hint sent to clients
+STATUS_POLL_MAX_MS = 15000  # Longest next_poll_ms hint sent to clients
+STATUS_CACHE_TIMEOUT = 3600  # Seconds to keep a finished animation's status in the hot status cache
+STATUS_CACHE_ACTIVE_TIMEOUT = 30  # Same for animations still pending or processing
+STATUS_BATCH_LIMIT = 50  # Max animations per multi-status request
+STATUS_BATCH_BACKEND_CHECKS = 3  # Max backend requests a multi-status request makes for processing jobs
+STATUS_BACKEND_CHECK_INTERVAL = 5  # Seconds between multi-status backend checks of the same job
+
+# Watermarking (applied at download time for animations that need it)
+WATERMARK_TEXT = 'drawinganimator.com'
+WATERMARK_OPACITY = 0.6  # 0-1
+
+# Inline delivery
+ANIMATION_VARIANT_FORMATS = ('avif', 'webp')  # Animated derivatives of GIF outputs (if Pillow can encode them)
+PREVIEW_WIDTHS = (320, 640)  # Downscaled renditions for gallery and history grids (srcset)
+
+# Wiggle preview
+WIGGLE_PREVIEW = True  # Animate the uploaded drawing on the CPU while the render is pending
+WIGGLE_PREVIEW_SIZE = 240  # Longest side of the wiggle preview, in pixels
+
+# Auto-crop
+AUTO_CROP = True  # Cut the blank paper around drawings before rendering
+AUTO_CROP_MARGIN = 0.05  # Margin kept around the drawing, as a fraction of its longer side
+AUTO_CROP_MIN_SAVING = 0.15  # Only crop when it removes at least this fraction of the area
+
+# Near-duplicate uploads
+NEAR_DUPLICATE_DISTANCE = 3  # Max differing dHash bits (of 64) to suggest the submitter's earlier render, or count toward flagging
+NEAR_DUPLICATE_REUSE = True  # Hand over a recent render of the same file (sha256) with the same settings
+NEAR_DUPLICATE_REUSE_DAYS = 30  # How far back to look for a render to reuse or suggest
+NEAR_DUPLICATE_FLAG_COUNT = 20  # Flag submitters sending the same drawing this many times a day
+
+# Uploads
+UPLOAD_MAX_BYTES = 10 * 1024 * 1024  # Uploads are cut off once they pass this size
+UPLOAD_MAX_PIXELS = 40_000_000  # Reject images with more pixels than this (decompression bombs)
+
+# Idempotent animate requests
+IDEMPOTENCY_KEY_TTL = 60 * 60 * 24  # Seconds a completed request's response is replayed for
+IDEMPOTENCY_PENDING_TIMEOUT = 120  # Seconds a request in flight blocks duplicates
+
+# Burst limiter (token buckets per IP and per session, Redis only)
+BURST_LIMIT_PATHS = ('/animate/api/animate/', '/api/accounts/')  # Path prefixes limited on write requests
+BURST_LIMITS = {
+    'free': {'capacity': 10, 'refill_rate': 0.5},  # Burst size, tokens per second
+    'pro': {'capacity': 30, 'refill_rate': 2},
+}
+
+# Stuck-job reaper
+REAPER_MIN_TIMEOUT = 300  # Never reap an animation younger than this (seconds)
+REAPER_TIMEOUT_MULTIPLIER = 5  # Timeout = p90 processing time x this
+REAPER_ALERT_THRESHOLD = 10  # Log a warning when a run reaps more than this
+
+# Bulk requeue of failed animations
+REQUEUE_BATCH_SIZE = 50  # Animations dispatched per batch
+REQUEUE_BATCH_INTERVAL = 30  # Seconds between batches
+
 # Script Version (for cache busting)
 SCRIPT_VERSION = '1.0.0'
 
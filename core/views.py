@@ -13,8 +13,8 @@ import config
 class IndexPage(View):
     def get(self, request):
         settings = GlobalVars.get_globals(request)
-        from animator.models import AnimationPreset
-        presets = AnimationPreset.objects.filter(is_active=True).order_by('sort_order')[:8]
+        from animator.models import AnimationPreset, PresetDemo
+        presets = PresetDemo.attach_demos(AnimationPreset.objects.filter(is_active=True).order_by('sort_order')[:8])
         return render(
             request,
             'index.html',
@@ -1,17 +1,42 @@
 """
 Tests for API endpoints: CreditsConsume, RateLimit, ResendVerificationEmail,
-CancelSubscription, AnimateAPI, AnimationStatus, and animation_callback.
+CancelSubscription, burst limiting, AnimateAPI, AnimationStatus, AnimationStatusBatch,
+AnimationDownload and AnimationMedia, animation_callback and
+animation_callback_batch, and their async variants.
 """
+import hashlib
+import hmac
 import json
+import os
+import shutil
+import struct
+import tempfile
+import zlib
+from datetime import timedelta
 from io import BytesIO
 from unittest import mock
 
+import httpx
+import numpy as np
+import redis
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import TestCase, Client, override_settings
+from django.test import AsyncRequestFactory, TestCase, Client, override_settings
 from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from redis.backoff import NoBackoff
+from redis.retry import Retry
 
 from accounts.models import CustomUser
+from app.middleware import BurstLimitMiddleware
+from animator import backend, tasks
 from animator.models import Animation, AnimationPreset
+from animator.views import AsyncAnimateAPI, AsyncAnimationStatus, async_animation_callback
 from finances.models.plan import Plan
 from translations.models.language import Language
 from translations.models.translation import Translation
@@ -41,6 +66,33 @@ def _create_test_image(name='test.png', size=(100, 100), content_type='image/png
     return SimpleUploadedFile(name, _make_png(), content_type=content_type)
 
 
+def _create_test_gif(frames=4, size=(64, 48)):
+    """Create a small animated GIF, as the backend delivers."""
+    images = [Image.new('RGB', size, (i * 40, 100, 200)) for i in range(frames)]
+    buffer = BytesIO()
+    images[0].save(buffer, format='GIF', save_all=True, append_images=images[1:], duration=80, loop=0)
+    return buffer.getvalue()
+
+
+def _lua_redis():
+    """A Redis that runs Lua scripts: the RQ server, else fakeredis if installed."""
+    queue = settings.RQ_QUEUES['default']
+    client = redis.Redis(
+        host=queue['HOST'], port=queue['PORT'], socket_connect_timeout=0.5, retry=Retry(NoBackoff(), 0),
+    )
+    try:
+        client.ping()
+        return client
+    except redis.RedisError:
+        pass
+    try:
+        import fakeredis
+        import lupa  # noqa: F401 -- fakeredis runs Lua through it
+    except ImportError:
+        return None
+    return fakeredis.FakeRedis()
+
+
 @override_settings(
     CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
     SESSION_ENGINE='django.contrib.sessions.backends.db',
@@ -78,6 +130,7 @@ class APITestBase(TestCase):
 
     def setUp(self):
         self.client = Client()
+        cache.clear()
 
     def _create_user(self, email='api@test.com', password='testpass123', is_confirm=True, credits=10):
         user = CustomUser.objects.create(email=email, credits=credits, is_confirm=is_confirm)
@@ -318,6 +371,125 @@ class AnimateAPITests(APITestBase):
         data = resp.json()
         self.assertIn('too large', data.get('error', ''))
 
+    @mock.patch('animator.views.AnimateAPI.send_to_api')
+    def test_animate_sniffs_real_format_and_hashes(self, mock_send):
+        mock_send.return_value = {'success': True, 'request_id': 'api-uuid-sniff'}
+        image = _create_test_image(size=(120, 80), content_type='application/octet-stream')
+        content = image.read()
+        image.seek(0)
+        resp = self.client.post(reverse('api_animate'), {'image': image, 'preset': 'walk'})
+        self.assertEqual(resp.status_code, 200)
+        anim = Animation.objects.get(uuid=resp.json()['animation_id'])
+        self.assertEqual((anim.input_width, anim.input_height), (120, 80))
+        self.assertEqual(anim.input_sha256, hashlib.sha256(content).hexdigest())
+
+    @mock.patch('animator.views.AnimateAPI.send_to_api')
+    def test_animate_idempotency_key_replays_response(self, mock_send):
+        mock_send.return_value = {'success': True, 'request_id': 'api-uuid-once'}
+        first = self.client.post(
+            reverse('api_animate'), {'image': _create_test_image(), 'preset': 'walk'},
+            HTTP_IDEMPOTENCY_KEY='retry-key-1',
+        )
+        second = self.client.post(
+            reverse('api_animate'), {'image': _create_test_image(), 'preset': 'walk'},
+            HTTP_IDEMPOTENCY_KEY='retry-key-1',
+        )
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json()['animation_id'], first.json()['animation_id'])
+        self.assertEqual(Animation.objects.count(), 1)
+        mock_send.assert_called_once()
+
+    @mock.patch('animator.views.AnimateAPI.send_to_api')
+    def test_animate_idempotency_key_scoped_to_anonymous_session(self, mock_send):
+        mock_send.return_value = {'success': True, 'request_id': 'api-uuid-shared'}
+        ids = [
+            client.post(
+                reverse('api_animate'), {'image': _create_test_image(), 'preset': 'walk'},
+                HTTP_IDEMPOTENCY_KEY='shared-key',
+            ).json()['animation_id']
+            for client in (self.client, Client())
+        ]
+        self.assertNotEqual(ids[0], ids[1])
+        self.assertEqual(mock_send.call_count, 2)
+
+    @mock.patch('animator.views.AnimateAPI.send_to_api')
+    def test_animate_idempotency_key_in_flight(self, mock_send):
+        session = self.client.session
+        session.save()
+        cache.add(f'idempotency:animate:session:{session.session_key}:' + hashlib.sha256(b'busy-key').hexdigest(), 'pending')
+        resp = self.client.post(
+            reverse('api_animate'), {'image': _create_test_image(), 'preset': 'walk'},
+            HTTP_IDEMPOTENCY_KEY='busy-key',
+        )
+        self.assertEqual(resp.status_code, 409)
+        mock_send.assert_not_called()
+
+    @mock.patch('animator.views.AnimateAPI.send_to_api')
+    def test_animate_idempotency_key_failed_attempt_can_retry(self, mock_send):
+        mock_send.return_value = {'success': False, 'error': 'Backend overloaded'}
+        self.client.post(
+            reverse('api_animate'), {'image': _create_test_image(), 'preset': 'walk'},
+            HTTP_IDEMPOTENCY_KEY='retry-key-2',
+        )
+        mock_send.return_value = {'success': True, 'request_id': 'api-uuid-retry'}
+        resp = self.client.post(
+            reverse('api_animate'), {'image': _create_test_image(), 'preset': 'walk'},
+            HTTP_IDEMPOTENCY_KEY='retry-key-2',
+        )
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(mock_send.call_count, 2)
+
+    @mock.patch('animator.views.AnimateAPI.send_to_api')
+    def test_animate_reuses_owned_input(self, mock_send):
+        mock_send.return_value = {'success': True, 'request_id': 'api-uuid-first', 'input_handle': 'input-42'}
+        first = self.client.post(reverse('api_animate'), {'image': _create_test_image(), 'preset': 'walk'})
+        source = Animation.objects.get(uuid=first.json()['animation_id'])
+        self.assertEqual(source.input_handle, 'input-42')
+
+        mock_send.return_value = {'success': True, 'request_id': 'api-uuid-second'}
+        resp = self.client.post(reverse('api_animate'), {'source_animation_id': source.uuid, 'preset': 'walk', 'format': 'gif'})
+        self.assertEqual(resp.status_code, 200)
+        rerender = Animation.objects.get(uuid=resp.json()['animation_id'])
+        self.assertEqual(rerender.input_image.name, source.input_image.name)
+        self.assertEqual(rerender.input_handle, 'input-42')
+        self.assertEqual((rerender.input_width, rerender.input_height), (source.input_width, source.input_height))
+
+    def test_animate_rejects_foreign_source(self):
+        source = Animation.objects.create(
+            status=Animation.COMPLETED,
+            input_image=_create_test_image(),
+            preset=self.preset_walk,
+            session_key='someone-else',
+        )
+        resp = self.client.post(reverse('api_animate'), {'source_animation_id': source.uuid, 'preset': 'walk'})
+        self.assertEqual(resp.status_code, 404)
+        self.assertEqual(Animation.objects.count(), 1)
+
+    @mock.patch('django_rq.get_queue')
+    @mock.patch('animator.views.AnimateAPI.send_to_api')
+    @mock.patch('config.WIGGLE_PREVIEW', False)
+    @mock.patch('config.DISPATCH_BATCH_WINDOW_MS', 300)
+    def test_animate_batched_dispatch(self, mock_send, mock_get_queue):
+        first = self.client.post(reverse('api_animate'), {'image': _create_test_image(), 'preset': 'walk'})
+        self.client.post(reverse('api_animate'), {'image': _create_test_image(), 'preset': 'walk'})
+        self.assertEqual(first.json()['status'], Animation.PENDING)
+        mock_send.assert_not_called()
+        # One batch job for both animations
+        mock_get_queue.return_value.enqueue.assert_called_once()
+
+    def test_animate_rejects_decompression_bomb(self):
+        # PNG claiming 20000x20000 pixels with a tiny IDAT; never decoded
+        def chunk(chunk_type, data):
+            return struct.pack('>I', len(data)) + chunk_type + data + struct.pack('>I', zlib.crc32(chunk_type + data))
+
+        ihdr = struct.pack('>IIBBBBB', 20000, 20000, 8, 2, 0, 0, 0)
+        content = b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', ihdr) + chunk(b'IDAT', zlib.compress(b'\x00')) + chunk(b'IEND', b'')
+        bomb = SimpleUploadedFile('bomb.png', content, content_type='image/png')
+        resp = self.client.post(reverse('api_animate'), {'image': bomb, 'preset': 'walk'})
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn('dimensions are too large', resp.json()['error'])
+        self.assertEqual(Animation.objects.count(), 0)
+
     @mock.patch('animator.views.AnimateAPI.send_to_api')
     def test_animate_premium_preset_denied_for_free_user(self, mock_send):
         image = _create_test_image()
@@ -392,6 +564,296 @@ class AnimateAPITests(APITestBase):
         self.assertEqual(resp.status_code, 429)
 
 
+    @mock.patch('animator.views.AnimateAPI.send_to_api')
+    def test_animate_records_estimated_cost_and_clamps_settings(self, mock_send):
+        mock_send.return_value = {'success': True, 'request_id': 'cost-1', 'job_id': 'cost-1'}
+        resp = self.client.post(
+            reverse('api_animate'),
+            {'image': _create_test_image(), 'preset': 'walk', 'duration': '30', 'fps': '60'},
+        )
+        self.assertEqual(resp.status_code, 200)
+        anim = Animation.objects.get(uuid=resp.json()['animation_id'])
+        # Free tier is capped at 3s / 24fps
+        self.assertEqual(anim.duration, 3.0)
+        self.assertEqual(anim.fps, 24)
+        self.assertEqual((anim.input_width, anim.input_height), (100, 100))
+        self.assertEqual(
+            anim.estimated_cost,
+            Animation.estimate_cost(self.preset_walk, 'gif', 3.0, 24, 100, 100),
+        )
+
+    @mock.patch('animator.views.AnimateAPI.send_to_api')
+    def test_animate_rejects_invalid_settings(self, mock_send):
+        for settings in [{'duration': 'nan'}, {'duration': 'inf'}, {'duration': 'abc'}, {'fps': '12.5'}, {'fps': 'nan'}]:
+            resp = self.client.post(reverse('api_animate'), {'image': _create_test_image(), 'preset': 'walk', **settings})
+            self.assertEqual(resp.status_code, 400, settings)
+            self.assertEqual(resp.json()['error'], 'Invalid duration or fps.')
+        self.assertFalse(Animation.objects.exists())
+        mock_send.assert_not_called()
+
+    @mock.patch('django_rq.get_queue')
+    @mock.patch('animator.views.AnimateAPI.send_to_api')
+    def test_animate_queues_wiggle_preview(self, mock_send, mock_get_queue):
+        mock_send.return_value = {'success': True, 'request_id': 'api-wiggle'}
+        resp = self.client.post(reverse('api_animate'), {'image': _create_test_image(), 'preset': 'walk'})
+        self.assertEqual(resp.status_code, 200)
+        mock_get_queue.assert_called_once_with('high')
+        mock_get_queue.return_value.enqueue.assert_called_once_with(
+            'animator.tasks.make_wiggle_preview', Animation.objects.get().uuid,
+        )
+
+    @mock.patch('animator.views.AnimateAPI.send_to_api')
+    def test_animate_crops_blank_paper(self, mock_send):
+        mock_send.return_value = {'success': True, 'request_id': 'api-crop'}
+        sheet = Image.new('RGB', (400, 300), (240, 235, 220))
+        sheet.paste((20, 20, 20), (150, 100, 250, 200))
+        buffer = BytesIO()
+        sheet.save(buffer, format='PNG')
+        upload = SimpleUploadedFile('sheet.png', buffer.getvalue(), content_type='image/png')
+
+        resp = self.client.post(reverse('api_animate'), {'image': upload, 'preset': 'walk', 'pad_output': 'on'})
+
+        self.assertEqual(resp.status_code, 200)
+        anim = Animation.objects.get()
+        self.assertEqual(anim.crop_box, (145, 95, 255, 205))
+        self.assertEqual(anim.crop_background, '#f0ebdc')
+        self.assertTrue(anim.pad_output)
+        self.assertEqual((anim.input_width, anim.input_height), (400, 300))
+        self.assertEqual(anim.estimated_cost, Animation.estimate_cost(self.preset_walk, 'gif', 3.0, 24, 110, 110))
+        # The backend gets the crop; the stored input stays as uploaded
+        _, files = backend._animate_payload(anim)
+        self.assertEqual(Image.open(BytesIO(files['files'][1])).size, (110, 110))
+        self.assertEqual(Image.open(anim.input_image).size, (400, 300))
+
+    def _drawing_upload(self, offset=0, quality=90):
+        """A stick figure on white paper, as a camera JPEG."""
+        drawing = Image.new('RGB', (400, 300), (250, 250, 245))
+        drawing.paste((20, 20, 20), (190 + offset, 60, 196 + offset, 240))
+        drawing.paste((20, 20, 20), (140 + offset, 110, 250 + offset, 116))
+        drawing.paste((20, 20, 20), (160 + offset, 60, 226 + offset, 66))
+        buffer = BytesIO()
+        drawing.save(buffer, format='JPEG', quality=quality)
+        return SimpleUploadedFile('drawing.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+    def _completed_render(self, upload, **fields):
+        """A completed animation of `upload` with a stored master."""
+        data = upload.read()
+        return Animation.objects.create(
+            status=Animation.COMPLETED, completed_at=timezone.now(), preset=self.preset_walk,
+            input_image=upload, input_sha256=hashlib.sha256(data).hexdigest(),
+            output_url='https://x/earlier.gif', output_file='private/ab/cd/earlier.gif',
+            **Animation.dhash_fields(Animation.detect_dhash(data, Animation.detect_crop(data))),
+            **fields,
+        )
+
+    @mock.patch('animator.models.Animation.schedule_store_output')
+    @mock.patch('animator.views.AnimateAPI.send_to_api')
+    def test_animate_reuses_render_of_same_upload(self, mock_send, mock_store):
+        mock_send.return_value = {'success': True, 'request_id': 'api-fresh'}
+        upload = self._drawing_upload(quality=95)
+        earlier = self._completed_render(upload, session_key='someone-else')
+
+        upload.seek(0)
+        resp = self.client.post(reverse('api_animate'), {
+            'image': SimpleUploadedFile('drawing.jpg', upload.read(), content_type='image/jpeg'), 'preset': 'walk',
+        })
+
+        data = resp.json()
+        self.assertTrue(data['reused'])
+        self.assertEqual(data['status'], Animation.COMPLETED)
+        anim = Animation.objects.get(uuid=data['animation_id'])
+        self.assertEqual(anim.duplicate_of, earlier)
+        self.assertEqual(anim.output_file.name, earlier.output_file.name)
+        self.assertEqual(anim.estimated_cost, 0)
+        mock_send.assert_not_called()
+        mock_store.assert_called_once_with([anim.uuid])
+
+    @mock.patch('animator.views.AnimateAPI.send_to_api')
+    def test_animate_never_reuses_render_of_unhashed_input(self, mock_send):
+        mock_send.return_value = {'success': True, 'request_id': 'api-fresh'}
+        user = self._create_user()
+        self.client.force_login(user)
+        # Stored before uploads were hashed
+        source = Animation.objects.create(
+            status=Animation.COMPLETED, completed_at=timezone.now(), preset=self.preset_walk,
+            input_image=_create_test_image(), user=user,
+        )
+        Animation.objects.create(
+            status=Animation.COMPLETED, completed_at=timezone.now(), preset=self.preset_walk,
+            input_image=_create_test_image(), session_key='someone-else',
+            output_url='https://x/other.gif', output_file='private/ab/cd/other.gif',
+        )
+
+        resp = self.client.post(reverse('api_animate'), {'source_animation_id': source.uuid, 'preset': 'walk'})
+
+        data = resp.json()
+        self.assertNotIn('reused', data)
+        self.assertIsNone(Animation.objects.get(uuid=data['animation_id']).duplicate_of)
+        mock_send.assert_called_once()
+
+    @mock.patch('animator.views.AnimateAPI.send_to_api')
+    def test_animate_never_reuses_someone_elses_near_duplicate(self, mock_send):
+        mock_send.return_value = {'success': True, 'request_id': 'api-fresh'}
+        self._completed_render(self._drawing_upload(quality=95), session_key='someone-else')
+
+        # Within NEAR_DUPLICATE_DISTANCE, but possibly a different drawing of the same layout
+        resp = self.client.post(reverse('api_animate'), {'image': self._drawing_upload(offset=12, quality=60), 'preset': 'walk'})
+
+        data = resp.json()
+        self.assertNotIn('reused', data)
+        self.assertNotIn('similar', data)
+        anim = Animation.objects.get(uuid=data['animation_id'])
+        self.assertIsNone(anim.duplicate_of)
+        self.assertIsNone(anim.similar_to)
+        mock_send.assert_called_once()
+
+    @mock.patch('animator.models.Animation.schedule_store_output')
+    @mock.patch('animator.views.AnimateAPI.send_to_api')
+    def test_animate_suggests_own_near_duplicate(self, mock_send, mock_store):
+        mock_send.return_value = {'success': True, 'request_id': 'api-fresh'}
+        user = self._create_user()
+        self.client.force_login(user)
+        upload = self._drawing_upload(quality=95)
+        earlier = self._completed_render(upload, user=user)
+
+        # Re-photographed: shifted on the sheet and compressed harder. Rendered, with a pointer
+        resp = self.client.post(reverse('api_animate'), {'image': self._drawing_upload(offset=12, quality=60), 'preset': 'walk'})
+
+        data = resp.json()
+        self.assertEqual(data['status'], 'processing')
+        self.assertEqual(data['similar']['animation_id'], earlier.uuid)
+        self.assertTrue(data['similar']['preview_url'].endswith(earlier.preview_url))
+        self.assertEqual(Animation.objects.get(uuid=data['animation_id']).similar_to, earlier)
+        mock_send.assert_called_once()
+
+        # The same file again is reused, unless the settings differ or a fresh render is asked for
+        for extra in ({}, {'fps': 12}, {'force_render': '1'}):
+            upload.seek(0)
+            self.client.post(reverse('api_animate'), {
+                'image': SimpleUploadedFile('drawing.jpg', upload.read(), content_type='image/jpeg'),
+                'preset': 'walk', **extra,
+            })
+        self.assertEqual(mock_send.call_count, 3)
+        mock_store.assert_called_once()
+
+    @mock.patch('config.NEAR_DUPLICATE_FLAG_COUNT', 3)
+    @mock.patch('animator.views.AnimateAPI.send_to_api')
+    def test_animate_flags_repeated_uploads(self, mock_send):
+        mock_send.return_value = {'success': True, 'request_id': 'api-repeat'}
+        for offset in (0, 8, 16):
+            self.client.post(reverse('api_animate'), {'image': self._drawing_upload(offset=offset), 'preset': 'walk'})
+
+        flags = list(Animation.objects.order_by('created_at').values_list('flagged_resubmission', flat=True))
+        self.assertEqual(flags, [False, False, True])
+
+    @mock.patch('animator.views.AnimateAPI.send_to_api')
+    def test_animate_rejects_job_over_budget(self, mock_send):
+        import config
+        with mock.patch.dict(config.GPU_BUDGETS['free'], per_job=1):
+            resp = self.client.post(
+                reverse('api_animate'),
+                {'image': _create_test_image(), 'preset': 'walk'},
+            )
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn('too expensive', resp.json().get('error', ''))
+        mock_send.assert_not_called()
+        self.assertFalse(Animation.objects.exists())
+
+    @mock.patch('animator.views.AnimateAPI.send_to_api')
+    def test_animate_rejects_over_user_daily_budget(self, mock_send):
+        import config
+        with mock.patch.dict(config.GPU_BUDGETS['free'], per_user_daily=1):
+            resp = self.client.post(
+                reverse('api_animate'),
+                {'image': _create_test_image(), 'preset': 'walk'},
+            )
+        self.assertEqual(resp.status_code, 429)
+        mock_send.assert_not_called()
+
+    def test_estimate_cost_scales_with_frames_and_preset(self):
+        base = Animation.estimate_cost(self.preset_walk, 'gif', 3.0, 24)
+        self.assertGreater(Animation.estimate_cost(self.preset_walk, 'gif', 6.0, 24), base)
+        self.preset_walk.cost_factor = 2.0
+        self.assertGreater(Animation.estimate_cost(self.preset_walk, 'gif', 3.0, 24), base)
+
+
+# ---------------------------------------------------------------------------
+# Burst limiter middleware tests
+# ---------------------------------------------------------------------------
+class BurstLimitTests(APITestBase):
+
+    def _redis(self, result):
+        redis = mock.Mock()
+        redis.register_script.return_value = mock.Mock(return_value=result)
+        return redis
+
+    def test_rejected_before_view(self):
+        with mock.patch('app.middleware.get_redis_connection', return_value=self._redis([0, 1500])), \
+                mock.patch('animator.views.AnimateAPI.send_to_api') as mock_send:
+            resp = self.client.post(reverse('api_animate'), {'image': _create_test_image(), 'preset': 'walk'})
+        self.assertEqual(resp.status_code, 429)
+        self.assertEqual(resp['Retry-After'], '2')
+        self.assertEqual(resp.json()['retry_after'], 1.5)
+        mock_send.assert_not_called()
+        self.assertEqual(Animation.objects.count(), 0)
+
+    def test_pro_tier_bucket(self):
+        user = self._create_user()
+        user.is_plan_active = True
+        user.save()
+        self._login()
+        redis = self._redis([1, 0])
+        with mock.patch('app.middleware.get_redis_connection', return_value=redis):
+            self.client.post(reverse('credits-consume'))
+        script = redis.register_script.return_value
+        self.assertEqual(script.call_args.kwargs['args'], [30, 2])
+        self.assertEqual(len(script.call_args.kwargs['keys']), 2)  # IP and session
+
+    def test_bucket_ignores_forwarded_for(self):
+        redis = self._redis([1, 0])
+        with mock.patch('app.middleware.get_redis_connection', return_value=redis):
+            for forged in ('203.0.113.1', '203.0.113.2'):
+                self.client.post(reverse('credits-consume'), HTTP_X_FORWARDED_FOR=forged, HTTP_X_REAL_IP='198.51.100.7')
+        script = redis.register_script.return_value
+        ip_keys = {call.kwargs['keys'][0] for call in script.call_args_list}
+        self.assertEqual(len(ip_keys), 1)
+        self.assertIn('burst:ip:198.51.100.7', ip_keys.pop())
+
+    def test_token_bucket_script(self):
+        redis = _lua_redis()
+        if redis is None:
+            self.skipTest('Needs a Redis server (or fakeredis with lupa) to run Lua')
+        script = redis.register_script(BurstLimitMiddleware.SCRIPT)
+        key = f'test:burst:{timezone.now().timestamp()}'
+        self.addCleanup(redis.delete, key)
+
+        # A full bucket of 3 allows 3 requests, then asks for the time to make 1 token at 2/s
+        results = [script(keys=[key], args=[3, 2]) for _ in range(4)]
+        self.assertEqual(results[:3], [[1, 0]] * 3)
+        self.assertEqual(results[3][0], 0)
+        self.assertTrue(400 < results[3][1] <= 500)
+
+        # Half a second later one token has come back, and only one
+        redis.hset(key, 'ts', float(redis.hget(key, 'ts')) - 0.5)
+        self.assertEqual(script(keys=[key], args=[3, 2]), [1, 0])
+        self.assertEqual(script(keys=[key], args=[3, 2])[0], 0)
+
+        # Refills stop at capacity
+        redis.hset(key, 'ts', float(redis.hget(key, 'ts')) - 3600)
+        self.assertEqual([script(keys=[key], args=[3, 2])[0] for _ in range(4)], [1, 1, 1, 0])
+
+    def test_other_paths_not_limited(self):
+        redis = self._redis([0, 1500])
+        with mock.patch('app.middleware.get_redis_connection', return_value=redis):
+            resp = self.client.get(reverse('api_queue_status'))
+        self.assertEqual(resp.status_code, 200)
+        redis.register_script.assert_not_called()
+
+    def test_allows_without_redis(self):
+        resp = self.client.post(reverse('credits-consume'))
+        self.assertNotEqual(resp.status_code, 429)
+
+
 # ---------------------------------------------------------------------------
 # AnimationStatus API tests
 # ---------------------------------------------------------------------------
@@ -500,6 +962,440 @@ class AnimationStatusAPITests(APITestBase):
         self.assertEqual(anim.status, Animation.FAILED)
 
 
+    @mock.patch('animator.views.AnimationStatus.check_api_status')
+    def test_status_processing_returns_eta_without_writing(self, mock_check):
+        mock_check.return_value = {'done': False}
+        anim = Animation.objects.create(
+            status=Animation.PROCESSING,
+            api_request_id='api-uuid-eta',
+            started_at=timezone.now() - timedelta(seconds=5),
+            input_image=_create_test_image(),
+            preset=self.preset_walk,
+        )
+        resp = self.client.get(
+            reverse('api_animation_status', args=[anim.uuid])
+        )
+        data = resp.json()
+        self.assertIn('eta', data)
+        self.assertGreater(data['eta'], 0)
+        self.assertGreater(data['progress'], 0)
+        anim.refresh_from_db()
+        self.assertEqual(anim.progress, 0)
+
+    def test_estimate_uses_historical_processing_times(self):
+        now = timezone.now()
+        for seconds in (40, 40, 40):
+            Animation.objects.create(
+                status=Animation.COMPLETED,
+                started_at=now - timedelta(seconds=seconds),
+                completed_at=now,
+                input_image=_create_test_image(),
+                preset=self.preset_walk,
+            )
+        anim = Animation.objects.create(
+            status=Animation.PROCESSING,
+            started_at=now - timedelta(seconds=10),
+            input_image=_create_test_image(),
+            preset=self.preset_walk,
+        )
+        progress, eta = anim.estimate_progress(now=now)
+        self.assertEqual(progress, 15)
+        self.assertEqual(eta, 56.7)
+
+    @mock.patch('animator.models.Animation.get_processing_stats')
+    def test_estimate_never_goes_backwards(self, mock_stats):
+        mock_stats.return_value = {'count': 10, 'mean': 22.0, 'p50': 20.0, 'p90': 30.0}
+        started = timezone.now()
+        anim = Animation.objects.create(
+            status=Animation.PROCESSING,
+            started_at=started,
+            input_image=_create_test_image(),
+            preset=self.preset_walk,
+        )
+        estimates = [anim.estimate_progress(now=started + timedelta(seconds=tenths / 10)) for tenths in range(1, 900)]
+
+        progress = [estimate[0] for estimate in estimates]
+        self.assertEqual(progress, sorted(progress))
+        self.assertLess(progress[-1], 100)
+        # No jumps in the ETA either, between readings 0.1s apart
+        etas = [estimate[1] for estimate in estimates]
+        self.assertLess(max(abs(b - a) for a, b in zip(etas, etas[1:])), 0.5)
+
+    def test_estimate_prefers_reported_progress(self):
+        now = timezone.now()
+        anim = Animation.objects.create(
+            status=Animation.PROCESSING,
+            started_at=now - timedelta(seconds=10),
+            progress=50,
+            input_image=_create_test_image(),
+            preset=self.preset_walk,
+        )
+        progress, eta = anim.estimate_progress(now=now)
+        self.assertEqual(progress, 50)
+        self.assertEqual(eta, 10.0)
+
+
+    def test_status_etag_not_modified(self):
+        anim = Animation.objects.create(
+            status=Animation.COMPLETED,
+            output_url='https://x/done.gif',
+            progress=100,
+            input_image=_create_test_image(),
+            preset=self.preset_walk,
+        )
+        url = reverse('api_animation_status', args=[anim.uuid])
+        etag = self.client.get(url)['ETag']
+        resp = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(resp.content, b'')
+
+    @mock.patch('animator.views.AnimationStatus.check_api_status')
+    def test_status_etag_changes_with_status(self, mock_check):
+        mock_check.return_value = {'done': False}
+        anim = Animation.objects.create(
+            status=Animation.PROCESSING,
+            api_request_id='api-uuid-etag',
+            progress=40,
+            input_image=_create_test_image(),
+            preset=self.preset_walk,
+        )
+        url = reverse('api_animation_status', args=[anim.uuid])
+        etag = self.client.get(url)['ETag']
+        anim.mark_completed('https://x/done.gif')
+        resp = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()['status'], 'completed')
+
+    @mock.patch('animator.views.AnimationStatus.check_api_status')
+    def test_status_etag_stable_while_estimate_moves(self, mock_check):
+        mock_check.return_value = {'done': False}
+        now = timezone.now()
+        anim = Animation.objects.create(
+            status=Animation.PROCESSING,
+            api_request_id='api-uuid-estimate',
+            started_at=now - timedelta(seconds=5),
+            input_image=_create_test_image(),
+            preset=self.preset_walk,
+        )
+        url = reverse('api_animation_status', args=[anim.uuid])
+        with mock.patch('django.utils.timezone.now', return_value=now):
+            first = self.client.get(url)
+        self.assertEqual(first.json()['started_at'], anim.started_at.isoformat())
+
+        # Ten seconds on the estimate has moved, but nothing stored has
+        with mock.patch('django.utils.timezone.now', return_value=now + timedelta(seconds=10)):
+            resp = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(resp.status_code, 304)
+
+        # A progress report from the backend does change it
+        Animation.objects.filter(pk=anim.pk).update(progress=70)
+        resp = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()['progress'], 70)
+
+    def test_status_wiggle_preview_while_pending(self):
+        anim = Animation.objects.create(
+            status=Animation.PENDING,
+            input_image=_create_test_image(),
+            preset=self.preset_walk,
+        )
+        url = reverse('api_animation_status', args=[anim.uuid])
+        resp = self.client.get(url)
+        self.assertNotIn('wiggle_url', resp.json())
+
+        anim.store_wiggle_preview()
+        resp = self.client.get(url, HTTP_IF_NONE_MATCH=resp['ETag'])
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.json()['wiggle_url'].endswith('.webp'))
+
+        anim.mark_processing('api-wiggle')
+        anim.mark_completed('https://x/done.gif')
+        self.assertNotIn('wiggle_url', self.client.get(url).json())
+
+    @mock.patch('animator.views.AnimationStatus.check_api_status')
+    def test_status_next_poll_hint(self, mock_check):
+        mock_check.return_value = {'done': False}
+        anim = Animation.objects.create(
+            status=Animation.PROCESSING,
+            api_request_id='api-uuid-hint',
+            started_at=timezone.now(),
+            input_image=_create_test_image(),
+            preset=self.preset_walk,
+        )
+        resp = self.client.get(reverse('api_animation_status', args=[anim.uuid]))
+        data = resp.json()
+        self.assertGreaterEqual(data['next_poll_ms'], 1000)
+        self.assertLessEqual(data['next_poll_ms'], 15000)
+        self.assertEqual(resp['X-Next-Poll-Ms'], str(data['next_poll_ms']))
+
+# ---------------------------------------------------------------------------
+# AnimationStatusBatch API tests
+# ---------------------------------------------------------------------------
+class AnimationStatusBatchAPITests(APITestBase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self._create_user()
+        self._login()
+
+    def _create_animation(self, **kwargs):
+        defaults = {
+            'status': Animation.PROCESSING,
+            'input_image': _create_test_image(),
+            'preset': self.preset_walk,
+            'user': self.user,
+        }
+        defaults.update(kwargs)
+        return Animation.objects.create(**defaults)
+
+    def _post(self, ids):
+        return self.client.post(
+            reverse('api_animation_status_batch'),
+            data=json.dumps({'animation_ids': ids}),
+            content_type='application/json',
+        )
+
+    def test_batch_returns_owned_animations(self):
+        done = self._create_animation(status=Animation.COMPLETED, progress=100, output_url='https://x/done.gif')
+        running = self._create_animation(progress=30)
+        resp = self._post([done.uuid, running.uuid])
+        self.assertEqual(resp.status_code, 200)
+        data = resp.json()
+        self.assertEqual(
+            data['animations'][done.uuid]['output_url'],
+            'http://testserver' + reverse('animation_download', args=[done.uuid]),
+        )
+        self.assertEqual(data['animations'][running.uuid]['progress'], 30)
+        self.assertIsNotNone(data['next_poll_ms'])
+
+    def test_batch_hides_other_users_animations(self):
+        other = self._create_user(email='other@test.com')
+        foreign = self._create_animation(user=other)
+        data = self._post([foreign.uuid, 'nonexistent']).json()
+        self.assertEqual(data['animations'], {})
+
+    def test_batch_served_from_cache(self):
+        anim = self._create_animation()
+        self._post([anim.uuid])
+        with self.assertNumQueries(0):
+            Animation.get_status_snapshots([anim.uuid])
+
+    def test_batch_sees_transition_after_caching(self):
+        anim = self._create_animation()
+        self._post([anim.uuid])
+        anim.mark_completed('https://x/done.gif')
+        data = self._post([anim.uuid]).json()
+        self.assertEqual(data['animations'][anim.uuid]['status'], Animation.COMPLETED)
+        self.assertIsNone(data['next_poll_ms'])
+
+    def test_batch_cache_not_refilled_with_stale_status(self):
+        anim = self._create_animation()
+        load = Animation.load_status_snapshots
+
+        def load_then_complete(uuids):
+            # The reader sees the row while processing; the transition lands before its cache fill
+            rows = load(uuids)
+            mock_load.side_effect = load
+            anim.mark_completed('https://x/done.gif')
+            return rows
+
+        with mock.patch('animator.models.Animation.load_status_snapshots', side_effect=load_then_complete) as mock_load:
+            stale = Animation.get_status_snapshots([anim.uuid])
+        self.assertEqual(stale[anim.uuid]['status'], Animation.PROCESSING)
+
+        self.assertEqual(Animation.get_status_snapshots([anim.uuid])[anim.uuid]['status'], Animation.COMPLETED)
+
+    def test_batch_limit(self):
+        resp = self._post([f'id-{i}' for i in range(51)])
+        self.assertEqual(resp.status_code, 400)
+
+    @mock.patch('animator.views.AnimationStatusBatch.check_api_statuses')
+    def test_batch_polls_backend_for_processing(self, mock_check):
+        first = self._create_animation(api_request_id='req-1#0')
+        second = self._create_animation(api_request_id='req-1#1')
+        mock_check.return_value = {
+            'req-1#0': {'done': True, 'output_url': 'https://x/done.gif'},
+            'req-1#1': {'done': False},
+        }
+
+        data = self._post([first.uuid, second.uuid]).json()
+
+        mock_check.assert_called_once()
+        self.assertCountEqual(mock_check.call_args.args[0], ['req-1#0', 'req-1#1'])
+        self.assertEqual(data['animations'][first.uuid]['status'], Animation.COMPLETED)
+        self.assertEqual(data['animations'][second.uuid]['status'], Animation.PROCESSING)
+
+        # Other pages polling the same job meanwhile don't ask again
+        self._post([second.uuid])
+        mock_check.assert_called_once()
+
+    @mock.patch('config.STATUS_BATCH_BACKEND_CHECKS', 1)
+    @mock.patch('animator.views.AnimationStatusBatch.check_api_statuses')
+    def test_batch_backend_checks_are_bounded(self, mock_check):
+        mock_check.return_value = {}
+        ids = [self._create_animation(api_request_id=f'req-{i}').uuid for i in range(3)]
+
+        self._post(ids)
+        self.assertEqual(len(mock_check.call_args.args[0]), 1)
+
+        # The next poll moves on to jobs not checked yet
+        self._post(ids)
+        self.assertEqual(mock_check.call_count, 2)
+        self.assertEqual(len({call.args[0][0] for call in mock_check.call_args_list}), 2)
+
+
+# ---------------------------------------------------------------------------
+# AnimationDownload and AnimationMedia tests
+# ---------------------------------------------------------------------------
+class AnimationDeliveryTests(APITestBase):
+    """Stored outputs served per owner; files go to an isolated MEDIA_ROOT."""
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        override = override_settings(MEDIA_ROOT=media_root, PRIVATE_MEDIA_ROOT=os.path.join(media_root, 'private'))
+        override.enable()
+        self.addCleanup(override.disable)
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.user = CustomUser.objects.create(email='owner@test.com')
+        self.master = _create_test_gif()
+
+    def _completed(self, **kwargs):
+        defaults = {
+            'user': self.user,
+            'status': Animation.COMPLETED,
+            'output_url': 'https://api.example.com/out.gif',
+            'input_image': _create_test_image('in.png', size=(32, 32)),
+            'preset': self.preset_walk,
+        }
+        defaults.update(kwargs)
+        return Animation.objects.create(**defaults)
+
+    def _drawing_gif(self):
+        """A drawing-like GIF (flat paper, small moving figure), where WebP beats GIF."""
+        frames = []
+        for i in range(6):
+            frame = Image.new('RGB', (160, 120), (250, 248, 240))
+            frame.paste((30, 30, 30), (40 + i * 5, 40, 60 + i * 5, 80))
+            frames.append(frame)
+        buffer = BytesIO()
+        frames[0].save(buffer, format='GIF', save_all=True, append_images=frames[1:], duration=80, loop=0)
+        return buffer.getvalue()
+
+    @mock.patch('animator.backend.download_output')
+    def test_download_follows_owner_plan(self, mock_download):
+        mock_download.return_value = self.master
+        anim = self._completed()
+        url = reverse('animation_download', args=[anim.uuid])
+
+        resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        anim.refresh_from_db()
+        with anim.output_file.open('rb') as f:
+            master = f.read()
+        self.assertNotEqual(b''.join(resp.streaming_content), master)
+
+        # Upgrading unlocks the clean master without another render
+        self.user.is_plan_active = True
+        self.user.save()
+        resp = self.client.get(url)
+        self.assertEqual(b''.join(resp.streaming_content), master)
+        self.assertEqual(resp['Cache-Control'], 'private, no-cache')
+        mock_download.assert_called_once()
+
+    @mock.patch('config.ANIMATION_VARIANT_FORMATS', ('webp',))
+    @mock.patch('animator.backend.download_output')
+    def test_media_negotiates_format(self, mock_download):
+        mock_download.return_value = self._drawing_gif()
+        anim = self._completed()
+        tasks.store_output(anim.uuid)
+        url = reverse('animation_media', args=[anim.uuid])
+
+        resp = self.client.get(url, HTTP_ACCEPT='image/avif,image/webp,image/*,*/*;q=0.8')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp['Content-Type'], 'image/webp')
+        self.assertEqual(resp['Vary'], 'Accept')
+        webp_etag = resp['ETag']
+
+        resp = self.client.get(url, HTTP_ACCEPT='image/png,image/*;q=0.8')
+        self.assertEqual(resp['Content-Type'], 'image/gif')
+        self.assertNotEqual(resp['ETag'], webp_etag)
+
+        resp = self.client.get(url, HTTP_ACCEPT='image/webp', HTTP_IF_NONE_MATCH=webp_etag)
+        self.assertEqual(resp.status_code, 304)
+
+    @mock.patch('config.ANIMATION_VARIANT_FORMATS', ('webp',))
+    @mock.patch('animator.models.Animation.schedule_store_output')
+    @mock.patch('animator.backend.download_output')
+    def test_media_queues_missing_variants(self, mock_download, mock_schedule):
+        mock_download.return_value = self._drawing_gif()
+        anim = self._completed()
+        url = reverse('animation_media', args=[anim.uuid])
+
+        resp = self.client.get(url, HTTP_ACCEPT='image/webp,*/*')
+        self.client.get(url, HTTP_ACCEPT='image/webp,*/*')
+
+        self.assertEqual(resp['Content-Type'], 'image/gif')
+        mock_schedule.assert_called_once_with([anim.uuid])
+
+    @mock.patch('config.PREVIEW_WIDTHS', (40, 80))
+    @mock.patch('config.ANIMATION_VARIANT_FORMATS', ('webp',))
+    @mock.patch('animator.backend.download_output')
+    def test_media_serves_rendition_for_width(self, mock_download):
+        mock_download.return_value = self._drawing_gif()
+        anim = self._completed()
+        tasks.store_output(anim.uuid)
+        url = reverse('animation_media', args=[anim.uuid])
+
+        resp = self.client.get(f'{url}?w=40', HTTP_ACCEPT='image/webp,*/*')
+        self.assertEqual(resp['Content-Type'], 'image/webp')
+        self.assertEqual(Image.open(BytesIO(b''.join(resp.streaming_content))).width, 40)
+
+        # Browsers without WebP get a downscaled GIF
+        resp = self.client.get(f'{url}?w=40', HTTP_ACCEPT='image/png,*/*')
+        self.assertEqual(resp['Content-Type'], 'image/gif')
+        self.assertEqual(Image.open(BytesIO(b''.join(resp.streaming_content))).width, 40)
+
+        # Widths outside PREVIEW_WIDTHS get the full-size file
+        resp = self.client.get(f'{url}?w=50', HTTP_ACCEPT='image/png,*/*')
+        self.assertEqual(Image.open(BytesIO(b''.join(resp.streaming_content))).width, 160)
+
+        self.assertEqual(anim.preview_srcset, f'{url}?w=40 40w, {url}?w=80 80w')
+
+
+# ---------------------------------------------------------------------------
+# QueueStatus API tests
+# ---------------------------------------------------------------------------
+class QueueStatusAPITests(APITestBase):
+
+    @mock.patch('animator.views.AnimateAPI.send_to_api')
+    def test_queue_position_after_submit(self, mock_send):
+        mock_send.return_value = {'success': True, 'request_id': 'q-1', 'job_id': 'q-1'}
+        first = self.client.post(reverse('api_animate'), {'image': _create_test_image(), 'preset': 'walk'}).json()
+        second = self.client.post(reverse('api_animate'), {'image': _create_test_image(), 'preset': 'walk'}).json()
+        self.assertEqual(first['queue']['position'], 0)
+        self.assertEqual(second['queue']['position'], 1)
+
+        resp = self.client.get(reverse('api_queue_status'), {'animation_id': second['animation_id']})
+        data = resp.json()
+        self.assertEqual(data['tier'], 'free')
+        self.assertEqual(data['depth'], 2)
+        self.assertEqual(data['position'], 1)
+        self.assertIsNone(data['expected_wait'])
+
+    def test_queue_expected_wait_from_throughput(self):
+        from animator.dispatch import DispatchQueue
+        for uuid in ('a', 'b', 'c'):
+            DispatchQueue.enter(uuid, DispatchQueue.TIER_FREE)
+        DispatchQueue.leave('a')
+        DispatchQueue.leave('a')  # Releasing twice must not double count
+
+        self.assertEqual(DispatchQueue.depth(DispatchQueue.TIER_FREE), 2)
+        self.assertEqual(DispatchQueue.position('c'), 1)
+        # One completion in a 10 minute window -> 600s per job
+        self.assertEqual(DispatchQueue.expected_wait(DispatchQueue.TIER_FREE, 1), 1200.0)
+
+
 # ---------------------------------------------------------------------------
 # animation_callback endpoint tests
 # ---------------------------------------------------------------------------
@@ -581,3 +1477,265 @@ class AnimationCallbackTests(APITestBase):
             content_type='application/json',
         )
         self.assertEqual(resp.status_code, 400)
+
+    def test_callback_progress_ignored_after_completion(self):
+        anim = self._create_animation(status=Animation.COMPLETED, progress=100, output_url='https://x/done.gif')
+        self.client.post(
+            reverse('api_animation_callback'),
+            data=json.dumps({'animation_id': anim.uuid, 'status': 'processing', 'progress': 40}),
+            content_type='application/json',
+        )
+        anim.refresh_from_db()
+        self.assertEqual(anim.status, Animation.COMPLETED)
+        self.assertEqual(anim.progress, 100)
+
+
+# ---------------------------------------------------------------------------
+# animation_callback_batch endpoint tests
+# ---------------------------------------------------------------------------
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+@mock.patch('config.CALLBACK_SECRET', 'test-secret')
+class AnimationCallbackBatchTests(APITestBase):
+
+    def _create_animation(self, **kwargs):
+        defaults = {
+            'status': Animation.PROCESSING,
+            'input_image': _create_test_image(),
+            'preset': self.preset_walk,
+        }
+        defaults.update(kwargs)
+        return Animation.objects.create(**defaults)
+
+    def _post(self, updates, secret='test-secret'):
+        body = json.dumps({'updates': updates}).encode()
+        signature = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+        return self.client.post(
+            reverse('api_animation_callback_batch'),
+            data=body,
+            content_type='application/json',
+            HTTP_X_SIGNATURE=signature,
+        )
+
+    def test_batch_applies_mixed_updates(self):
+        done = self._create_animation()
+        failed = self._create_animation()
+        running = self._create_animation()
+        resp = self._post([
+            {'animation_id': done.uuid, 'status': 'completed', 'seq': 1, 'output_url': 'https://x/done.gif'},
+            {'animation_id': failed.uuid, 'status': 'failed', 'seq': 1, 'error': 'Out of memory'},
+            {'animation_id': running.uuid, 'status': 'processing', 'seq': 1, 'progress': 40},
+        ])
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()['applied'], 3)
+
+        done.refresh_from_db()
+        failed.refresh_from_db()
+        running.refresh_from_db()
+        self.assertEqual(done.status, Animation.COMPLETED)
+        self.assertEqual(done.output_url, 'https://x/done.gif')
+        self.assertEqual(failed.status, Animation.FAILED)
+        self.assertEqual(failed.failure_reason, Animation.REASON_BACKEND_ERROR)
+        self.assertEqual(running.progress, 40)
+        self.assertEqual(done.events.filter(to_status=Animation.COMPLETED).count(), 1)
+
+    def test_replayed_batch_is_ignored(self):
+        anim = self._create_animation()
+        updates = [{'animation_id': anim.uuid, 'status': 'processing', 'seq': 5, 'progress': 50}]
+        self._post(updates)
+        resp = self._post(updates)
+        self.assertEqual(resp.json()['applied'], 0)
+        self.assertEqual(resp.json()['ignored'], 1)
+
+    def test_out_of_order_update_is_ignored(self):
+        anim = self._create_animation()
+        self._post([{'animation_id': anim.uuid, 'status': 'processing', 'seq': 7, 'progress': 80}])
+        self._post([{'animation_id': anim.uuid, 'status': 'processing', 'seq': 6, 'progress': 60}])
+        anim.refresh_from_db()
+        self.assertEqual(anim.progress, 80)
+        self.assertEqual(anim.callback_seq, 7)
+
+    def test_bad_signature_rejected(self):
+        anim = self._create_animation()
+        resp = self._post([{'animation_id': anim.uuid, 'status': 'completed', 'seq': 1}], secret='wrong')
+        self.assertEqual(resp.status_code, 403)
+        anim.refresh_from_db()
+        self.assertEqual(anim.status, Animation.PROCESSING)
+
+    def test_invalid_update_rejected(self):
+        resp = self._post([{'animation_id': 'abc', 'status': 'completed', 'seq': 'one'}])
+        self.assertEqual(resp.status_code, 400)
+
+    def test_legacy_callback_requires_signature_when_secret_set(self):
+        anim = self._create_animation()
+        resp = self.client.post(
+            reverse('api_animation_callback'),
+            data=json.dumps({'animation_id': anim.uuid, 'status': 'completed', 'output_url': 'https://x/a.gif'}),
+            content_type='application/json',
+        )
+        self.assertEqual(resp.status_code, 403)
+
+
+# ---------------------------------------------------------------------------
+# Async views (ASGI worker mode)
+# ---------------------------------------------------------------------------
+class AsyncViewTests(APITestBase):
+
+    def _request(self, method, path, **kwargs):
+        """An ASGI request with the session and user the middleware would attach."""
+        request = getattr(AsyncRequestFactory(), method)(path, **kwargs)
+        SessionMiddleware(lambda r: None).process_request(request)
+        AuthenticationMiddleware(lambda r: None).process_request(request)
+        request._dont_enforce_csrf_checks = True
+        return request
+
+    @mock.patch('animator.views.AsyncAnimateAPI.async_send_to_api', new_callable=mock.AsyncMock)
+    def test_async_animate_success(self, mock_send):
+        mock_send.return_value = {'success': True, 'request_id': 'fake-uuid-123', 'job_id': 'fake-job-123'}
+        request = self._request('post', reverse('api_animate'), data={'image': _create_test_image(), 'preset': 'walk'})
+
+        resp = async_to_sync(AsyncAnimateAPI.as_view())(request)
+
+        self.assertEqual(resp.status_code, 200)
+        anim = Animation.objects.get(uuid=json.loads(resp.content)['animation_id'])
+        self.assertEqual(anim.status, Animation.PROCESSING)
+        self.assertEqual(anim.api_request_id, 'fake-uuid-123')
+        mock_send.assert_awaited_once()
+
+    @mock.patch('animator.views.AsyncAnimateAPI.async_send_to_api', new_callable=mock.AsyncMock)
+    def test_async_animate_idempotency_key_scoped_to_session(self, mock_send):
+        mock_send.return_value = {'success': True, 'request_id': 'fake-uuid-456', 'job_id': 'fake-job-456'}
+        request = self._request('post', reverse('api_animate'), data={'image': _create_test_image(), 'preset': 'walk'},
+                                headers={'Idempotency-Key': 'async-key'})
+
+        resp = async_to_sync(AsyncAnimateAPI.as_view())(request)
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(request.session.session_key)
+        key = f'idempotency:animate:session:{request.session.session_key}:' + hashlib.sha256(b'async-key').hexdigest()
+        self.assertEqual(cache.get(key)[1], resp.content)
+
+    @mock.patch('animator.views.AsyncAnimateAPI.async_send_to_api', new_callable=mock.AsyncMock)
+    def test_async_animate_rejects_bad_upload(self, mock_send):
+        image = SimpleUploadedFile('fake.png', b'not an image', content_type='image/png')
+        request = self._request('post', reverse('api_animate'), data={'image': image})
+
+        resp = async_to_sync(AsyncAnimateAPI.as_view())(request)
+
+        self.assertEqual(resp.status_code, 400)
+        mock_send.assert_not_called()
+
+    @mock.patch('animator.views.AsyncAnimationStatus.async_check_api_status', new_callable=mock.AsyncMock)
+    def test_async_status_polls_backend(self, mock_check):
+        mock_check.return_value = {'done': True, 'output_url': 'https://api.drawinganimator.com/output/a.gif'}
+        anim = Animation.objects.create(
+            status=Animation.PROCESSING, api_request_id='req-1',
+            input_image=_create_test_image(), preset=self.preset_walk,
+        )
+        request = self._request('get', reverse('api_animation_status', args=[anim.uuid]))
+
+        resp = async_to_sync(AsyncAnimationStatus.as_view())(request, animation_id=str(anim.uuid))
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(json.loads(resp.content)['status'], Animation.COMPLETED)
+        mock_check.assert_awaited_once_with('req-1')
+
+    def test_async_callback_completed(self):
+        anim = Animation.objects.create(
+            status=Animation.PROCESSING, input_image=_create_test_image(), preset=self.preset_walk,
+        )
+        request = self._request(
+            'post', reverse('api_animation_callback'),
+            data=json.dumps({'animation_id': str(anim.uuid), 'status': 'completed', 'output_url': 'https://x/a.gif'}),
+            content_type='application/json',
+        )
+
+        resp = async_to_sync(async_animation_callback)(request)
+
+        self.assertEqual(resp.status_code, 200)
+        anim.refresh_from_db()
+        self.assertEqual(anim.status, Animation.COMPLETED)
+
+    def test_async_check_api_status_reads_batch_entry(self):
+        def handler(request):
+            self.assertEqual(request.url.path, '/v1/animate/results/')
+            return httpx.Response(200, json={'files': [{'outputfile': 'https://x/0.gif'}, {'failed': True, 'error': 'Bad'}]})
+
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        with mock.patch('animator.backend.async_client', return_value=client):
+            result = async_to_sync(backend.async_check_api_status)('req-1#1')
+
+        self.assertEqual(result, {'failed': True, 'error': 'Bad'})
+
+
+# ---------------------------------------------------------------------------
+# Near-duplicate index
+# ---------------------------------------------------------------------------
+class NearDuplicateIndexTests(APITestBase):
+
+    def test_find_similar_inputs_matches_brute_force(self):
+        rng = np.random.default_rng(3)
+        hashes = [int(value) for value in rng.integers(0, 2 ** 63, 300, dtype=np.int64)]
+        query = hashes[0]
+        # Near copies with their flipped bits spread over different segments
+        for bits in [(0,), (1, 17), (2, 18, 34), (3, 19, 35, 51), (4, 20, 36, 52, 60, 61, 62)]:
+            value = query
+            for bit in bits:
+                value ^= 1 << bit
+            hashes.append(value)
+        rows = Animation.objects.bulk_create([
+            Animation(session_key='index', **Animation.dhash_fields(value)) for value in hashes
+        ])
+
+        for max_distance in (3, 7):
+            expected = sorted(
+                (row.pk, (value ^ query).bit_count()) for row, value in zip(rows, hashes)
+                if (value ^ query).bit_count() <= max_distance
+            )
+            found = Animation.find_similar_inputs(query, Animation.objects.all(), max_distance)
+            self.assertEqual(sorted(found), expected)
+            self.assertEqual([distance for _, distance in found], sorted(distance for _, distance in found))
+        self.assertEqual(len(Animation.find_similar_inputs(query, Animation.objects.all(), 7)), 6)
+
+
+# ---------------------------------------------------------------------------
+# Animation state machine
+# ---------------------------------------------------------------------------
+class AnimationTransitionTests(APITestBase):
+
+    def _create_animation(self, **kwargs):
+        defaults = {
+            'status': Animation.PROCESSING,
+            'input_image': _create_test_image(),
+            'preset': self.preset_walk,
+        }
+        defaults.update(kwargs)
+        return Animation.objects.create(**defaults)
+
+    def test_stale_instance_cannot_overwrite_completed(self):
+        anim = self._create_animation()
+        stale = Animation.objects.get(pk=anim.pk)
+        self.assertTrue(anim.mark_completed('https://x/done.gif'))
+
+        self.assertFalse(stale.mark_failed('late failure'))
+        self.assertEqual(stale.status, Animation.COMPLETED)
+        anim.refresh_from_db()
+        self.assertEqual(anim.status, Animation.COMPLETED)
+        self.assertEqual(anim.error_message, '')
+
+    def test_transitions_are_logged(self):
+        anim = self._create_animation(status=Animation.PENDING)
+        anim.mark_processing('api-1')
+        anim.mark_completed('https://x/done.gif', gpu_seconds=12.5)
+
+        events = list(anim.events.values_list('from_status', 'to_status'))
+        self.assertEqual(events, [
+            (Animation.PENDING, Animation.PROCESSING),
+            (Animation.PROCESSING, Animation.COMPLETED),
+        ])
+        anim.refresh_from_db()
+        self.assertEqual(anim.actual_cost, 12.5)
+
+    def test_completed_cannot_go_back_to_processing(self):
+        anim = self._create_animation(status=Animation.COMPLETED)
+        self.assertFalse(anim.mark_processing('api-2'))
+        self.assertFalse(anim.events.exists())
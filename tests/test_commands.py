@@ -0,0 +1,595 @@
+"""
+Tests for animator management commands: render_preset_demos,
+reap_stuck_animations, requeue_failed_animations, cleanup_animations and
+migrate_to_cas_storage, plus the background jobs they drive (dispatch,
+output storage and watermarking).
+"""
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+
+from accounts.models import CustomUser
+from animator import imaging, tasks
+from animator.models import Animation, AnimationPreset, Blob, PresetDemo
+from tests.test_imaging import _make_sheet
+
+
+def _make_gif(frames=4, size=(64, 48)):
+    """Create a small animated GIF."""
+    images = [Image.new('RGB', size, (i * 40, 100, 200)) for i in range(frames)]
+    buffer = BytesIO()
+    images[0].save(buffer, format='GIF', save_all=True, append_images=images[1:], duration=80, loop=0)
+    return buffer.getvalue()
+
+
+def _make_png(size=(32, 32)):
+    buffer = BytesIO()
+    Image.new('RGB', size, (255, 255, 255)).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+)
+class CommandTestBase(TestCase):
+    """Base for command tests: isolated MEDIA_ROOT and an empty cache."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.preset_walk = AnimationPreset.objects.create(
+            name='Walking', code_name='walk', is_active=True, is_premium=False,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        override = override_settings(
+            MEDIA_ROOT=self.media_root, PRIVATE_MEDIA_ROOT=os.path.join(self.media_root, 'private'),
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+
+    def call(self, *args, **kwargs):
+        out = StringIO()
+        call_command(*args, stdout=out, **kwargs)
+        return out.getvalue()
+
+
+# ---------------------------------------------------------------------------
+# render_preset_demos
+# ---------------------------------------------------------------------------
+class RenderPresetDemosTests(CommandTestBase):
+
+    def setUp(self):
+        super().setUp()
+        self.samples = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.samples, ignore_errors=True)
+        with open(os.path.join(self.samples, 'robot.png'), 'wb') as f:
+            f.write(_make_png())
+
+    @mock.patch('animator.backend.download_output')
+    @mock.patch('animator.backend.check_api_status')
+    @mock.patch('animator.backend.send_to_api')
+    def test_renders_preview_and_thumbnail(self, mock_send, mock_check, mock_download):
+        mock_send.return_value = {'success': True, 'request_id': 'demo-1'}
+        mock_check.return_value = {'done': True, 'output_url': 'https://api.example.com/out.gif'}
+        mock_download.return_value = _make_gif()
+
+        out = self.call('render_preset_demos', samples=self.samples, interval=0)
+
+        self.assertIn('1 rendered', out)
+        demo = PresetDemo.objects.get(preset=self.preset_walk, sample_name='robot')
+        preview = Image.open(demo.preview.path)
+        self.assertEqual(preview.format, 'WEBP')
+        self.assertEqual(preview.n_frames, 4)
+        self.assertTrue(demo.placeholder.startswith('data:image/webp;base64,'))
+        self.assertIn('walk', PresetDemo.get_cached_demos())
+        self.assertEqual(PresetDemo.get_cached_demos()['walk']['placeholder'], demo.placeholder)
+
+        # A second run skips presets that already have a demo
+        out = self.call('render_preset_demos', samples=self.samples, interval=0)
+        self.assertIn('1 skipped', out)
+        self.assertEqual(mock_send.call_count, 1)
+
+    @mock.patch('animator.backend.check_api_status')
+    @mock.patch('animator.backend.send_to_api')
+    def test_backend_failure_is_reported(self, mock_send, mock_check):
+        mock_send.return_value = {'success': True, 'request_id': 'demo-2'}
+        mock_check.return_value = {'failed': True, 'error': 'GPU fell over'}
+
+        out = self.call('render_preset_demos', samples=self.samples, interval=0)
+
+        self.assertIn('1 failed', out)
+        self.assertFalse(PresetDemo.objects.exists())
+        self.assertEqual(Animation.objects.get().status, Animation.FAILED)
+
+    def test_samples_directory_is_required(self):
+        with self.assertRaisesMessage(CommandError, '--samples'):
+            self.call('render_preset_demos')
+
+
+# ---------------------------------------------------------------------------
+# reap_stuck_animations
+# ---------------------------------------------------------------------------
+class ReapStuckAnimationsTests(CommandTestBase):
+
+    def _create_animation(self, age, **kwargs):
+        started = timezone.now() - timedelta(seconds=age)
+        defaults = {
+            'status': Animation.PROCESSING,
+            'api_request_id': 'api-stuck',
+            'created_at': started,
+            'started_at': started,
+            'input_image': SimpleUploadedFile('in.png', _make_png(), content_type='image/png'),
+            'preset': self.preset_walk,
+        }
+        defaults.update(kwargs)
+        return Animation.objects.create(**defaults)
+
+    @mock.patch('animator.backend.check_api_status')
+    def test_recent_animations_are_left_alone(self, mock_check):
+        anim = self._create_animation(age=60)
+        self.call('reap_stuck_animations')
+        mock_check.assert_not_called()
+        anim.refresh_from_db()
+        self.assertEqual(anim.status, Animation.PROCESSING)
+
+    @mock.patch('animator.backend.check_api_status')
+    def test_stuck_animation_times_out(self, mock_check):
+        mock_check.return_value = {'done': False}
+        anim = self._create_animation(age=3600)
+        out = self.call('reap_stuck_animations')
+        anim.refresh_from_db()
+        self.assertEqual(anim.status, Animation.FAILED)
+        self.assertEqual(anim.failure_reason, Animation.REASON_TIMEOUT)
+        self.assertIn('timeout=1', out)
+        self.assertEqual(cache.get('reaper:last_run')['timeout'], 1)
+
+    @mock.patch('animator.backend.check_api_status')
+    def test_stuck_animation_completed_by_backend(self, mock_check):
+        mock_check.return_value = {'done': True, 'output_url': 'https://api.example.com/late.gif'}
+        anim = self._create_animation(age=3600)
+        self.call('reap_stuck_animations')
+        anim.refresh_from_db()
+        self.assertEqual(anim.status, Animation.COMPLETED)
+        self.assertEqual(anim.output_url, 'https://api.example.com/late.gif')
+
+    @mock.patch('animator.backend.check_api_status')
+    def test_pending_without_backend_id_never_dispatched(self, mock_check):
+        anim = self._create_animation(age=3600, status=Animation.PENDING, api_request_id='', started_at=None)
+        self.call('reap_stuck_animations')
+        mock_check.assert_not_called()
+        anim.refresh_from_db()
+        self.assertEqual(anim.failure_reason, Animation.REASON_NEVER_DISPATCHED)
+
+    @mock.patch('animator.backend.check_api_status')
+    def test_dry_run_changes_nothing(self, mock_check):
+        mock_check.return_value = {'done': False}
+        anim = self._create_animation(age=3600)
+        out = self.call('reap_stuck_animations', dry_run=True)
+        self.assertIn('DRY RUN', out)
+        anim.refresh_from_db()
+        self.assertEqual(anim.status, Animation.PROCESSING)
+
+
+# ---------------------------------------------------------------------------
+# requeue_failed_animations
+# ---------------------------------------------------------------------------
+class RequeueFailedAnimationsTests(CommandTestBase):
+
+    def _create_failed(self, error, hours_ago=1):
+        return Animation.objects.create(
+            status=Animation.FAILED,
+            error_message=error,
+            api_request_id='old-api-id',
+            created_at=timezone.now() - timedelta(hours=hours_ago),
+            input_image=SimpleUploadedFile('in.png', _make_png(), content_type='image/png'),
+            preset=self.preset_walk,
+        )
+
+    def test_classify_error(self):
+        self.assertEqual(Animation.classify_error('HTTPSConnectionPool: Max retries exceeded'), 'connection')
+        self.assertEqual(Animation.classify_error('Read timed out. (read timeout=30)'), 'timeout')
+        self.assertEqual(Animation.classify_error('GPU overloaded'), 'overloaded')
+        self.assertIsNone(Animation.classify_error('No character found in drawing'))
+
+    @mock.patch('django_rq.get_queue')
+    def test_requeues_only_retryable_failures_in_window(self, mock_get_queue):
+        queue = mock_get_queue.return_value
+        retry_a = self._create_failed('Connection refused')
+        retry_b = self._create_failed('Connection reset by peer')
+        permanent = self._create_failed('No character found in drawing')
+        too_old = self._create_failed('Connection refused', hours_ago=48)
+
+        out = self.call('requeue_failed_animations', hours=24, batch_size=1, interval=10)
+
+        self.assertIn('Requeued 2', out)
+        mock_get_queue.assert_called_with('low')
+        # First batch goes out immediately, the second is spaced by the interval
+        self.assertEqual(queue.enqueue.call_count, 1)
+        self.assertEqual(queue.enqueue_in.call_count, 1)
+        self.assertEqual(queue.enqueue_in.call_args[0][0], timedelta(seconds=10))
+        for anim in (retry_a, retry_b):
+            anim.refresh_from_db()
+            self.assertEqual(anim.status, Animation.PENDING)
+            self.assertEqual(anim.api_request_id, '')
+        for anim in (permanent, too_old):
+            anim.refresh_from_db()
+            self.assertEqual(anim.status, Animation.FAILED)
+
+    @mock.patch('animator.backend.check_api_status')
+    @mock.patch('django_rq.get_queue')
+    def test_reaper_leaves_requeued_animations_alone(self, mock_get_queue, mock_check):
+        anims = [self._create_failed('Connection refused', hours_ago=3) for _ in range(3)]
+
+        self.call('requeue_failed_animations', hours=24, batch_size=1, interval=600)
+        out = self.call('reap_stuck_animations')
+
+        self.assertIn('never_dispatched=0', out)
+        for anim in anims:
+            anim.refresh_from_db()
+            self.assertEqual(anim.status, Animation.PENDING)
+
+        # Still undispatched well past its timeout: reaped after all
+        with mock.patch('django.utils.timezone.now', return_value=timezone.now() + timedelta(hours=2)):
+            out = self.call('reap_stuck_animations')
+        self.assertIn('never_dispatched=3', out)
+
+    @mock.patch('django_rq.get_queue')
+    def test_error_class_filter(self, mock_get_queue):
+        self._create_failed('Connection refused')
+        self._create_failed('GPU overloaded')
+        out = self.call('requeue_failed_animations', error_class=['overloaded'])
+        self.assertIn('Requeued 1', out)
+
+    @mock.patch('animator.backend.send_to_api')
+    def test_dispatch_task_reuses_stored_input(self, mock_send):
+        from animator.tasks import dispatch_animation
+        mock_send.return_value = {'success': True, 'request_id': 'new-api-id', 'job_id': 'new-api-id'}
+        anim = self._create_failed('Connection refused')
+        Animation.objects.filter(id=anim.id).update(status=Animation.PENDING)
+
+        dispatch_animation(anim.uuid)
+
+        anim.refresh_from_db()
+        self.assertEqual(anim.status, Animation.PROCESSING)
+        self.assertEqual(anim.api_request_id, 'new-api-id')
+        self.assertEqual(mock_send.call_args[0][0].input_image.name, anim.input_image.name)
+
+
+# ---------------------------------------------------------------------------
+# Content-addressed storage: cleanup_animations, migrate_to_cas_storage
+# ---------------------------------------------------------------------------
+class ContentAddressedStorageTests(CommandTestBase):
+
+    def _create_animation(self, content, **kwargs):
+        defaults = {
+            'status': Animation.COMPLETED,
+            'input_image': SimpleUploadedFile('drawing.png', content, content_type='image/png'),
+            'preset': self.preset_walk,
+        }
+        defaults.update(kwargs)
+        return Animation.objects.create(**defaults)
+
+    def test_identical_uploads_share_one_sharded_file(self):
+        first = self._create_animation(_make_png())
+        second = self._create_animation(_make_png())
+        self.assertEqual(first.input_image.name, second.input_image.name)
+        self.assertRegex(first.input_image.name, r'^cas/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.png$')
+        self.assertEqual(Blob.objects.get(name=first.input_image.name).ref_count, 2)
+
+    def test_cleanup_keeps_shared_file_until_last_reference(self):
+        old = self._create_animation(_make_png(), created_at=timezone.now() - timedelta(days=30))
+        recent = self._create_animation(_make_png())
+        name = old.input_image.name
+
+        self.call('cleanup_animations', '--days', '14')
+        self.assertTrue(os.path.exists(os.path.join(self.media_root, name)))
+        self.assertEqual(Blob.objects.get(name=name).ref_count, 1)
+
+        Animation.objects.filter(pk=recent.pk).update(created_at=timezone.now() - timedelta(days=30))
+        self.call('cleanup_animations', '--days', '14')
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, name)))
+        self.assertFalse(Blob.objects.filter(name=name).exists())
+
+    def test_migrate_moves_legacy_files(self):
+        legacy_dir = os.path.join(self.media_root, 'animations', 'inputs', '2024', '01')
+        os.makedirs(legacy_dir)
+        for name in ('a.png', 'b.png'):
+            with open(os.path.join(legacy_dir, name), 'wb') as f:
+                f.write(_make_png())
+        first = self._create_animation(_make_png(size=(8, 8)))
+        second = self._create_animation(_make_png(size=(8, 8)))
+        Animation.objects.filter(pk=first.pk).update(input_image='animations/inputs/2024/01/a.png')
+        Animation.objects.filter(pk=second.pk).update(input_image='animations/inputs/2024/01/b.png')
+
+        out = self.call('migrate_to_cas_storage')
+        self.assertIn('moved=1', out)
+        self.assertIn('deduplicated=1', out)
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.input_image.name, second.input_image.name)
+        self.assertTrue(first.input_image.name.startswith('cas/'))
+        self.assertEqual(Blob.objects.get(name=first.input_image.name).ref_count, 2)
+        self.assertEqual(os.listdir(legacy_dir), [])
+
+
+# ---------------------------------------------------------------------------
+# Micro-batched dispatch
+# ---------------------------------------------------------------------------
+@mock.patch('animator.tasks.time.sleep')
+class DispatchBatchTests(CommandTestBase):
+
+    def _create_pending(self, **kwargs):
+        defaults = {
+            'status': Animation.PENDING,
+            'input_image': SimpleUploadedFile('drawing.png', _make_png(), content_type='image/png'),
+            'preset': self.preset_walk,
+        }
+        defaults.update(kwargs)
+        return Animation.objects.create(**defaults)
+
+    @mock.patch('animator.backend.send_batch')
+    def test_matching_jobs_share_one_request(self, mock_send, mock_sleep):
+        from animator.tasks import batch_group, dispatch_batch
+        mock_send.return_value = {'success': True, 'request_id': 'batch-uuid'}
+        batched = [self._create_pending() for _ in range(3)]
+        other = self._create_pending(fps=12)
+
+        sent = dispatch_batch(batch_group(batched[0]))
+
+        self.assertEqual(sent, 3)
+        mock_send.assert_called_once()
+        self.assertEqual([a.uuid for a in mock_send.call_args[0][0]], [a.uuid for a in batched])
+        for index, anim in enumerate(batched):
+            anim.refresh_from_db()
+            self.assertEqual(anim.status, Animation.PROCESSING)
+            self.assertEqual(anim.api_request_id, f'batch-uuid#{index}')
+        other.refresh_from_db()
+        self.assertEqual(other.status, Animation.PENDING)
+
+    @mock.patch('animator.backend.send_batch')
+    def test_batches_are_capped(self, mock_send, mock_sleep):
+        from animator.tasks import batch_group, dispatch_batch
+        mock_send.return_value = {'success': True, 'request_id': 'batch-uuid'}
+        anims = [self._create_pending() for _ in range(3)]
+
+        with mock.patch('config.DISPATCH_BATCH_SIZE', 2):
+            dispatch_batch(batch_group(anims[0]))
+
+        self.assertEqual([len(call[0][0]) for call in mock_send.call_args_list], [2, 1])
+
+    @mock.patch('animator.backend.send_batch')
+    def test_failed_batch_fails_each_job(self, mock_send, mock_sleep):
+        from animator.tasks import batch_group, dispatch_batch
+        mock_send.return_value = {'success': False, 'error': 'Backend overloaded'}
+        anim = self._create_pending()
+
+        dispatch_batch(batch_group(anim))
+
+        anim.refresh_from_db()
+        self.assertEqual(anim.status, Animation.FAILED)
+        self.assertIn('overloaded', anim.error_message)
+
+    @mock.patch('animator.backend.requests.post')
+    def test_status_reads_own_file_of_batch(self, mock_post, mock_sleep):
+        from animator import backend
+        mock_post.return_value.json.return_value = {'files': [
+            {'outputfile': 'https://x/0.gif'},
+            {'failed': True, 'error': 'Bad drawing'},
+        ]}
+        self.assertEqual(backend.check_api_status('batch-uuid#0')['output_url'], 'https://x/0.gif')
+        self.assertTrue(backend.check_api_status('batch-uuid#1')['failed'])
+        self.assertEqual(mock_post.call_args.kwargs['data'], {'uuid': 'batch-uuid'})
+
+        # One request for the whole batch
+        mock_post.reset_mock()
+        results = backend.check_api_statuses(['batch-uuid#0', 'batch-uuid#1'])
+        mock_post.assert_called_once()
+        self.assertTrue(results['batch-uuid#0']['done'])
+        self.assertTrue(results['batch-uuid#1']['failed'])
+
+
+# ---------------------------------------------------------------------------
+# Private masters and deliver-time watermarking
+# ---------------------------------------------------------------------------
+class StoreOutputTests(CommandTestBase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = CustomUser.objects.create(email='owner@test.com')
+        self.master = _make_gif()
+
+    def _completed(self, **kwargs):
+        defaults = {
+            'user': self.user,
+            'status': Animation.COMPLETED,
+            'output_url': 'https://api.example.com/out.gif',
+            'input_image': SimpleUploadedFile('in.png', _make_png(), content_type='image/png'),
+            'preset': self.preset_walk,
+        }
+        defaults.update(kwargs)
+        return Animation.objects.create(**defaults)
+
+    @mock.patch('animator.backend.download_output')
+    def test_store_output_keeps_master_private_and_watermarks(self, mock_download):
+        mock_download.return_value = self.master
+        anim = self._completed()
+
+        tasks.store_output(anim.uuid)
+
+        anim.refresh_from_db()
+        self.assertTrue(anim.output_file.name.startswith('private/'))
+        self.assertTrue(os.path.exists(os.path.join(self.media_root, 'private', anim.output_file.name)))
+        with anim.output_file.open('rb') as f:
+            master = f.read()
+        with anim.watermarked_file.open('rb') as f:
+            watermarked = f.read()
+        self.assertNotEqual(watermarked, master)
+        frames, _ = imaging.load_frames(watermarked)
+        self.assertEqual(len(frames), 4)
+
+    @mock.patch('animator.backend.download_output')
+    def test_store_output_skips_watermark_for_pro_owner(self, mock_download):
+        mock_download.return_value = self.master
+        self.user.is_plan_active = True
+        self.user.save()
+        anim = self._completed()
+
+        tasks.store_output(anim.uuid)
+
+        anim.refresh_from_db()
+        self.assertTrue(anim.output_file)
+        self.assertFalse(anim.watermarked_file)
+
+    @mock.patch('animator.backend.download_output')
+    def test_store_output_sets_placeholder(self, mock_download):
+        mock_download.return_value = self.master
+        anim = self._completed()
+
+        tasks.store_output(anim.uuid)
+
+        anim.refresh_from_db()
+        self.assertTrue(anim.placeholder.startswith('data:image/webp;base64,'))
+        self.assertLess(len(anim.placeholder), 400)
+
+    def test_make_wiggle_preview_while_pending(self):
+        drawing = Image.new('RGB', (64, 64), (255, 255, 255))
+        drawing.paste((0, 0, 0), (28, 8, 36, 64))
+        buffer = BytesIO()
+        drawing.save(buffer, format='PNG')
+        anim = self._completed(
+            status=Animation.PENDING, output_url='',
+            input_image=SimpleUploadedFile('in.png', buffer.getvalue(), content_type='image/png'),
+        )
+
+        tasks.make_wiggle_preview(anim.uuid)
+
+        anim.refresh_from_db()
+        with anim.wiggle_preview.open('rb') as f:
+            preview = Image.open(f)
+            self.assertEqual(preview.format, 'WEBP')
+            self.assertEqual(preview.n_frames, len(imaging.WIGGLE_KEYFRAMES))
+
+        # Too late once the real render is in
+        done = self._completed()
+        tasks.make_wiggle_preview(done.uuid)
+        done.refresh_from_db()
+        self.assertFalse(done.wiggle_preview)
+
+    @mock.patch('animator.backend.download_output')
+    def test_store_master_optimizes_gif(self, mock_download):
+        # Flat paper with a moving figure, one frame repeated, written without optimization
+        frames = []
+        for i in range(8):
+            frame = Image.new('RGB', (160, 120), (250, 248, 240))
+            frame.paste((30, 30, 30), (40 + i * 5, 40, 60 + i * 5, 80))
+            frames.append(frame)
+        frames.insert(3, frames[2].copy())
+        buffer = BytesIO()
+        frames[0].save(buffer, format='GIF', save_all=True, append_images=frames[1:], duration=80, loop=0, optimize=False)
+        mock_download.return_value = buffer.getvalue()
+        anim = self._completed()
+
+        anim.store_master()
+
+        anim.refresh_from_db()
+        self.assertEqual(anim.output_original_size, len(buffer.getvalue()))
+        self.assertLess(anim.output_size, anim.output_original_size)
+        with anim.output_file.open('rb') as f:
+            optimized, durations = imaging.load_frames(f.read())
+        self.assertEqual(len(optimized), 8)
+        self.assertEqual(sum(durations), 9 * 80)
+
+    # ------------------------------------------------------------------
+    # Inline delivery variants
+    # ------------------------------------------------------------------
+
+    def _drawing_gif(self):
+        """A drawing-like GIF (flat paper, small moving figure), where WebP beats GIF."""
+        frames = []
+        for i in range(6):
+            frame = Image.new('RGB', (160, 120), (250, 248, 240))
+            frame.paste((30, 30, 30), (40 + i * 5, 40, 60 + i * 5, 80))
+            frames.append(frame)
+        buffer = BytesIO()
+        frames[0].save(buffer, format='GIF', save_all=True, append_images=frames[1:], duration=80, loop=0)
+        return buffer.getvalue()
+
+    @mock.patch('config.PREVIEW_WIDTHS', ())
+    @mock.patch('config.ANIMATION_VARIANT_FORMATS', ('webp',))
+    @mock.patch('animator.backend.download_output')
+    def test_store_output_makes_variants_per_edition(self, mock_download):
+        mock_download.return_value = self._drawing_gif()
+        anim = self._completed()
+
+        tasks.store_output(anim.uuid)
+        tasks.store_output(anim.uuid)
+
+        variant = anim.variants.get()
+        self.assertTrue(variant.watermarked)
+        self.assertEqual(variant.format, 'webp')
+        with variant.file.open('rb') as f:
+            self.assertEqual(Image.open(f).format, 'WEBP')
+
+        self.user.is_plan_active = True
+        self.user.save()
+        anim.refresh_from_db()
+        self.assertEqual(anim.make_variants(), 1)
+        self.assertEqual(anim.variants.filter(watermarked=False).count(), 1)
+
+    @mock.patch('config.PREVIEW_WIDTHS', (40, 80))
+    @mock.patch('config.ANIMATION_VARIANT_FORMATS', ('webp',))
+    @mock.patch('animator.backend.download_output')
+    def test_store_output_makes_preview_renditions(self, mock_download):
+        mock_download.return_value = self._drawing_gif()
+        anim = self._completed()
+
+        tasks.store_output(anim.uuid)
+
+        renditions = anim.variants.exclude(width=0)
+        self.assertEqual(
+            sorted(renditions.values_list('width', 'format')),
+            [(40, 'gif'), (40, 'webp'), (80, 'gif'), (80, 'webp')],
+        )
+        for variant in renditions:
+            with variant.file.open('rb') as f:
+                image = Image.open(f)
+                self.assertEqual(image.width, variant.width)
+                self.assertEqual(image.n_frames, 6)
+
+    @mock.patch('animator.backend.download_output')
+    def test_store_master_pads_cropped_render_back(self, mock_download):
+        input_data = _make_sheet()
+        anim = Animation.objects.create(
+            status=Animation.COMPLETED, output_url='https://api.example.com/out.gif',
+            input_image=SimpleUploadedFile('in.png', input_data, content_type='image/png'),
+            preset=self.preset_walk, pad_output=True,
+            **Animation.detect_crop(input_data),
+        )
+        # The backend rendered the 120x220 crop at half size
+        box = anim.crop_box
+        crop_size = ((box[2] - box[0]) // 2, (box[3] - box[1]) // 2)
+        mock_download.return_value = _make_gif(size=crop_size)
+
+        anim.store_master()
+
+        with anim.output_file.open('rb') as f:
+            frames, _ = imaging.load_frames(f.read())
+        self.assertEqual(len(frames), 4)
+        self.assertAlmostEqual(frames[0].width, 400, delta=2)
+        self.assertAlmostEqual(frames[0].height, 300, delta=2)
+        # Margins are filled with the paper colour
+        self.assertEqual('#%02x%02x%02x' % frames[0].getpixel((5, 5))[:3], anim.crop_background)
@@ -207,7 +207,8 @@ class FullAnimationFlowTest(E2ETestBase):
             status_data = resp.json()
             self.assertEqual(status_data['status'], 'completed')
             self.assertEqual(status_data['progress'], 100)
-            self.assertIn('animation-001.gif', status_data['output_url'])
+            # Users get the download view, never the backend's master URL
+            self.assertTrue(status_data['output_url'].endswith(reverse('animation_download', args=[animation_id])))
 
         # Verify DB state
         animation.refresh_from_db()
@@ -427,7 +428,7 @@ class CallbackCompletionFlowTest(E2ETestBase):
         self.assertEqual(resp.status_code, 200)
         data = resp.json()
         self.assertEqual(data['status'], 'completed')
-        self.assertIn('final.gif', data['output_url'])
+        self.assertTrue(data['output_url'].endswith(reverse('animation_download', args=[animation_id])))
 
 
 # ---------------------------------------------------------------------------
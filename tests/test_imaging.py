@@ -0,0 +1,212 @@
+"""
+Tests for animator.imaging, the Pillow and NumPy helpers behind uploads and
+deliveries.
+"""
+import base64
+from io import BytesIO
+from unittest import mock
+
+import numpy as np
+from django.test import SimpleTestCase
+from PIL import ExifTags, Image, ImageDraw
+
+from animator import imaging
+
+
+def _make_png(size=(32, 32)):
+    buffer = BytesIO()
+    Image.new('RGB', size, (255, 255, 255)).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def _make_sheet(size=(800, 600), drawing=(350, 200, 450, 400), fmt='PNG', **save_kwargs):
+    """A drawing on off-white paper with sensor noise and a few specks of dust."""
+    rng = np.random.default_rng(0)
+    paper = np.full((size[1], size[0], 3), (236, 231, 216), dtype=np.float32)
+    paper += rng.normal(0, 4, paper.shape)
+    sheet = Image.fromarray(np.clip(paper, 0, 255).astype(np.uint8))
+    sheet.paste((25, 25, 25), (drawing[0], drawing[1], drawing[2], drawing[1] + 4))
+    sheet.paste((25, 25, 25), (drawing[0], drawing[1], drawing[0] + 4, drawing[3]))
+    sheet.paste((25, 25, 25), (drawing[2] - 4, drawing[1], drawing[2], drawing[3]))
+    for x, y in [(50, 60), (750, 550), (150, 450)]:
+        sheet.putpixel((x, y), (0, 0, 0))
+    buffer = BytesIO()
+    sheet.save(buffer, format=fmt, **save_kwargs)
+    return buffer.getvalue()
+
+
+# ---------------------------------------------------------------------------
+# Encoding and watermarking
+# ---------------------------------------------------------------------------
+class EncodingTests(SimpleTestCase):
+
+    def test_add_watermark_blends_into_corner_only(self):
+        frames = [Image.new('RGBA', (240, 120), (255, 0, 0, 255)) for _ in range(3)]
+
+        marked = imaging.add_watermark(frames, 'drawinganimator.com')
+
+        self.assertEqual(len(marked), 3)
+        for frame in marked:
+            self.assertEqual(frame.getpixel((5, 5)), (255, 0, 0, 255))
+        corner = np.asarray(marked[0])[-30:, -120:]
+        self.assertTrue((corner != (255, 0, 0, 255)).any())
+
+    def test_encode_gif_is_lossless_for_few_colors(self):
+        frames = [Image.new('RGBA', (64, 48), (250, 248, 240, 255)) for _ in range(5)]
+        for i, frame in enumerate(frames):
+            frame.paste((200, 40, 40, 255), (i * 8, 10, i * 8 + 10, 30))
+
+        decoded, durations = imaging.load_frames(imaging.encode_gif(frames, [100] * 5))
+
+        self.assertEqual(durations, [100] * 5)
+        for original, frame in zip(frames, decoded):
+            self.assertTrue(np.array_equal(np.asarray(original), np.asarray(frame)))
+
+    def test_encode_avif_round_trips_when_supported(self):
+        if not imaging.can_encode('avif'):
+            self.skipTest('Pillow was built without AVIF support')
+        frames = [Image.new('RGBA', (64, 48), (i * 60, 100, 200, 255)) for i in range(3)]
+
+        image = Image.open(BytesIO(imaging.encode_avif(frames, [100] * 3)))
+
+        self.assertEqual(image.format, 'AVIF')
+        self.assertEqual(image.n_frames, 3)
+
+    def test_make_placeholder_averages_without_alpha_bleed(self):
+        frame = Image.new('RGBA', (320, 160), (0, 0, 0, 0))
+        frame.paste((255, 0, 0, 255), (0, 0, 160, 160))
+        buffer = BytesIO()
+        frame.save(buffer, format='PNG')
+
+        uri = imaging.make_placeholder(buffer.getvalue())
+
+        placeholder = Image.open(BytesIO(base64.b64decode(uri.split(',', 1)[1]))).convert('RGBA')
+        self.assertEqual(placeholder.size, (16, 8))
+        red, green, blue, alpha = placeholder.getpixel((7, 4))
+        self.assertGreater(red, 200)
+        self.assertLess(max(green, blue), 40)
+        self.assertLess(placeholder.getpixel((12, 4))[3], 20)
+
+
+# ---------------------------------------------------------------------------
+# Wiggle previews
+# ---------------------------------------------------------------------------
+class WiggleTests(SimpleTestCase):
+
+    def test_make_wiggle_sways_the_top_and_keeps_the_base(self):
+        drawing = Image.new('RGB', (100, 200), (255, 255, 255))
+        drawing.paste((0, 0, 0), (45, 0, 55, 200))  # Upright pole
+        buffer = BytesIO()
+        drawing.save(buffer, format='PNG')
+
+        preview = Image.open(BytesIO(imaging.make_wiggle(buffer.getvalue(), size=200)))
+        preview.seek(2)  # Furthest sway to the right
+        frame = np.asarray(preview.convert('L'))
+
+        top = np.flatnonzero(frame[2] < 128).mean()
+        base = np.flatnonzero(frame[-2] < 128).mean()
+        self.assertAlmostEqual(base, 49.5, delta=1.5)
+        self.assertGreater(top, base + 2)
+
+    def test_make_wiggle_follows_exif_orientation(self):
+        drawing = Image.new('RGB', (200, 100), (255, 255, 255))
+        drawing.paste((0, 0, 0), (0, 45, 200, 55))  # Stored sideways: the pole lies flat
+        exif = Image.Exif()
+        exif[ExifTags.Base.Orientation] = 6  # Displayed rotated 90 degrees clockwise
+        buffer = BytesIO()
+        drawing.save(buffer, format='JPEG', quality=95, exif=exif)
+
+        preview = Image.open(BytesIO(imaging.make_wiggle(buffer.getvalue(), size=200)))
+        frame = np.asarray(preview.convert('L'))
+
+        self.assertEqual(preview.size, (100, 200))
+        self.assertAlmostEqual(np.flatnonzero(frame[-2] < 128).mean(), 49.5, delta=1.5)
+
+
+# ---------------------------------------------------------------------------
+# Auto-crop of drawing margins
+# ---------------------------------------------------------------------------
+class AutoCropTests(SimpleTestCase):
+
+    def test_finds_drawing_and_paper_colour(self):
+        box, background = imaging.find_content_box(_make_sheet(), margin=0.05)
+
+        # Drawing spans 350-450 x 200-400; 5% of 200 is kept around it, dust ignored
+        for found, expected in zip(box, (340, 190, 460, 410)):
+            self.assertAlmostEqual(found, expected, delta=4)
+        paper = [int(background[i:i + 2], 16) for i in (1, 3, 5)]
+        for found, expected in zip(paper, (236, 231, 216)):
+            self.assertAlmostEqual(found, expected, delta=2)
+
+    def test_leaves_full_bleed_and_blank_images_alone(self):
+        noise = np.random.default_rng(1).integers(0, 255, (300, 400, 3), dtype=np.uint8)
+        buffer = BytesIO()
+        Image.fromarray(noise).save(buffer, format='PNG')
+        self.assertIsNone(imaging.find_content_box(buffer.getvalue()))
+        self.assertIsNone(imaging.find_content_box(_make_png((400, 300))))
+        # Drawing filling most of the sheet: not worth cropping
+        self.assertIsNone(imaging.find_content_box(_make_sheet(drawing=(20, 20, 780, 580))))
+
+    def test_box_follows_exif_orientation(self):
+        exif = Image.Exif()
+        exif[ExifTags.Base.Orientation] = 6  # Stored sideways, displayed rotated 90 degrees clockwise
+        for fmt, save_kwargs in [('JPEG', {'quality': 95}), ('PNG', {})]:
+            data = _make_sheet(fmt=fmt, exif=exif, **save_kwargs)
+
+            box, _ = imaging.find_content_box(data, margin=0)
+            cropped = Image.open(BytesIO(imaging.crop_image(data, box)))
+
+            self.assertEqual(imaging.oriented_size(data), (600, 800))
+            # The 100x200 drawing is 200x100 upright
+            self.assertAlmostEqual(cropped.width, 200, delta=4)
+            self.assertAlmostEqual(cropped.height, 100, delta=4)
+
+    def test_oversized_images_are_not_analysed(self):
+        data = _make_sheet()
+        with mock.patch('animator.imaging.ANALYSIS_MAX_PIXELS', 400_000), \
+                mock.patch('PIL.ImageFile.ImageFile.load') as mock_load:
+            self.assertIsNone(imaging.find_content_box(data))
+            self.assertIsNone(imaging.dhash(data))
+        mock_load.assert_not_called()
+
+        # JPEGs are judged by their reduced-scale decode
+        data = _make_sheet(size=(2048, 1536), fmt='JPEG', quality=95)
+        with mock.patch('animator.imaging.ANALYSIS_MAX_PIXELS', 400_000):
+            self.assertIsNotNone(imaging.find_content_box(data))
+
+
+# ---------------------------------------------------------------------------
+# Near-duplicate hash
+# ---------------------------------------------------------------------------
+class DHashTests(SimpleTestCase):
+
+    def _hash(self, data):
+        found = imaging.find_content_box(data)
+        return imaging.dhash(data, found[0] if found else None)
+
+    def _encode(self, image, fmt='PNG', **save_kwargs):
+        buffer = BytesIO()
+        image.save(buffer, format=fmt, **save_kwargs)
+        return buffer.getvalue()
+
+    def test_dhash_survives_reframing_and_recompression(self):
+        sheet = Image.open(BytesIO(_make_sheet(drawing=(320, 300, 480, 420)))).convert('RGB')
+        draw = ImageDraw.Draw(sheet)
+        draw.ellipse((370, 190, 430, 250), fill=(200, 60, 40), outline=(25, 25, 25), width=4)
+        draw.line((330, 280, 460, 260), fill=(25, 25, 25), width=6)
+        original = self._hash(self._encode(sheet))
+
+        reframed = Image.new('RGB', (900, 700), (236, 231, 216))
+        reframed.paste(sheet, (70, 45))
+        for variant in [
+            self._encode(sheet, 'JPEG', quality=40),
+            self._encode(reframed),
+            self._encode(sheet.resize((400, 300), Image.BILINEAR), 'JPEG', quality=80),
+        ]:
+            self.assertLessEqual((self._hash(variant) ^ original).bit_count(), 3)
+
+        other = Image.open(BytesIO(_make_sheet())).convert('RGB')
+        ImageDraw.Draw(other).ellipse((250, 150, 550, 450), outline=(25, 25, 25), width=6)
+        different = self._hash(self._encode(other))
+        self.assertGreater((different ^ original).bit_count(), 10)
+        self.assertIsNone(imaging.dhash(_make_png((64, 64))))